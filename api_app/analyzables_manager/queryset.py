@@ -1,7 +1,11 @@
 import logging
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple
 
 from django.db.models import QuerySet
 
+if TYPE_CHECKING:
+    from api_app.analyzables_manager.models import Analyzable
+
 logger = logging.getLogger(__name__)
 
 
@@ -36,3 +40,63 @@ class AnalyzableQuerySet(QuerySet):
             raise e
         obj.save(force_insert=True, using=self.db)
         return obj
+
+    def _in_bulk_by_md5(
+        self, md5s: List[str], batch_size: int
+    ) -> Dict[str, "Analyzable"]:
+        analyzables = {}
+        for start in range(0, len(md5s), batch_size):
+            end = start + batch_size
+            analyzables.update(
+                self.filter(md5__in=md5s[start:end]).in_bulk(field_name="md5")
+            )
+        return analyzables
+
+    def get_or_create_observables(
+        self, observables: Iterable[Tuple[str, str]], batch_size: int = 5000
+    ) -> Dict[str, "Analyzable"]:
+        """
+        Gets or creates the analyzables of many observables
+        with one query and one bulk insert for every batch.
+
+        The observables must already be normalized.
+        New analyzables are added to the user wildcard events matching them,
+        like it happens in the post_save signal of a single analyzable.
+
+        Args:
+            observables (Iterable[Tuple[str, str]]): name and classification
+                of the observables
+            batch_size (int): number of analyzables for every query
+
+        Returns:
+            Dict[str, Analyzable]: the analyzables, by md5
+        """
+        from api_app.user_events_manager.models import (
+            UserDomainWildCardEvent,
+            UserIPWildCardEvent,
+        )
+
+        to_create = {}
+        for name, classification in observables:
+            analyzable = self.model(name=name, classification=classification)
+            analyzable._set_hashes(name)
+            to_create.setdefault(analyzable.md5, analyzable)
+        md5s = list(to_create.keys())
+        analyzables = self._in_bulk_by_md5(md5s, batch_size)
+        missing = [md5 for md5 in md5s if md5 not in analyzables]
+        # concurrent requests could have created some of them in the meantime
+        self.bulk_create(
+            [to_create[md5] for md5 in missing],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+        created = self._in_bulk_by_md5(missing, batch_size)
+        if created:
+            pks = [analyzable.pk for analyzable in created.values()]
+            for event_class in (UserDomainWildCardEvent, UserIPWildCardEvent):
+                for event in event_class.objects.all():
+                    event.analyzables.add(
+                        *event.find_new_analyzables_from_query().filter(pk__in=pks)
+                    )
+        analyzables.update(created)
+        return analyzables
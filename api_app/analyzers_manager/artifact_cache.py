@@ -0,0 +1,107 @@
+# This file is a part of IntelOwl https://github.com/intelowlproject/IntelOwl
+# See the file 'LICENSE' for copying permission.
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Set, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SampleArtifactCache:
+    """
+    Worker level LRU cache of the artifacts derived from the sample of a job,
+    like its content, its magic or its parsed structures, so that
+    the file analyzers of the job running in the same worker compute them once.
+
+    Entries are keyed by job and sha256 of the sample, and are dropped
+    once the file analyzers of their job finished.
+    The memory budget is estimated by the callers:
+    artifacts exceeding it are not cached.
+    Artifacts are shared between analyzers: they must not be modified.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._size = 0
+        # (job, sha256) -> (size, artifact name -> artifact)
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[int, Dict[str, Any]]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        job_id: int,
+        sha256: str,
+        name: str,
+        factory: Callable[[], Any],
+        sizeof: Callable[[Any], int] = None,
+    ) -> Any:
+        """Return the artifact of the sample, computing it if missing.
+
+        Args:
+            job_id (int): job analyzing the sample
+            sha256 (str): sha256 of the sample
+            name (str): name of the artifact
+            factory (Callable[[], Any]): computes the artifact
+            sizeof (Callable[[Any], int]): estimates the memory used by the artifact
+
+        Returns:
+            Any: the artifact
+        """
+        key = (job_id, sha256)
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is not None and name in entry[1]:
+                self._entries.move_to_end(key)
+                return entry[1][name]
+        # computed without holding the lock: two analyzers
+        # computing the same artifact at once both succeed
+        artifact = factory()
+        self.put(job_id, sha256, name, artifact, sizeof(artifact) if sizeof else 0)
+        return artifact
+
+    def put(
+        self, job_id: int, sha256: str, name: str, artifact: Any, size: int = 0
+    ) -> None:
+        if size > self.max_size:
+            logger.info(f"Artifact {name} of {sha256} exceeds the budget, not cached")
+            return
+        key = (job_id, sha256)
+        with self._lock:
+            entry_size, artifacts = self._entries.pop(key, (0, {}))
+            if name not in artifacts:
+                entry_size += size
+                self._size += size
+            artifacts[name] = artifact
+            self._entries[key] = (entry_size, artifacts)
+            while self._size > self.max_size:
+                self._pop(next(iter(self._entries)))
+
+    def _pop(self, key: Tuple[int, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[0]
+
+    def get_job_ids(self) -> Set[int]:
+        with self._lock:
+            return {job_id for job_id, _ in self._entries}
+
+    def invalidate(self, job_ids: Iterable[int] = None) -> None:
+        with self._lock:
+            if job_ids is None:
+                self._entries.clear()
+                self._size = 0
+                return
+            job_ids = set(job_ids)
+            for key in [key for key in self._entries if key[0] in job_ids]:
+                self._pop(key)
+
+
+sample_artifact_cache = SampleArtifactCache(
+    settings.FILE_ANALYZER_ARTIFACT_CACHE_SIZE_MB * 1024 * 1024
+)
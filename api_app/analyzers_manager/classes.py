@@ -6,10 +6,9 @@ import logging
 import time
 from abc import ABCMeta
 from pathlib import PosixPath
-from typing import Dict, Tuple
+from typing import Any, Callable, Dict, Tuple
 
 import requests
-from django.conf import settings
 
 from certego_saas.apps.user.models import User
 
@@ -17,6 +16,7 @@ from ..choices import Classification, PythonModuleBasePaths
 from ..classes import Plugin
 from ..data_model_manager.enums import DataModelEvaluations
 from ..models import PythonConfig
+from .artifact_cache import sample_artifact_cache
 from .constants import HashChoices, TypeChoices
 from .exceptions import AnalyzerConfigurationException, AnalyzerRunException
 from .models import AnalyzerConfig, AnalyzerReport
@@ -60,7 +60,8 @@ class BaseAnalyzerMixin(Plugin, metaclass=ABCMeta):
     def create_data_model(self):
         self.report: AnalyzerReport
         if self._do_create_data_model():
-            data_model = self.report.create_data_model()
+            # the report is saved at the end of the execution
+            data_model = self.report.create_data_model(save=False)
             if data_model:
                 self._update_data_model(data_model)
                 data_model.save()
@@ -214,6 +215,10 @@ class FileAnalyzer(BaseAnalyzerMixin, metaclass=ABCMeta):
     md5: str
     filename: str
     file_mimetype: str
+    __filepath: str = None
+    # whether the artifacts of the sample, like its content,
+    # are shared with the other analyzers of the job running in the same worker
+    cache_artifacts: bool = False
 
     def __init__(
         self,
@@ -228,7 +233,7 @@ class FileAnalyzer(BaseAnalyzerMixin, metaclass=ABCMeta):
         self.filename = self._job.analyzable.name
         # this is updated in the filepath property, like a cache decorator.
         # if the filepath is requested, it means that the analyzer downloads...
-        # ...the file from AWS because it requires a path and it needs to be deleted
+        # ...the file from AWS because it requires a path and it needs to be released
         self.__filepath = None
         self.file_mimetype = self._job.analyzable.mimetype
 
@@ -237,8 +242,43 @@ class FileAnalyzer(BaseAnalyzerMixin, metaclass=ABCMeta):
     def python_base_path(cls) -> PosixPath:
         return PythonModuleBasePaths[FileAnalyzer.__name__].value
 
+    def get_artifact(
+        self, name: str, factory: Callable[[], Any], sizeof: Callable[[Any], int] = None
+    ) -> Any:
+        """Returns an artifact derived from the sample. If the analyzer shares
+        its artifacts, it is computed once for the job in every worker.
+
+        Args:
+            name (str): name of the artifact, shared by the analyzers
+            factory (Callable[[], Any]): computes the artifact
+            sizeof (Callable[[Any], int]): estimates the memory used by the artifact
+
+        Returns:
+            Any: the artifact, that must not be modified
+        """
+        if not self.cache_artifacts:
+            return factory()
+        return sample_artifact_cache.get(
+            self.job_id, self._job.analyzable.sha256, name, factory, sizeof
+        )
+
+    @staticmethod
+    def _release_artifacts() -> None:
+        """Drops the artifacts of the jobs whose file analyzers all finished."""
+        job_ids = sample_artifact_cache.get_job_ids()
+        if not job_ids:
+            return
+        running_job_ids = set(
+            AnalyzerReport.objects.filter(
+                job_id__in=job_ids, config__type=TypeChoices.FILE.value
+            )
+            .exclude(status__in=AnalyzerReport.STATUSES.final_statuses())
+            .values_list("job_id", flat=True)
+        )
+        sample_artifact_cache.invalidate(job_ids - running_job_ids)
+
     def read_file_bytes(self) -> bytes:
-        return self._job.analyzable.read()
+        return self.get_artifact("content", self._job.analyzable.read, len)
 
     @property
     def filepath(self) -> str:
@@ -262,16 +302,12 @@ class FileAnalyzer(BaseAnalyzerMixin, metaclass=ABCMeta):
 
     def after_run(self):
         super().after_run()
-        # We delete the file only if we have single copy for analyzer
-        # and the file has been saved locally.
-        # Otherwise we would remove the single file that we have on the server
-        if not settings.LOCAL_STORAGE and self.filepath is not None:
-            import os
-
-            try:
-                os.remove(self.filepath)
-            except OSError:
-                logger.warning(f"Filepath {self.filepath} does not exists")
+        # the sample retrieved from the storage is shared with the other analyzers:
+        # we only release it, so that it can be evicted when it is not used anymore
+        if self.__filepath is not None:
+            self._job.analyzable.file.storage.release(self.__filepath)
+        if self.cache_artifacts:
+            self._release_artifacts()
 
         logger.info(
             f"FINISHED analyzer: {self.__repr__()} -> "
@@ -0,0 +1,314 @@
+# This file is a part of IntelOwl https://github.com/intelowlproject/IntelOwl
+# See the file 'LICENSE' for copying permission.
+
+import ipaddress
+import json
+import logging
+import os
+import tempfile
+import threading
+from abc import ABCMeta, abstractmethod
+from bisect import bisect_right
+from typing import IO, Any, Dict, FrozenSet, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class BaseFeedIndex(metaclass=ABCMeta):
+    """
+    Lookup structure of a feed saved on disk.
+
+    The index is saved next to the feed, so that it is built only once
+    after every update, and it is loaded once for every worker,
+    until the feed changes.
+    Subclasses define how the feed is indexed and how the index is serialized.
+    """
+
+    # path of the feed -> index, for every worker
+    _indexes: Dict[str, "BaseFeedIndex"]
+    _lock: threading.Lock
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._indexes = {}
+        cls._lock = threading.Lock()
+
+    def __init__(self, feed_signature: Tuple[int, int] = None):
+        self.feed_signature = feed_signature
+
+    @classmethod
+    @abstractmethod
+    def _from_feed(cls, feed: IO, **options) -> "BaseFeedIndex":
+        raise NotImplementedError()
+
+    @abstractmethod
+    def _serialize(self) -> Any:
+        raise NotImplementedError()
+
+    @classmethod
+    @abstractmethod
+    def _deserialize(cls, content: Any) -> "BaseFeedIndex":
+        raise NotImplementedError()
+
+    @staticmethod
+    def get_index_path(feed_path: str) -> str:
+        return f"{feed_path}.index.json"
+
+    @staticmethod
+    def _get_signature(feed_path: str) -> Tuple[int, int]:
+        stat = os.stat(feed_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @classmethod
+    def build(cls, feed_path: str, **options) -> "BaseFeedIndex":
+        """Build the index of the feed and save it next to the feed.
+
+        Args:
+            feed_path (str): path of the feed
+            options: how the feed is indexed, specific of the subclass
+
+        Returns:
+            BaseFeedIndex: the index
+        """
+        signature = cls._get_signature(feed_path)
+        with open(feed_path, "r", encoding="utf-8") as f:
+            index = cls._from_feed(f, **options)
+        index.feed_signature = signature
+        index_path = cls.get_index_path(feed_path)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(index_path) or ".")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "feed_signature": signature,
+                        "options": options,
+                        "index": index._serialize(),
+                    },
+                    f,
+                )
+            os.replace(tmp_path, index_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        logger.info(f"Built index of {feed_path} with {len(index)} entries")
+        return index
+
+    @classmethod
+    def _read(cls, feed_path: str, **options) -> "BaseFeedIndex":
+        signature = cls._get_signature(feed_path)
+        try:
+            with open(cls.get_index_path(feed_path), "r", encoding="utf-8") as f:
+                content = json.load(f)
+        except (FileNotFoundError, ValueError):
+            content = {}
+        if (
+            tuple(content.get("feed_signature", ())) != signature
+            or content.get("options", None) != options
+        ):
+            # the feed was updated without building its index
+            return cls.build(feed_path, **options)
+        index = cls._deserialize(content["index"])
+        index.feed_signature = signature
+        return index
+
+    @classmethod
+    def load(cls, feed_path: str, **options) -> "BaseFeedIndex":
+        """Get the index of the feed, reloading it only if the feed changed.
+
+        Args:
+            feed_path (str): path of the feed
+            options: how the feed is indexed, specific of the subclass
+
+        Returns:
+            BaseFeedIndex: the index
+        """
+        signature = cls._get_signature(feed_path)
+        with cls._lock:
+            index = cls._indexes.get(feed_path, None)
+            if index is None or index.feed_signature != signature:
+                index = cls._read(feed_path, **options)
+                cls._indexes[feed_path] = index
+        return index
+
+
+class FeedIndex(BaseFeedIndex):
+    """
+    Index of a flat file feed, with one entry for each line.
+
+    Exact entries are kept in a set, networks are kept as sorted
+    and merged intervals of integers, one array for each ip version.
+    """
+
+    def __init__(
+        self,
+        entries: FrozenSet[str] = frozenset(),
+        networks: Dict[int, Tuple[List[int], List[int]]] = None,
+        feed_signature: Tuple[int, int] = None,
+    ):
+        super().__init__(feed_signature)
+        self.entries = entries
+        self.networks = networks or {4: ([], []), 6: ([], [])}
+
+    def __len__(self) -> int:
+        return len(self.entries) + sum(
+            len(starts) for starts, _ in self.networks.values()
+        )
+
+    def __contains__(self, value: str) -> bool:
+        if value in self.entries:
+            return True
+        try:
+            address = ipaddress.ip_address(value)
+        except ValueError:
+            return False
+        starts, ends = self.networks[address.version]
+        position = bisect_right(starts, int(address)) - 1
+        return position >= 0 and int(address) <= ends[position]
+
+    @staticmethod
+    def _merge(intervals: List[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+        starts, ends = [], []
+        for start, end in sorted(intervals):
+            if ends and start <= ends[-1] + 1:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        return starts, ends
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str], networks: bool = False) -> "FeedIndex":
+        """Build the index of the lines of a feed.
+
+        Args:
+            lines (Iterable[str]): entries of the feed; empty lines
+                and comments are skipped
+            networks (bool): whether the entries are ip addresses or networks
+
+        Returns:
+            FeedIndex: the index
+        """
+        entries = set()
+        intervals = {4: [], 6: []}
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if not networks:
+                entries.add(line)
+                continue
+            try:
+                network = ipaddress.ip_network(line, strict=False)
+            except ValueError:
+                logger.warning(f"Skipping invalid network {line}")
+                continue
+            intervals[network.version].append(
+                (int(network.network_address), int(network.broadcast_address))
+            )
+        return cls(
+            frozenset(entries),
+            {version: cls._merge(values) for version, values in intervals.items()},
+        )
+
+    @classmethod
+    def _from_feed(cls, feed: IO, networks: bool = False) -> "FeedIndex":
+        return cls.from_lines(feed, networks)
+
+    def _serialize(self) -> Dict:
+        return {
+            "entries": sorted(self.entries),
+            "intervals": {
+                version: list(zip(starts, ends))
+                for version, (starts, ends) in self.networks.items()
+            },
+        }
+
+    @classmethod
+    def _deserialize(cls, content: Dict) -> "FeedIndex":
+        return cls(
+            frozenset(content["entries"]),
+            {
+                int(version): (
+                    [start for start, _ in intervals],
+                    [end for _, end in intervals],
+                )
+                for version, intervals in content["intervals"].items()
+            },
+        )
+
+    @classmethod
+    def build(cls, feed_path: str, networks: bool = False) -> "FeedIndex":
+        return super().build(feed_path, networks=networks)
+
+    @classmethod
+    def load(cls, feed_path: str, networks: bool = False) -> "FeedIndex":
+        return super().load(feed_path, networks=networks)
+
+
+class JsonFeedIndex(BaseFeedIndex):
+    """
+    Inverted index of a JSON feed, a list of objects, by the value of one of
+    their fields. Objects without the field are skipped.
+    """
+
+    def __init__(
+        self,
+        entries: Dict[str, List[Dict]] = None,
+        feed_signature: Tuple[int, int] = None,
+    ):
+        super().__init__(feed_signature)
+        self.entries = entries or {}
+
+    def __len__(self) -> int:
+        return sum(len(values) for values in self.entries.values())
+
+    def __contains__(self, value: str) -> bool:
+        return value in self.entries
+
+    def get(self, value: str) -> List[Dict]:
+        """Get the objects of the feed with the value, in the order of the feed.
+
+        Args:
+            value (str): value of the indexed field
+
+        Returns:
+            List[Dict]: the objects
+        """
+        return self.entries.get(value, [])
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Dict], key: str) -> "JsonFeedIndex":
+        """Build the index of the objects of a feed.
+
+        Args:
+            entries (Iterable[Dict]): objects of the feed
+            key (str): indexed field
+
+        Returns:
+            JsonFeedIndex: the index
+        """
+        index = {}
+        for entry in entries:
+            value = entry.get(key, None)
+            if value is not None:
+                index.setdefault(str(value), []).append(entry)
+        return cls(index)
+
+    @classmethod
+    def _from_feed(cls, feed: IO, key: str) -> "JsonFeedIndex":
+        return cls.from_entries(json.load(feed), key)
+
+    def _serialize(self) -> Dict[str, List[Dict]]:
+        return self.entries
+
+    @classmethod
+    def _deserialize(cls, content: Dict[str, List[Dict]]) -> "JsonFeedIndex":
+        return cls(content)
+
+    @classmethod
+    def build(cls, feed_path: str, key: str) -> "JsonFeedIndex":
+        return super().build(feed_path, key=key)
+
+    @classmethod
+    def load(cls, feed_path: str, key: str) -> "JsonFeedIndex":
+        return super().load(feed_path, key=key)
@@ -21,6 +21,7 @@ logger = logging.getLogger(__name__)
 class FileInfo(FileAnalyzer):
     EXIF_TOOL_PATH: PosixPath = settings.BASE_DIR / "exiftool_download"
     EXIF_TOOL_VERSION_PATH: PosixPath = EXIF_TOOL_PATH / "exiftool_version.txt"
+    cache_artifacts = True
 
     @cached_property
     def exiftool_path(self) -> Optional[str]:
@@ -33,8 +34,12 @@ class FileInfo(FileAnalyzer):
 
     def run(self):
         results = {}
-        results["magic"] = magic.from_file(self.filepath)
-        results["mimetype"] = magic.from_file(self.filepath, mime=True)
+        results["magic"] = self.get_artifact(
+            "magic", lambda: magic.from_file(self.filepath)
+        )
+        results["mimetype"] = self.get_artifact(
+            "mimetype", lambda: magic.from_file(self.filepath, mime=True)
+        )
 
         binary = self.read_file_bytes()
         results["md5"] = calculate_md5(binary)
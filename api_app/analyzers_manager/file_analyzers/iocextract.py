@@ -19,6 +19,8 @@ class IocExtract(FileAnalyzer):
     extract_telephone_nums: bool = False
     extract_iocs: bool = True
 
+    cache_artifacts = True
+
     def update(self):
         pass
 
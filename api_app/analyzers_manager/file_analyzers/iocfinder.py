@@ -17,6 +17,8 @@ class IocFinder(FileAnalyzer):
     parse_imphashes: bool = True
     parse_authentihashes: bool = True
 
+    cache_artifacts = True
+
     def update(self):
         pass
 
@@ -30,12 +30,14 @@ class No_Icon_Error(Exception):
 
 
 class PEInfo(FileAnalyzer):
+    cache_artifacts = True
+
     def update(self):
         pass
 
     def dotnetpe(self):
         results = {}
-        file_type = magic.from_buffer(self.read_file_bytes())
+        file_type = self.get_artifact("magic", lambda: magic.from_file(self.filepath))
 
         if ".Net" in file_type:
             dotnet_file = DotNetPE(self.filepath)
@@ -27,9 +27,13 @@ class Permhash(FileAnalyzer):
     Android manifest and Chrome extension manifest files.
     """
 
+    cache_artifacts = True
+
     def run(self):
         result = {}
-        mimetype = magic.from_file(self.filepath, mime=True)
+        mimetype = self.get_artifact(
+            "mimetype", lambda: magic.from_file(self.filepath, mime=True)
+        )
 
         hash_val = ""
 
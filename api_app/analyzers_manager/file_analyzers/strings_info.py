@@ -25,6 +25,8 @@ class StringsInfo(FileAnalyzer, DockerBasedAnalyzer):
     # CARE!! ranked_strings could be cpu/ram intensive and very slow
     rank_strings: int
 
+    cache_artifacts = True
+
     def update(self) -> bool:
         pass
 
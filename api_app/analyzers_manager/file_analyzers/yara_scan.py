@@ -1,11 +1,18 @@
 # This file is a part of IntelOwl https://github.com/intelowlproject/IntelOwl
 # See the file 'LICENSE' for copying permission.
 import dataclasses
+import hashlib
 import io
+import json
 import logging
 import math
+import mmap
 import os
+import threading
+import time
 import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import PosixPath
 from typing import Dict, List, Optional, Tuple, Union
 from urllib.parse import urlparse
@@ -38,6 +45,95 @@ class YaraMatchMock:
         return self.match
 
 
+def _validate_rule(path: str) -> bool:
+    try:
+        yara.compile(path)
+    except yara.SyntaxError:
+        return False
+    return True
+
+
+def _validate_rules(paths: List[str]) -> Dict[str, bool]:
+    if len(paths) <= 1 or settings.YARA_COMPILE_WORKERS <= 1:
+        return {path: _validate_rule(path) for path in paths}
+    logger.info(f"Validating {len(paths)} rules")
+    try:
+        with ProcessPoolExecutor(max_workers=settings.YARA_COMPILE_WORKERS) as pool:
+            return dict(zip(paths, pool.map(_validate_rule, paths, chunksize=32)))
+    except AssertionError as e:
+        # daemonic processes (e.g. celery prefork children) can't have children
+        logger.info(f"Unable to validate rules in parallel: {e}")
+        return {path: _validate_rule(path) for path in paths}
+
+
+class YaraRulesCache:
+    """
+    Worker level LRU cache of the loaded compiled rules.
+    Entries are keyed by the path of the compiled file and validated
+    against its stat, so a recompilation done by any process is detected.
+    The memory budget is estimated with the size of the compiled files.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._size = 0
+        self._rules: "OrderedDict[str, Tuple[Tuple[int, int, int], yara.Rules]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_signature(path: PosixPath) -> Tuple[int, int, int]:
+        stat = path.stat()
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def get(self, path: PosixPath) -> yara.Rules:
+        key = str(path)
+        signature = self._get_signature(path)
+        with self._lock:
+            entry = self._rules.get(key, None)
+            if entry is not None and entry[0] == signature:
+                self._rules.move_to_end(key)
+                return entry[1]
+        logger.info(f"Loading compiled rules {key}")
+        rules = yara.load(key)
+        self.put(path, rules, signature)
+        return rules
+
+    def put(
+        self,
+        path: PosixPath,
+        rules: yara.Rules,
+        signature: Tuple[int, int, int] = None,
+    ) -> None:
+        key = str(path)
+        if signature is None:
+            signature = self._get_signature(path)
+        with self._lock:
+            self._pop(key)
+            self._rules[key] = (signature, rules)
+            self._size += signature[1]
+            # the most recent rules are always kept, even if over budget
+            while self._size > self.max_size and len(self._rules) > 1:
+                self._pop(next(iter(self._rules)))
+
+    def _pop(self, key: str) -> None:
+        entry = self._rules.pop(key, None)
+        if entry is not None:
+            self._size -= entry[0][1]
+
+    def invalidate(self, path: PosixPath = None) -> None:
+        with self._lock:
+            if path is None:
+                self._rules.clear()
+                self._size = 0
+            else:
+                self._pop(str(path))
+
+
+yara_rules_cache = YaraRulesCache(settings.YARA_RULES_CACHE_SIZE_MB * 1024 * 1024)
+
+
 class YaraRepo:
     def __init__(
         self,
@@ -133,10 +229,8 @@ class YaraRepo:
             logger.info(f"checking {self.directory=} for {self.url=} and {self.owner=}")
 
             if self.directory.exists():
-                # this is to allow a clean pull
-                for compiled_file in self.compiled_paths:
-                    compiled_file.unlink(missing_ok=True)
-
+                # the compiled files are kept:
+                # `compile` uses their manifest to recompile only what changed
                 logger.info(f"About to pull {self.url} at {self.directory}")
                 repo = git.Repo(self.directory)
                 o = repo.remotes.origin
@@ -168,6 +262,10 @@ class YaraRepo:
     def compiled_file_name(self):
         return "intel_owl_compiled.yas"
 
+    @property
+    def manifest_file_name(self):
+        return "intel_owl_compiled.json"
+
     @cached_property
     def first_level_directories(self) -> List[PosixPath]:
         paths = []
@@ -198,7 +296,7 @@ class YaraRepo:
                 self.update()
             for compiled_path in self.compiled_paths:
                 if compiled_path.exists():
-                    self._rules.append(yara.load(str(compiled_path)))
+                    self._rules.append(yara_rules_cache.get(compiled_path))
                 else:
                     self._rules = self.compile()
                     break
@@ -216,46 +314,97 @@ class YaraRepo:
             logger.error(f"Unable to calculate url from {namespace}")
         return None
 
+    def _get_rules_paths(self, directory: PosixPath) -> List[PosixPath]:
+        if directory != self.directory:
+            # recursive
+            rules = directory.rglob("*")
+        else:
+            # not recursive
+            rules = directory.glob("*")
+        return sorted(
+            rule
+            for rule in rules
+            if not (rule.stem.endswith("index") or rule.stem.startswith("index"))
+            and rule.suffix in [".yara", ".yar", ".rule"]
+        )
+
+    def _read_manifest(self, directory: PosixPath) -> Dict[str, Dict]:
+        try:
+            with open(directory / self.manifest_file_name, "r") as f:
+                return json.load(f)["rules"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.info(f"No valid manifest for {self} at {directory}: {e}")
+            return {}
+
+    def _write_manifest(self, directory: PosixPath, rules: Dict[str, Dict]) -> None:
+        with open(directory / self.manifest_file_name, "w") as f:
+            json.dump({"rules": rules}, f)
+
     def compile(self) -> List[yara.Rules]:
         logger.info(f"Starting compile for {self}")
         compiled_rules = []
 
+        # first we find out which rules changed since the last compilation
+        directories = {}
+        to_validate = set()
         for directory in self.first_level_directories + [self.directory]:
-            if directory != self.directory:
-                # recursive
-                rules = directory.rglob("*")
-            else:
-                # not recursive
-                rules = directory.glob("*")
-            valid_rules_path = []
-            for rule in rules:
-                if rule.stem.endswith("index") or rule.stem.startswith("index"):
-                    continue
-                if rule.suffix in [".yara", ".yar", ".rule"]:
-                    try:
-                        yara.compile(str(rule))
-                    except yara.SyntaxError:
-                        continue
-                    else:
-                        valid_rules_path.append(str(rule))
+            manifest = self._read_manifest(directory)
+            rules = {}
+            for rule in self._get_rules_paths(directory):
+                with open(rule, "rb") as f:
+                    rule_hash = hashlib.sha256(f.read()).hexdigest()
+                previous = manifest.get(str(rule), {})
+                rules[str(rule)] = {
+                    "sha256": rule_hash,
+                    "valid": (
+                        previous["valid"]
+                        if previous.get("sha256", None) == rule_hash
+                        else None
+                    ),
+                }
+                if rules[str(rule)]["valid"] is None:
+                    to_validate.add(str(rule))
+            compiled_path = directory / self.compiled_file_name
+            changed = (
+                not compiled_path.exists()
+                or manifest.keys() != rules.keys()
+                or any(rule["valid"] is None for rule in rules.values())
+            )
+            directories[directory] = (rules, changed)
+
+        # then we check only the new rules, in parallel
+        validations = _validate_rules(sorted(to_validate))
+        for directory, (rules, changed) in directories.items():
+            compiled_path = directory / self.compiled_file_name
+            if not changed:
+                logger.info(f"Rules for {self} at {directory} did not change")
+                compiled_rules.append(yara_rules_cache.get(compiled_path))
+                continue
+            for path, rule in rules.items():
+                if rule["valid"] is None:
+                    rule["valid"] = validations[path]
+            valid_rules_path = [path for path, rule in rules.items() if rule["valid"]]
             logger.info(
                 f"Compiling {len(valid_rules_path)} rules for {self} at {directory}"
             )
             compiled_rule = yara.compile(
                 filepaths={str(path): str(path) for path in valid_rules_path}
             )
-            compiled_rule.save(str(directory / self.compiled_file_name))
+            compiled_rule.save(str(compiled_path))
+            self._write_manifest(directory, rules)
+            # the rules that were loaded before are not valid anymore
+            yara_rules_cache.put(compiled_path, compiled_rule)
             compiled_rules.append(compiled_rule)
             logger.info(f"Rules {self} saved on file")
         return compiled_rules
 
-    def analyze(self, file_path: str, filename: str) -> List[Dict]:
-        logger.info(f"{self} starting analysis of {filename} for file path {file_path}")
+    def analyze(self, data: Union[bytes, mmap.mmap], filename: str) -> List[Dict]:
+        logger.info(f"{self} starting analysis of {filename}")
         result = []
         for rule in self.rules:
             rule: yara.Match
             try:
-                matches = rule.match(file_path, externals={"filename": filename})
+                matches = rule.match(data=data, externals={"filename": filename})
             except yara.Error as e:
                 if "internal error" in str(e):
                     _, code = str(e).split(":")
@@ -319,19 +468,68 @@ class YaraStorage:
                 return
         self.repos.append(new_repo)
 
-    def analyze(self, file_path: str, filename: str) -> Dict:
+    @staticmethod
+    def _analyze_repo(
+        repo: YaraRepo, data: Union[bytes, mmap.mmap], filename: str
+    ) -> Tuple[Optional[List[Dict]], Optional[str], float]:
+        start = time.perf_counter()
+        try:
+            matches = repo.analyze(data, filename)
+        except Exception as e:
+            logger.warning(f"{filename} rules analysis failed: {e}", stack_info=True)
+            return None, str(e), time.perf_counter() - start
+        finally:
+            # the loaded rules are kept by `yara_rules_cache`
+            repo._rules = []
+        return matches, None, time.perf_counter() - start
+
+    def analyze(self, file_path: str, filename: str) -> Tuple[Dict, List[str]]:
+        """Scan the file with the rules of every repository.
+
+        The file is read only once and the same buffer is shared by every
+        ruleset; yara releases the GIL while matching, so repositories
+        can be scanned concurrently with `YARA_SCAN_WORKERS` threads.
+
+        Args:
+            file_path (str): path of the file to scan
+            filename (str): name of the file, exposed to the rules as external
+
+        Returns:
+            Tuple[Dict, List[str]]: matches for each repository and errors.
+        """
         result = {}
         errors = []
-        for repo in self.repos:
+        with open(file_path, "rb") as f:
             try:
-                result[str(repo.directory.name)] = repo.analyze(file_path, filename)
-                # free some memory
-                repo._rules = []
-            except Exception as e:
-                logger.warning(
-                    f"{filename} rules analysis failed: {e}", stack_info=True
-                )
-                errors.append(str(e))
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files can't be mapped
+                data = b""
+            try:
+                workers = min(settings.YARA_SCAN_WORKERS, len(self.repos))
+                if workers > 1:
+                    with ThreadPoolExecutor(max_workers=workers) as pool:
+                        outcomes = list(
+                            pool.map(
+                                lambda repo: self._analyze_repo(repo, data, filename),
+                                self.repos,
+                            )
+                        )
+                else:
+                    outcomes = [
+                        self._analyze_repo(repo, data, filename) for repo in self.repos
+                    ]
+            finally:
+                if isinstance(data, mmap.mmap):
+                    data.close()
+        for repo, (matches, error, elapsed) in zip(self.repos, outcomes):
+            name = str(repo.directory.name)
+            # kept out of the report, which maps repositories to their matches
+            logger.info(f"Scanned {filename} with {name} in {elapsed:.3f}s")
+            if error is None:
+                result[name] = matches
+            else:
+                errors.append(error)
         return result, errors
 
     def __repr__(self):
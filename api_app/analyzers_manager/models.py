@@ -122,7 +122,7 @@ class AnalyzerReport(AbstractReport):
                 result[data_model_key] = value
         return result
 
-    def create_data_model(self) -> Optional[BaseDataModel]:
+    def create_data_model(self, save: bool = True) -> Optional[BaseDataModel]:
         # TODO we don't need to actually crate a new object every time.
         #  if the report is the same of the previous one, we can just link it
         if not self._validation_before_data_model():
@@ -131,7 +131,8 @@ class AnalyzerReport(AbstractReport):
 
         self.data_model: BaseDataModel = self.data_model_class.objects.create()
         self.data_model.merge(dictionary)
-        self.save()
+        if save:
+            self.save()
         return self.data_model
 
 
@@ -11,6 +11,7 @@ from django.conf import settings
 
 from api_app.analyzers_manager import classes
 from api_app.analyzers_manager.exceptions import AnalyzerRunException
+from api_app.analyzers_manager.feed_index import JsonFeedIndex
 from api_app.mixins import AbuseCHMixin
 from api_app.models import PluginConfig
 
@@ -48,22 +49,19 @@ class Feodo_Tracker(AbuseCHMixin, classes.ObservableAnalyzer):
             if self.use_recommended_url
             else self.default_locations
         )
-        if self.update_on_run or not os.path.exists(db_location) and not self.update():
+        if (
+            self.update_on_run or not os.path.exists(db_location)
+        ) and not self.update():
             raise AnalyzerRunException("Unable to update database")
         try:
-            with open(db_location, "r", encoding="utf-8") as f:
-                db = json.load(f)
-            # db is a list of dictionaries
-            for ip in db:
-                if ip["ip_address"] == self.observable_name:
-                    result["found"] = True
-                    break
+            # db is a list of dictionaries, indexed by ip address
+            index = JsonFeedIndex.load(db_location, key="ip_address")
+            if self.observable_name in index:
+                result["found"] = True
         except json.JSONDecodeError as e:
             raise AnalyzerRunException(f"Decode JSON in run: {e}")
         except FileNotFoundError as e:
             raise AnalyzerRunException(f"File not found in run: {e}")
-        except KeyError as e:
-            raise AnalyzerRunException(f"Key error in run: {e}")
         return result
 
     # this is necessary because during the "update()" flow the config()
@@ -95,10 +93,18 @@ class Feodo_Tracker(AbuseCHMixin, classes.ObservableAnalyzer):
                 r.raise_for_status()
             except requests.RequestException:
                 return False
+            try:
+                content = json.dumps(r.json())
+            except json.JSONDecodeError:
+                return False
+            if os.path.exists(db_location):
+                with open(db_location, "r", encoding="utf-8") as f:
+                    if f.read() == content:
+                        # keep the index loaded by the workers
+                        logger.info(f"db of Feodo Tracker at {db_location} unchanged")
+                        continue
             with open(db_location, "w", encoding="utf-8") as f:
-                try:
-                    json.dump(r.json(), f)
-                except json.JSONDecodeError:
-                    return False
-                logger.info(f"ended download of db from Feodo Tracker at {db_location}")
+                f.write(content)
+            JsonFeedIndex.build(db_location, key="ip_address")
+            logger.info(f"ended download of db from Feodo Tracker at {db_location}")
         return True
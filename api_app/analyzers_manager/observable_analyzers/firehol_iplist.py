@@ -1,7 +1,6 @@
 # This file is a part of IntelOwl https://github.com/intelowlproject/IntelOwl
 # See the file 'LICENSE' for copying permission.
 
-import ipaddress
 import logging
 import os
 import traceback
@@ -15,6 +14,7 @@ from api_app.analyzers_manager.exceptions import (
     AnalyzerConfigurationException,
     AnalyzerRunException,
 )
+from api_app.analyzers_manager.feed_index import FeedIndex
 
 logger = logging.getLogger(__name__)
 
@@ -38,17 +38,8 @@ class FireHol_IPList(classes.ObservableAnalyzer):
 
             self.check_iplist_status(list_name)
 
-            with open(f"{db_path}/{list_name}", "r", encoding="utf-8") as f:
-                db = f.read()
-
-            db_list = db.split("\n")
-
-            for ip_or_subnet in db_list:
-                if ip_or_subnet and ipaddress.ip_address(ip) in ipaddress.ip_network(
-                    ip_or_subnet
-                ):
-                    result[list_name] = True
-                    break
+            if ip in FeedIndex.load(f"{db_path}/{list_name}", networks=True):
+                result[list_name] = True
 
         return result
 
@@ -79,6 +70,7 @@ class FireHol_IPList(classes.ObservableAnalyzer):
 
             if not os.path.exists(iplist_location):
                 raise AnalyzerRunException(f"failed extraction of {list_name} iplist")
+            FeedIndex.build(iplist_location, networks=True)
 
             logger.info(f"ended download of {list_name} from firehol iplist")
 
@@ -6,6 +6,7 @@ import requests
 from django.conf import settings
 
 from api_app.analyzers_manager import classes
+from api_app.analyzers_manager.feed_index import JsonFeedIndex
 
 logger = logging.getLogger(__name__)
 
@@ -69,6 +70,7 @@ class Ja4DB(classes.ObservableAnalyzer):
 
         with open(database_location, "w", encoding="utf-8") as f:
             json.dump(data, f)
+        JsonFeedIndex.build(database_location, key="ja4_fingerprint")
         logger.info(f"Database updated at {database_location}")
 
     def run(self):
@@ -82,9 +84,9 @@ class Ja4DB(classes.ObservableAnalyzer):
                 f"Database does not exist in {database_location}, initialising..."
             )
             self.update()
-        with open(database_location, "r") as f:
-            db = json.load(f)
-        for application in db:
-            if application["ja4_fingerprint"] == self.observable_name:
-                return application
+        applications = JsonFeedIndex.load(database_location, key="ja4_fingerprint").get(
+            self.observable_name
+        )
+        if applications:
+            return applications[0]
         return {"found": False}
@@ -10,6 +10,7 @@ from django.conf import settings
 
 from api_app.analyzers_manager import classes
 from api_app.analyzers_manager.exceptions import AnalyzerRunException
+from api_app.analyzers_manager.feed_index import FeedIndex
 from api_app.choices import Classification
 
 logger = logging.getLogger(__name__)
@@ -31,15 +32,11 @@ class PhishingArmy(classes.ObservableAnalyzer):
                 f"database location {database_location} does not exist"
             )
 
-        with open(database_location, "r", encoding="utf-8") as f:
-            db = f.read()
-
-        db_list = db.split("\n")
         to_analyze_observable = self.observable_name
         if self.observable_classification == Classification.URL:
             to_analyze_observable = urlparse(self.observable_name).hostname
 
-        if to_analyze_observable in db_list:
+        if to_analyze_observable in FeedIndex.load(database_location):
             result["found"] = True
 
         result["link"] = self.url
@@ -58,6 +55,7 @@ class PhishingArmy(classes.ObservableAnalyzer):
 
             if not os.path.exists(database_location):
                 return False
+            FeedIndex.build(database_location)
 
             logger.info("ended download of db from Phishing Army")
             return True
@@ -1,8 +1,11 @@
-import bisect
 import ipaddress
 import json
 import logging
+import mmap
 import os
+import struct
+import tempfile
+from typing import Dict, Iterable, List
 
 import requests
 from django.conf import settings
@@ -13,6 +16,109 @@ from api_app.choices import Classification
 
 logger = logging.getLogger(__name__)
 
+INDEX_MAGIC = b"IODROP1\n"
+# magic, width in bytes of the keys, number of records
+INDEX_HEADER = struct.Struct(">8sBQ")
+
+
+def _get_record_struct(width: int) -> struct.Struct:
+    # start, end, maximum end of the previous records, offset and length of the entry
+    return struct.Struct(f">{width}s{width}s{width}sQI")
+
+
+def build_index(entries: Iterable[Dict], data_type: str) -> bytes:
+    """Build the binary index of the entries of a drop file.
+
+    Networks are saved as sorted intervals of integers, ASNs as
+    intervals of a single value, so that every lookup is a binary search.
+    The keys are big endian, so that they can be compared as bytes.
+    Every record points to its entry, saved as JSON after the records.
+
+    Args:
+        entries (Iterable[Dict]): entries of the drop file
+        data_type (str): ipv4, ipv6 or asn
+
+    Returns:
+        bytes: the index
+    """
+    width = {"ipv4": 4, "ipv6": 16, "asn": 8}[data_type]
+    rows = []
+    blob = bytearray()
+    for entry in entries:
+        if data_type == "asn":
+            if "asn" not in entry:
+                # metadata
+                continue
+            start = end = int(entry["asn"])
+        else:
+            if "cidr" not in entry:
+                # metadata
+                continue
+            network = ipaddress.ip_network(entry["cidr"], strict=False)
+            start = int(network.network_address)
+            end = int(network.broadcast_address)
+        raw_entry = json.dumps(entry).encode()
+        rows.append((start, end, len(blob), len(raw_entry)))
+        blob += raw_entry
+    rows.sort()
+    record = _get_record_struct(width)
+    index = bytearray(INDEX_HEADER.pack(INDEX_MAGIC, width, len(rows)))
+    max_end = -1
+    for start, end, offset, length in rows:
+        max_end = max(max_end, end)
+        index += record.pack(
+            start.to_bytes(width, "big"),
+            end.to_bytes(width, "big"),
+            max_end.to_bytes(width, "big"),
+            offset,
+            length,
+        )
+    return bytes(index + blob)
+
+
+def lookup_index(index: mmap.mmap, value: int) -> List[Dict]:
+    """Find the entries of the binary index containing the value.
+
+    Args:
+        index (mmap.mmap): index created by `build_index`
+        value (int): ip address or ASN
+
+    Returns:
+        List[Dict]: the matching entries
+    """
+    magic, width, count = INDEX_HEADER.unpack_from(index, 0)
+    if magic != INDEX_MAGIC:
+        raise AnalyzerRunException("Invalid spamhaus drop index")
+    record = _get_record_struct(width)
+    records_offset = INDEX_HEADER.size
+    entries_offset = records_offset + count * record.size
+    try:
+        key = value.to_bytes(width, "big")
+    except OverflowError:
+        return []
+    # last record starting before the value
+    start = struct.Struct(f">{width}s")
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if key < start.unpack_from(index, records_offset + middle * record.size)[0]:
+            high = middle
+        else:
+            low = middle + 1
+    matches = []
+    for i in range(low - 1, -1, -1):
+        _, end, max_end, offset, length = record.unpack_from(
+            index, records_offset + i * record.size
+        )
+        if max_end < key:
+            # no previous record can contain the value
+            break
+        if end >= key:
+            entry = struct.unpack_from(f"{length}s", index, entries_offset + offset)
+            matches.append(json.loads(entry[0]))
+    matches.reverse()
+    return matches
+
 
 class SpamhausDropV4(classes.ObservableAnalyzer):
 
@@ -33,6 +139,23 @@ class SpamhausDropV4(classes.ObservableAnalyzer):
             raise AnalyzerRunException(f"Invalid data_type: {data_type}")
         return f"{settings.MEDIA_ROOT}/{db_name}"
 
+    @classmethod
+    def index_location(cls, data_type: str) -> str:
+        return f"{cls.location(data_type)}.idx"
+
+    @classmethod
+    def _write_index(cls, data: List[Dict], data_type: str) -> None:
+        index_location = cls.index_location(data_type)
+        fd, tmp_location = tempfile.mkstemp(dir=os.path.dirname(index_location))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(build_index(data, data_type))
+            os.replace(tmp_location, index_location)
+        except BaseException:
+            os.unlink(tmp_location)
+            raise
+        logger.info(f"Index updated at {index_location}")
+
     def run(self):
         if self.observable_classification == Classification.IP:
             ip = ipaddress.ip_address(self.observable_name)
@@ -59,31 +182,21 @@ class SpamhausDropV4(classes.ObservableAnalyzer):
                 f"Database does not exist in {database_location}, initialising..."
             )
             self.update()
-        with open(database_location, "r") as f:
-            db = json.load(f)
-
-        matches = []
-
-        if data_type in ["ipv4", "ipv6"]:
-            # IP Matching
-            insertion = bisect.bisect_left(
-                db, ip, key=lambda x: ipaddress.ip_network(x["cidr"]).network_address
+        index_location = self.index_location(data_type)
+        if not os.path.exists(index_location) or os.path.getmtime(
+            index_location
+        ) < os.path.getmtime(database_location):
+            # database downloaded without its index
+            with open(database_location, "r") as f:
+                self._write_index(json.load(f), data_type)
+
+        with open(index_location, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as index:
+            matches = lookup_index(
+                index, int(ip) if data_type in ["ipv4", "ipv6"] else asn
             )
 
-            for i in range(insertion, len(db)):
-                network = ipaddress.ip_network(db[i]["cidr"])
-                if ip in network:
-                    matches.append(db[i])
-                elif network.network_address > ip:
-                    break
-        elif data_type == "asn":
-            # ASN Matching
-            for entry in db[:-1]:
-                if int(entry["asn"]) == asn:
-                    matches.append(entry)
-        else:
-            raise AnalyzerRunException(f"Invalid data_type: {data_type}")
-
         if matches:
             return {"found": True, "details": matches}
 
@@ -113,6 +226,7 @@ class SpamhausDropV4(classes.ObservableAnalyzer):
             with open(database_location, "w", encoding="utf-8") as f:
                 json.dump(data, f)
             logger.info(f"Database updated at {database_location}")
+            cls._write_index(data, data_type)
 
     @staticmethod
     def convert_to_json(input_string) -> dict:
@@ -9,6 +9,7 @@ from django.conf import settings
 
 from api_app.analyzers_manager import classes
 from api_app.analyzers_manager.exceptions import AnalyzerRunException
+from api_app.analyzers_manager.feed_index import FeedIndex
 
 logger = logging.getLogger(__name__)
 
@@ -27,11 +28,7 @@ class TorNodesDanMeUK(classes.ObservableAnalyzer):
                 f"database location {database_location} does not exist"
             )
 
-        with open(database_location, "r", encoding="utf-8") as f:
-            db = f.read()
-
-        db_list = db.split("\n")
-        if self.observable_name in db_list:
+        if self.observable_name in FeedIndex.load(database_location):
             result["found"] = True
             result["nodes_info"] = "https://www.dan.me.uk/torlist/?full"
 
@@ -55,6 +52,7 @@ class TorNodesDanMeUK(classes.ObservableAnalyzer):
 
             if not os.path.exists(database_location):
                 return False
+            FeedIndex.build(database_location)
 
             logger.info("ended download of tor nodes from https://dan.me.uk")
             return True
@@ -8,6 +8,7 @@ from django.conf import settings
 
 from api_app.analyzers_manager.classes import ObservableAnalyzer
 from api_app.analyzers_manager.exceptions import AnalyzerRunException
+from api_app.analyzers_manager.feed_index import JsonFeedIndex
 
 logger = logging.getLogger(__name__)
 
@@ -49,20 +50,19 @@ class TweetFeeds(ObservableAnalyzer):
                 f"Could not find or update db at {default_db} using {default_url}"
             )
 
-        with open(default_db, "r", encoding="utf-8") as f:
-            logger.info(f"TweetFeeds running with {default_db}")
-            db = json.load(f)
-            for tweet in db:
-                if tweet["value"] == self.observable_name:
-                    if self.filter1 and (
-                        self.filter1 in tweet["tags"] or self.filter1 == tweet["user"]
-                    ):
-                        # this checks if our user has demanded for a
-                        # specific filter and return data based on the
-                        # filter in default db
-                        return tweet
-                    elif not self.filter1:
-                        return tweet
+        logger.info(f"TweetFeeds running with {default_db}")
+        for tweet in JsonFeedIndex.load(default_db, key="value").get(
+            self.observable_name
+        ):
+            if self.filter1 and (
+                self.filter1 in tweet["tags"] or self.filter1 == tweet["user"]
+            ):
+                # this checks if our user has demanded for a
+                # specific filter and return data based on the
+                # filter in default db
+                return tweet
+            elif not self.filter1:
+                return tweet
 
         if self.time == "year":
             # we already have the updated data for the month
@@ -104,5 +104,6 @@ class TweetFeeds(ObservableAnalyzer):
             except json.JSONDecodeError as e:
                 logger.error(f"TweetFeeds failed to update {db_url}: {e}")
                 return False
-            logger.info(f"TweetFeeds updated {db_url}")
+        JsonFeedIndex.build(db_location, key="value")
+        logger.info(f"TweetFeeds updated {db_url}")
         return True
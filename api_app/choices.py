@@ -104,6 +104,22 @@ class Status(models.TextChoices):
         ]
 
 
+_URL_PATTERN = re.compile(
+    r"^.+://[a-z\d-]{1,200}"
+    r"(?:\.[a-zA-Z\d\u2044\u2215!#$&(-;=?-\[\]_~]{1,200})+"
+    r"(?::\d{2,6})?"
+    r"(?:/[a-zA-Z\d\u2044\u2215!#$&(-;=?-\[\]_~]{1,200})*"
+    r"(?:\.\w+)?"
+)
+_DOMAIN_PATTERN = re.compile(
+    r"^([\[\\]?\.[\]\\]?)?[a-z\d\-_]{1,63}(([\[\\]?\.[\]\\]?)[a-z\d\-_]{1,63})+$",
+    re.IGNORECASE,
+)
+_HASH_PATTERN = re.compile(r"^(?:[a-f\d]{32}|[a-f\d]{40}|[a-f\d]{64})$", re.IGNORECASE)
+# md5, sha1 and sha256; `$` matches also before a trailing newline
+_HASH_LENGTHS = frozenset((32, 33, 40, 41, 64, 65))
+
+
 class Classification(models.TextChoices):
     IP = "ip"
     URL = "url"
@@ -112,6 +128,27 @@ class Classification(models.TextChoices):
     GENERIC = "generic"
     FILE = "file"
 
+    @classmethod
+    def _calculate_observable(cls, value: str) -> "Classification":
+        # the cheap checks on the value skip the patterns that can't match:
+        # ip addresses need a dot or a colon, urls need a scheme,
+        # domains need a dot and hashes can't have one
+        if ":" in value or (value[:1].isdigit() and "." in value):
+            try:
+                ipaddress.ip_address(value)
+            except ValueError:
+                pass
+            else:
+                return cls.IP
+        if "://" in value and _URL_PATTERN.match(value):
+            return cls.URL
+        if "." in value:
+            if _DOMAIN_PATTERN.match(value):
+                return cls.DOMAIN
+        elif len(value) in _HASH_LENGTHS and _HASH_PATTERN.match(value):
+            return cls.HASH
+        return cls.GENERIC
+
     @classmethod
     def calculate_observable(cls, value: str) -> str:
         """Returns observable classification for the given value.\n
@@ -124,43 +161,47 @@ class Classification(models.TextChoices):
         Returns:
             str: one of `ip`, `url`, `domain`, `hash` or 'generic'.
         """
-        try:
-            ipaddress.ip_address(value)
-        except ValueError:
-            if re.match(
-                r"^.+://[a-z\d-]{1,200}"
-                r"(?:\.[a-zA-Z\d\u2044\u2215!#$&(-;=?-\[\]_~]{1,200})+"
-                r"(?::\d{2,6})?"
-                r"(?:/[a-zA-Z\d\u2044\u2215!#$&(-;=?-\[\]_~]{1,200})*"
-                r"(?:\.\w+)?",
-                value,
-            ):
-                classification = cls.URL
-            elif re.match(
-                r"^([\[\\]?\.[\]\\]?)?[a-z\d\-_]{1,63}"
-                r"(([\[\\]?\.[\]\\]?)[a-z\d\-_]{1,63})+$",
-                value,
-                re.IGNORECASE,
-            ):
-                classification = cls.DOMAIN
-            elif (
-                re.match(r"^[a-f\d]{32}$", value, re.IGNORECASE)
-                or re.match(r"^[a-f\d]{40}$", value, re.IGNORECASE)
-                or re.match(r"^[a-f\d]{64}$", value, re.IGNORECASE)
-            ):
-                classification = cls.HASH
-            else:
-                classification = cls.GENERIC
-                logger.info(
-                    "Couldn't detect observable classification"
-                    f" for {value}, setting as 'generic'"
-                )
-        else:
-            # it's a simple IP
-            classification = cls.IP
-
+        classification = cls._calculate_observable(value)
+        if classification == cls.GENERIC:
+            logger.info(
+                "Couldn't detect observable classification"
+                f" for {value}, setting as 'generic'"
+            )
         return classification
 
+    @classmethod
+    def calculate_observables(cls, values: typing.Iterable[str]) -> typing.List[str]:
+        """Returns observable classifications for the given values,
+        in the same order. Repeated values are classified once.
+
+        Args:
+            values (Iterable[str]):
+                observable values
+        Returns:
+            List[str]: one of `ip`, `url`, `domain`, `hash` or 'generic'
+                for every value.
+        """
+        classifications = {}
+        result = []
+        for value in values:
+            classification = classifications.get(value, None)
+            if classification is None:
+                classification = classifications[value] = cls._calculate_observable(
+                    value
+                )
+            result.append(classification)
+        generics = [
+            value
+            for value, classification in classifications.items()
+            if classification == cls.GENERIC
+        ]
+        if generics:
+            logger.info(
+                "Couldn't detect observable classification"
+                f" for {len(generics)} values, setting as 'generic'"
+            )
+        return result
+
     @classmethod
     def get_data_model_class(cls, classification: str) -> typing.Type:
         from api_app.data_model_manager.models import (
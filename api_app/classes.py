@@ -109,6 +109,17 @@ class Plugin(metaclass=ABCMeta):
         """
         self._job_id = value
 
+    @cached_property
+    def _job_configured_params(self) -> typing.Optional[typing.List]:
+        """
+        Get the parameters resolved while building the pipeline of the job.
+        The secrets are without their value.
+
+        Returns:
+            typing.Optional[typing.List]: The parameters, None if not available.
+        """
+        return self._config.get_job_configured_params(self.job_id)
+
     @cached_property
     def _user(self):
         """
@@ -147,9 +158,14 @@ class Plugin(metaclass=ABCMeta):
         Args:
             runtime_configuration (dict): Runtime configuration parameters.
         """
-        self.__parameters = self._config.read_configured_params(
-            self._user, runtime_configuration
-        )
+        self.__parameters = self._job_configured_params
+        # the values of the secrets are not shared through the cache
+        if self.__parameters is None or any(
+            parameter.is_secret for parameter in self.__parameters
+        ):
+            self.__parameters = self._config.get_configured_params(
+                self._user, runtime_configuration
+            )
         for parameter in self.__parameters:
             attribute_name = (
                 f"_{parameter.name}" if parameter.is_secret else parameter.name
@@ -178,6 +194,8 @@ class Plugin(metaclass=ABCMeta):
     def after_run(self):
         """
         Function called after the run function.
+        The report is saved here, with a single query,
+        after it has been updated by `after_run_success` or `after_run_failed`.
         """
         self.report.end_time = timezone.now()
         self.report.save()
@@ -203,7 +221,6 @@ class Plugin(metaclass=ABCMeta):
 
         self.report.report = report_content
         self.report.status = self.report.STATUSES.SUCCESS.value
-        self.report.save(update_fields=["status", "report"])
 
     def log_error(self, e):
         """
@@ -231,7 +248,6 @@ class Plugin(metaclass=ABCMeta):
         """
         self.report.errors.append(str(e))
         self.report.status = self.report.STATUSES.FAILED
-        self.report.save(update_fields=["status", "errors"])
         if isinstance(e, HTTPError) and (
             hasattr(e, "response")
             and hasattr(e.response, "status_code")
@@ -289,7 +305,18 @@ class Plugin(metaclass=ABCMeta):
         """
         self.job_id = job_id
         self.report: AbstractReport = self._config.generate_empty_report(
-            self._job, task_id, AbstractReport.STATUSES.RUNNING.value
+            self._job,
+            task_id,
+            AbstractReport.STATUSES.RUNNING.value,
+            parameters=(
+                {
+                    parameter.name: parameter.value
+                    for parameter in self._job_configured_params
+                    if not parameter.is_secret
+                }
+                if self._job_configured_params is not None
+                else None
+            ),
         )
         try:
             self.config(runtime_configuration)
@@ -420,9 +447,14 @@ class Plugin(metaclass=ABCMeta):
                 self._user.membership.organization
             )
             if org_configuration.rate_limit_timeout is not None:
-                api_key_parameter = self.__parameters.filter(
-                    name__contains="api_key"
-                ).first()
+                api_key_parameter = next(
+                    (
+                        parameter
+                        for parameter in self.__parameters
+                        if "api_key" in parameter.name
+                    ),
+                    None,
+                )
                 # if we do not have api keys OR the api key was org based
                 # OR if the api key is not actually required and we do not have it set
                 if (
@@ -55,21 +55,28 @@ def get_ip_version(ip_value):
     return ip_type
 
 
+RE_HASH_MAP = {
+    "md5": re.compile(r"^[a-f\d]{32}$", re.IGNORECASE | re.ASCII),
+    "sha-1": re.compile(r"^[a-f\d]{40}$", re.IGNORECASE | re.ASCII),
+    "sha-256": re.compile(r"^[a-f\d]{64}$", re.IGNORECASE | re.ASCII),
+    "sha-512": re.compile(r"^[a-f\d]{128}$", re.IGNORECASE | re.ASCII),
+}
+# `$` matches also before a trailing newline
+RE_HASH_LENGTHS = frozenset(
+    length + newline for length in (32, 40, 64, 128) for newline in (0, 1)
+)
+
+
 def get_hash_type(hash_value):
     """
     Returns hash type
     Supports md5, sha1, sha256 and sha512
     """
-    RE_HASH_MAP = {
-        "md5": re.compile(r"^[a-f\d]{32}$", re.IGNORECASE | re.ASCII),
-        "sha-1": re.compile(r"^[a-f\d]{40}$", re.IGNORECASE | re.ASCII),
-        "sha-256": re.compile(r"^[a-f\d]{64}$", re.IGNORECASE | re.ASCII),
-        "sha-512": re.compile(r"^[a-f\d]{128}$", re.IGNORECASE | re.ASCII),
-    }
-
+    if len(hash_value) not in RE_HASH_LENGTHS:
+        return None
     detected_hash_type = None
     for hash_type, re_hash in RE_HASH_MAP.items():
-        if re.match(re_hash, hash_value):
+        if re_hash.match(hash_value):
             detected_hash_type = hash_type
             break
     return detected_hash_type  # stays None if no matches
@@ -95,3 +95,8 @@ class Ingestor(Plugin, metaclass=abc.ABCMeta):
     @cached_property
     def _job(self) -> None:
         return None
+
+    @cached_property
+    def _job_configured_params(self) -> None:
+        # ingestors are not executed inside a job pipeline
+        return None
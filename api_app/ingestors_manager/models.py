@@ -2,6 +2,7 @@
 # See the file 'LICENSE' for copying permission.
 import logging
 from datetime import timedelta
+from typing import Dict
 
 from django.conf import settings
 from django.db import models
@@ -140,7 +141,9 @@ class IngestorConfig(PythonConfig, CreateJobsFromPlaybookInterface):
 
         return IngestorConfigSerializer
 
-    def generate_empty_report(self, job: Job, task_id: str, status: str):
+    def generate_empty_report(
+        self, job: Job, task_id: str, status: str, parameters: Dict = None
+    ):
         # every time we execute the ingestor we have to create a new report
         # instead of using the update/create
         # because we do not have the same unique constraints
@@ -150,7 +153,11 @@ class IngestorConfig(PythonConfig, CreateJobsFromPlaybookInterface):
             status=status,
             task_id=task_id,
             max_size_report=self.maximum_jobs,
-            parameters=self._get_params(self.user, {}),
+            parameters=(
+                parameters
+                if parameters is not None
+                else self._get_params(self.user, {})
+            ),
         )
 
     def get_or_create_org_configuration(self):
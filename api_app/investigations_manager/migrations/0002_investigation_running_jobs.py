@@ -0,0 +1,36 @@
+from django.db import migrations, models
+from django.db.models import Q
+
+FINAL_STATUSES = ["reported_without_fails", "reported_with_fails", "killed", "failed"]
+
+
+def migrate(apps, schema_editor):
+    Investigation = apps.get_model("investigations_manager", "Investigation")
+    Job = apps.get_model("api_app", "Job")
+    for investigation in Investigation.objects.filter(status="running"):
+        query = Q()
+        for path in Job.objects.filter(investigation=investigation).values_list(
+            "path", flat=True
+        ):
+            query |= Q(path__startswith=path)
+        if query:
+            investigation.running_jobs = (
+                Job.objects.filter(query).exclude(status__in=FINAL_STATUSES).count()
+            )
+            investigation.save(update_fields=["running_jobs"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api_app", "0071_delete_last_elastic_report"),
+        ("investigations_manager", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="investigation",
+            name="running_jobs",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(migrate, migrations.RunPython.noop),
+    ]
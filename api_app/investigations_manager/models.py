@@ -3,8 +3,8 @@ import logging
 from typing import List
 
 from django.conf import settings
-from django.db import models
-from django.db.models import QuerySet
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Q, QuerySet
 from django.utils.timezone import now
 
 from api_app.choices import TLP
@@ -34,6 +34,8 @@ class Investigation(OwnershipAbstractModel, ListCachable):
         max_length=20,
         default=InvestigationStatusChoices.CREATED.value,
     )
+    # jobs of the trees that are not in a final status
+    running_jobs = models.IntegerField(default=0, editable=False)
     STATUSES = InvestigationStatusChoices
 
     objects = InvestigationQuerySet.as_manager()
@@ -63,51 +65,76 @@ class Investigation(OwnershipAbstractModel, ListCachable):
             return True
         return False
 
-    def set_correct_status(self, save: bool = True):
+    def _get_trees_jobs(self) -> QuerySet:
+        # every job of the trees, with a single query
+        query = Q()
+        for path in self.jobs.values_list("path", flat=True):
+            query |= Q(path__startswith=path)
+        return Job.objects.filter(query) if query else Job.objects.none()
 
+    def set_correct_status(self, save: bool = True):
         logger.info(f"Setting status for investigation {self.pk}")
-        # if I have some jobs
-        if self.jobs.exists():
-            # and at least one is running
-            for job in self.jobs.all():
-                job: Job
-                jobs = job.get_tree(job)
-                running_jobs_list = jobs.exclude(
-                    status__in=Job.STATUSES.final_statuses()
-                ).values_list("pk", flat=True)
-                running_jobs_count = len(running_jobs_list)
+        with transaction.atomic():
+            if save:
+                # the counter can't be decremented by the concluded jobs
+                # between the count and the save
+                Investigation.objects.select_for_update().filter(pk=self.pk).exists()
+            stats = self._get_trees_jobs().aggregate(
+                total=Count("pk"),
+                running=Count(
+                    "pk", filter=~Q(status__in=Job.STATUSES.final_statuses())
+                ),
+                end_time=Max("finished_analysis_time"),
+            )
+            self.running_jobs = stats["running"]
+            # if I have some jobs
+            if stats["total"]:
                 logger.info(
-                    f"{running_jobs_count} out of {self.jobs.count()} jobs are still running for investigation {self.pk}"
+                    f"{self.running_jobs} out of {stats['total']} jobs"
+                    f" are still running for investigation {self.pk}"
                 )
-                if running_jobs_count > 0:
-                    logger.info(
-                        f"Jobs {running_jobs_list} are still running for investigation {self.pk}"
-                    )
+                # and at least one is running
+                if self.running_jobs > 0:
                     self.status = self.STATUSES.RUNNING.value
                     self.end_time = None
-                    break
-            # and they are all completed
+                # and they are all completed
+                else:
+                    logger.info(f"Setting investigation {self.pk} to concluded")
+                    self.status = self.STATUSES.CONCLUDED.value
+                    self.end_time = stats["end_time"]
             else:
-                logger.info(f"Setting investigation {self.pk} to concluded")
-                self.status = self.STATUSES.CONCLUDED.value
-                self.end_time = (
-                    self.jobs.order_by("-finished_analysis_time")
-                    .first()
-                    .finished_analysis_time
-                )
-        else:
-            logger.info(f"Setting investigation {self.pk} to created")
-            self.status = self.STATUSES.CREATED.value
-            self.end_time = None
-        if save:
-            self.save(update_fields=["status", "end_time"])
+                logger.info(f"Setting investigation {self.pk} to created")
+                self.status = self.STATUSES.CREATED.value
+                self.end_time = None
+            if save:
+                self.save(update_fields=["status", "end_time", "running_jobs"])
+
+    def job_concluded(self, job: Job) -> None:
+        """Update the status after a job of the investigation concluded.
+
+        Only the counter of the running jobs is updated,
+        the jobs are counted again only when it reaches zero.
+
+        Args:
+            job (Job): the concluded job
+        """
+        Investigation.objects.filter(pk=self.pk).update(
+            running_jobs=F("running_jobs") - 1
+        )
+        self.refresh_from_db(fields=["running_jobs"])
+        if self.running_jobs > 0:
+            logger.info(
+                f"Job {job.pk} concluded, {self.running_jobs} jobs"
+                f" are still running for investigation {self.pk}"
+            )
+            return
+        # confirm the conclusion, fixing the counter if needed
+        self.set_correct_status(save=True)
 
     @classmethod
     def investigation_for_analyzable(
         cls, queryset: models.QuerySet, analyzed_object_name: str
     ) -> models.QuerySet:
-        from django.db.models import Q
-
         jobs = Job.objects.filter(
             Q(finished_analysis_time__gte=now() - datetime.timedelta(days=30))
         )
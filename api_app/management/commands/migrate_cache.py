@@ -0,0 +1,45 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import BaseCommand
+
+from intel_owl.settings.cache import DatabaseCacheExtended, plain_key
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    # NOTE: this command is runned by uwsgi startup script
+
+    help = "Move the entries cached in the database to the configured cache"
+
+    def handle(self, *args, **options):
+        if isinstance(cache, DatabaseCacheExtended):
+            self.stdout.write("The cache is stored in the database, nothing to move")
+            return
+        database_cache = DatabaseCacheExtended(
+            settings.DATABASE_CACHE_LOCATION, {"KEY_FUNCTION": plain_key}
+        )
+        expires = database_cache.get_expires_where("")
+        # expired entries are not returned
+        values = database_cache.get_many(list(expires.keys()))
+        now = time.time()
+        moved = 0
+        for key, value in values.items():
+            if expires[key].year == 9999:
+                # cached without expiration
+                timeout = None
+            else:
+                timeout = expires[key].timestamp() - now
+                if timeout <= 0:
+                    continue
+            # entries already cached in the new backend are more recent
+            if cache.add(key, value, timeout=timeout):
+                moved += 1
+        # stale entries must not come back if the database cache is restored
+        database_cache.clear()
+        self.stdout.write(
+            self.style.SUCCESS(f"Moved {moved} entries from the database cache")
+        )
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api_app", "0071_delete_last_elastic_report"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LastElasticReportUpdate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "last_update_datetime",
+                    models.DateTimeField(blank=True, default=None, null=True),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api_app", "0072_last_elastic_report_update"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="analysis_fingerprint",
+            field=models.CharField(
+                blank=True, default=None, editable=False, max_length=64, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                fields=["analyzable", "analysis_fingerprint", "received_request_time"],
+                name="JobPreviousAnalysis",
+            ),
+        ),
+    ]
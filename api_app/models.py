@@ -1,16 +1,21 @@
 # This file is a part of IntelOwl https://github.com/intelowlproject/IntelOwl
 # See the file 'LICENSE' for copying permission.
+import copy
 import datetime
+import hashlib
 import json
 import logging
+import threading
 import typing
 import uuid
+from collections import OrderedDict
 from typing import TYPE_CHECKING, Any, Dict, Optional, Type
 
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
 from django.utils.timezone import now
 from django_celery_beat.models import ClockedSchedule, CrontabSchedule, PeriodicTask
+from solo.models import SingletonModel
 from treebeard.mp_tree import MP_Node
 
 from api_app.analyzables_manager.models import Analyzable
@@ -344,6 +349,10 @@ class Job(MP_Node):
             # SELECT COUNT(*) AS "__count" FROM "api_app_job"
             # WHERE ("api_app_job"."depth" >= ? AND "api_app_job"."path"::text LIKE ? AND NOT ("api_app_job"."id" = ?))
             models.Index(fields=["depth", "path", "id"], name="MPNodeSearch"),
+            models.Index(
+                fields=["analyzable", "analysis_fingerprint", "received_request_time"],
+                name="JobPreviousAnalysis",
+            ),
         ]
 
     # constants
@@ -434,6 +443,10 @@ class Job(MP_Node):
     scan_check_time = models.DurationField(
         null=True, blank=True, default=datetime.timedelta(hours=24)
     )
+    # jobs with the same fingerprint ran the same plugins
+    analysis_fingerprint = models.CharField(
+        max_length=64, null=True, blank=True, default=None, editable=False
+    )
     sent_to_bi = models.BooleanField(editable=False, default=False)
     data_model_content_type = models.ForeignKey(
         ContentType,
@@ -465,6 +478,38 @@ class Job(MP_Node):
     def is_sample(self) -> bool:
         return self.analyzable.is_sample
 
+    @classmethod
+    def get_analysis_fingerprint(
+        cls,
+        analyzers: typing.Iterable["PythonConfig"],
+        connectors: typing.Iterable["PythonConfig"],
+        visualizers: typing.Iterable["PythonConfig"],
+        playbook: "AbstractConfig" = None,
+    ) -> str:
+        """
+        Fingerprint of the plugins executed by a job,
+        used to find previous jobs that ran the same analysis.
+
+        Args:
+            analyzers (Iterable[PythonConfig]): analyzers to execute
+            connectors (Iterable[PythonConfig]): connectors to execute
+            visualizers (Iterable[PythonConfig]): visualizers to execute
+            playbook (AbstractConfig): playbook to execute, if any
+
+        Returns:
+            str: sha256 of the sorted names of the plugins and of the playbook
+        """
+        return hashlib.sha256(
+            json.dumps(
+                [
+                    sorted(plugin.name for plugin in analyzers),
+                    sorted(plugin.name for plugin in connectors),
+                    sorted(plugin.name for plugin in visualizers),
+                    playbook.name if playbook else None,
+                ]
+            ).encode("utf-8")
+        ).hexdigest()
+
     @cached_property
     def parent_job(self) -> Optional["Job"]:
         """
@@ -498,6 +543,9 @@ class Job(MP_Node):
         """
         self.status = self.STATUSES.RUNNING
         self.save(update_fields=["status"])
+        if root_investigation := self.get_root().investigation:
+            # the job is running again
+            root_investigation.set_correct_status(save=True)
 
         runner = self._get_pipeline(
             analyzers=self.analyzerreports.filter_retryable().get_configurations(),
@@ -514,6 +562,7 @@ class Job(MP_Node):
 
     def set_final_status(self) -> None:
         logger.info(f"[STARTING] set_final_status for <-- {self}.")
+        was_running = self.status not in self.STATUSES.final_statuses()
 
         if self.status == self.STATUSES.FAILED:
             logger.error(
@@ -542,13 +591,21 @@ class Job(MP_Node):
                 "finished_analysis_time",
             ]
         )
-        # we update the status of the analysis
+        if was_running:
+            # we update the status of the analysis
+            self.update_investigation_status()
+
+    def update_investigation_status(self) -> None:
+        """
+        Notify the investigation of the job, if any, that the job concluded.
+        It must be called once, after the job was saved with a final status.
+        """
         if root_investigation := self.get_root().investigation:
             from api_app.investigations_manager.models import Investigation
 
             logger.info(f"Updating status of investigation {root_investigation.pk}")
             root_investigation: Investigation
-            root_investigation.set_correct_status(save=True)
+            root_investigation.job_concluded(self)
 
     def __get_config_reports(self, config: typing.Type["AbstractConfig"]) -> QuerySet:
         return getattr(self, f"{config.__name__.split('Config')[0].lower()}reports")
@@ -560,32 +617,23 @@ class Job(MP_Node):
             self, f"{config.__name__.split('Config')[0].lower()}s_to_execute"
         )
 
-    def __get_single_config_reports_stats(
-        self, config: typing.Type["AbstractConfig"]
-    ) -> typing.Dict:
-        reports = self.__get_config_reports(config)
-        aggregators = {
-            s.lower(): models.Count("status", filter=models.Q(status=s))
-            for s in AbstractReport.STATUSES.values
-        }
-        return reports.aggregate(
-            all=models.Count("status"),
-            **aggregators,
-        )
-
     def _get_config_reports_stats(self) -> typing.Dict:
         from api_app.analyzers_manager.models import AnalyzerConfig
         from api_app.connectors_manager.models import ConnectorConfig
         from api_app.visualizers_manager.models import VisualizerConfig
 
-        result = {}
-        for config in [AnalyzerConfig, ConnectorConfig, VisualizerConfig]:
-            partial_result = self.__get_single_config_reports_stats(config)
-            # merge them
-            result = {
-                k: result.get(k, 0) + partial_result.get(k, 0)
-                for k in set(result) | set(partial_result)
-            }
+        result = {"all": 0, **{s.lower(): 0 for s in AbstractReport.STATUSES.values}}
+        reports = [
+            self.__get_config_reports(config)
+            .values("status")
+            .annotate(count=models.Count("pk"))
+            .order_by()
+            for config in [AnalyzerConfig, ConnectorConfig, VisualizerConfig]
+        ]
+        # a single query for the reports of every type
+        for row in reports[0].union(*reports[1:], all=True):
+            result["all"] += row["count"]
+            result[row["status"].lower()] += row["count"]
         return result
 
     def kill_if_ongoing(self):
@@ -610,8 +658,11 @@ class Job(MP_Node):
 
             reports.update(status=self.STATUSES.KILLED, end_time=now())
 
+        was_running = self.status not in self.STATUSES.final_statuses()
         self.status = self.STATUSES.KILLED
         self.save(update_fields=["status"])
+        if was_running:
+            self.update_investigation_status()
         JobConsumer.serialize_and_send_job(self)
 
     def _get_signatures(self, queryset: PythonConfigQuerySet) -> Signature:
@@ -944,7 +995,9 @@ class PluginConfig(OwnershipAbstractModel):
                     membership__organization=self.owner.membership.organization
                 ):
                     self.config.delete_class_cache_keys(user)
-                    self.config.refresh_cache_keys(user)
+                self.config.refresh_cache_keys(
+                    organization=self.owner.membership.organization
+                )
             else:
                 self.owner: User
                 self.config.delete_class_cache_keys(self.owner)
@@ -1476,6 +1529,21 @@ class PythonConfig(AbstractConfig):
     )
     health_check_status = models.BooleanField(default=True, editable=False)
 
+    # process-local cache of the parameters resolved by `get_configured_params`.
+    # Every worker process has its own copy: entries are tagged with the
+    # generation stored in the shared cache, so that an invalidation triggered
+    # in any process makes them stale everywhere.
+    CONFIGURED_PARAMS_GENERATION_KEY = "configured_params_generation"
+    _configured_params_cache: typing.Dict[
+        typing.Tuple, typing.Tuple[str, typing.List["Parameter"]]
+    ] = OrderedDict()
+    _configured_params_lock = threading.Lock()
+
+    # scopes of the cached representations of the configuration,
+    # see `PythonConfigListSerializer`
+    BASE_CACHE_SCOPE = "base"
+    DEFAULT_CACHE_SCOPE = "default"
+
     class Meta:
         abstract = True
         indexes = [
@@ -1560,11 +1628,13 @@ class PythonConfig(AbstractConfig):
         """
         return {
             parameter.name: parameter.value
-            for parameter in self.read_configured_params(user, runtime_configuration)
+            for parameter in self.get_configured_params(user, runtime_configuration)
             if not parameter.is_secret
         }
 
-    def generate_empty_report(self, job: Job, task_id: str, status: str):
+    def generate_empty_report(
+        self, job: Job, task_id: str, status: str, parameters: Dict = None
+    ):
         """
         Generates an empty report for the plugin.
 
@@ -1572,10 +1642,15 @@ class PythonConfig(AbstractConfig):
             job (Job): The job associated with the report.
             task_id (str): The ID of the task generating the report.
             status (str): The status of the report.
+            parameters (Dict): The already resolved non-secret parameters (optional).
 
         Returns:
             AbstractReport: The generated report.
         """
+        if parameters is None:
+            parameters = self._get_params(
+                job.user, job.get_config_runtime_configuration(self)
+            )
         return self.python_module.python_class.report_model.objects.update_or_create(
             job=job,
             config=self,
@@ -1584,36 +1659,58 @@ class PythonConfig(AbstractConfig):
                 "task_id": task_id,
                 "start_time": now(),
                 "end_time": now(),
-                "parameters": self._get_params(
-                    job.user, job.get_config_runtime_configuration(self)
-                ),
+                "parameters": parameters,
             },
         )[0]
 
-    def refresh_cache_keys(self, user: User = None):
+    @staticmethod
+    def get_user_cache_scope(username: str) -> str:
+        return f"user_{username}"
+
+    @staticmethod
+    def get_organization_cache_scope(organization: Organization) -> str:
+        return f"org_{organization.pk}"
+
+    def get_cache_key(self, scope: str) -> str:
         """
-        Refreshes the cache keys associated with the plugin configuration.
+        Returns the key of a cached representation of the configuration.
 
         Args:
-            user (User): The user for whom the cache keys are refreshed (optional).
+            scope (str): The scope of the representation.
+
+        Returns:
+            str: The cache key.
         """
-        from api_app.serializers.plugin import PythonConfigListSerializer
+        return f"serializer_{self.__class__.__name__}_{self.name}_{scope}"
 
-        base_key = (
-            f"{self.__class__.__name__}_{self.name}_{user.username if user else ''}"
-        )
-        for key in cache.get_where(f"serializer_{base_key}").keys():
-            logger.debug(f"Deleting cache key {key}")
-            cache.delete(key)
+    def refresh_cache_keys(self, user: User = None, organization: Organization = None):
+        """
+        Deletes the cached representations of the plugin configuration.
+        They are built again when they are requested.
+
+        Args:
+            user (User): Only the representation of the user is deleted (optional).
+            organization (Organization): Only the representations of the members
+                of the organization are deleted (optional).
+        """
         if user:
-            PythonConfigListSerializer(
-                child=self.serializer_class()
-            ).to_representation_single_plugin(self, user)
+            keys = [self.get_cache_key(self.get_user_cache_scope(user.username))]
+        elif organization:
+            keys = [self.get_cache_key(self.get_organization_cache_scope(organization))]
+            # members with their own plugin configs have their own representation
+            for username in (
+                PluginConfig.objects.filter(
+                    owner__membership__organization=organization,
+                    **{self.snake_case_name: self.pk},
+                )
+                .values_list("owner__username", flat=True)
+                .distinct()
+            ):
+                keys.append(self.get_cache_key(self.get_user_cache_scope(username)))
         else:
-            for generic_user in User.objects.exclude(email=""):
-                PythonConfigListSerializer(
-                    child=self.serializer_class()
-                ).to_representation_single_plugin(self, generic_user)
+            keys = list(cache.get_where(self.get_cache_key("")).keys())
+        logger.debug(f"Deleting cache keys {keys}")
+        cache.delete_many(keys)
 
     @classmethod
     @property
@@ -1783,6 +1880,165 @@ class PythonConfig(AbstractConfig):
             return params.filter(Q(configured=True) | Q(value__isnull=False))
         return params.filter(configured=True)
 
+    @classmethod
+    def _get_job_configured_params_cache_key(cls, job_pk: int) -> str:
+        """
+        Returns the cache key of the parameters resolved for a job.
+
+        Args:
+            job_pk (int): The primary key of the job.
+
+        Returns:
+            str: The cache key.
+        """
+        return f"job_configured_params_{cls.__name__}_{job_pk}"
+
+    @classmethod
+    def set_job_configured_params(
+        cls, job_pk: int, configured_params: Dict[int, typing.List["Parameter"]]
+    ) -> None:
+        """
+        Stores the parameters resolved while building the pipeline of a job,
+        so that the workers do not have to resolve them again.
+        The values of the secrets are not stored: the shared cache must not
+        keep a copy of the credentials of the plugins.
+
+        Args:
+            job_pk (int): The primary key of the job.
+            configured_params (Dict): The configured parameters by configuration pk.
+        """
+        key = cls._get_job_configured_params_cache_key(job_pk)
+        # a retry of a single plugin must not drop the other ones
+        job_configured_params = cache.get(key, {})
+        for config_pk, params in configured_params.items():
+            job_configured_params[config_pk] = [
+                param if not param.is_secret else cls._without_value(param)
+                for param in params
+            ]
+        cache.set(
+            key,
+            job_configured_params,
+            timeout=settings.JOB_CONFIGURED_PARAMS_CACHE_TIMEOUT,
+        )
+
+    @staticmethod
+    def _without_value(param: "Parameter") -> "Parameter":
+        param = copy.copy(param)
+        param.value = None
+        return param
+
+    def get_job_configured_params(
+        self, job_pk: int
+    ) -> Optional[typing.List["Parameter"]]:
+        """
+        Returns the parameters resolved while building the pipeline of a job.
+        The secrets are returned without their value.
+
+        Args:
+            job_pk (int): The primary key of the job.
+
+        Returns:
+            list[Parameter]: The configured parameters, None if not available.
+        """
+        job_configured_params = cache.get(
+            self._get_job_configured_params_cache_key(job_pk)
+        )
+        if not job_configured_params or self.pk not in job_configured_params:
+            return None
+        return list(job_configured_params[self.pk])
+
+    @classmethod
+    def _get_configured_params_generation(cls) -> str:
+        """
+        Returns the current generation of the configured parameters cache.
+
+        Returns:
+            str: The generation shared by every worker process.
+        """
+        generation = cache.get(cls.CONFIGURED_PARAMS_GENERATION_KEY)
+        if generation is None:
+            # a random value instead of a counter:
+            # a reset of the shared cache must never revive old entries
+            cache.add(
+                cls.CONFIGURED_PARAMS_GENERATION_KEY, uuid.uuid4().hex, timeout=None
+            )
+            generation = cache.get(cls.CONFIGURED_PARAMS_GENERATION_KEY)
+        return generation
+
+    @classmethod
+    def invalidate_configured_params_cache(cls) -> None:
+        """
+        Invalidates the configured parameters cached by every worker process.
+        """
+        logger.debug("Invalidating configured parameters cache")
+        cache.set(cls.CONFIGURED_PARAMS_GENERATION_KEY, uuid.uuid4().hex, timeout=None)
+        with cls._configured_params_lock:
+            cls._configured_params_cache.clear()
+
+    def _get_configured_params_cache_key(
+        self, user: User = None, config_runtime: Dict = None
+    ) -> typing.Tuple:
+        """
+        Returns the key of the configured parameters cache.
+
+        Args:
+            user (User): The user for whom the parameters are read.
+            config_runtime (Dict): The runtime configuration settings.
+
+        Returns:
+            tuple: The cache key.
+        """
+        organization_pk = (
+            user.membership.organization_id if user and user.has_membership() else None
+        )
+        runtime_hash = hashlib.sha256(
+            json.dumps(config_runtime or {}, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        return (
+            self.__class__.__name__,
+            self.pk,
+            user.pk if user else None,
+            organization_pk,
+            runtime_hash,
+        )
+
+    def get_configured_params(
+        self, user: User = None, config_runtime: Dict = None
+    ) -> typing.List["Parameter"]:
+        """
+        Cached version of `read_configured_params`.
+
+        Args:
+            user (User): The user for whom the parameters are read.
+            config_runtime (Dict): The runtime configuration settings.
+
+        Returns:
+            list[Parameter]: The configured parameters.
+        """
+        generation = self._get_configured_params_generation()
+        key = self._get_configured_params_cache_key(user, config_runtime)
+        cls = self.__class__
+        with cls._configured_params_lock:
+            cached = cls._configured_params_cache.get(key)
+            if cached is not None and cached[0] == generation:
+                cls._configured_params_cache.move_to_end(key)
+                return list(cached[1])
+        # a missing required parameter raises here, so it is never cached
+        params = list(
+            self.read_configured_params(user, config_runtime).select_related(
+                "python_module"
+            )
+        )
+        with cls._configured_params_lock:
+            cls._configured_params_cache[key] = (generation, params)
+            cls._configured_params_cache.move_to_end(key)
+            while (
+                len(cls._configured_params_cache)
+                > settings.CONFIGURED_PARAMS_CACHE_MAX_ENTRIES
+            ):
+                cls._configured_params_cache.popitem(last=False)
+        return list(params)
+
     def generate_health_check_periodic_task(self):
         """
         Generates a periodic task for health checks.
@@ -1814,3 +2070,15 @@ class PythonConfig(AbstractConfig):
             )[0]
             self.health_check_task = periodic_task
             self.save()
+
+
+class LastElasticReportUpdate(SingletonModel):
+    """
+    Checkpoint of the plugin reports indexed in Elasticsearch.
+
+    Attributes:
+        last_update_datetime (DateTimeField): reports concluded before
+            this time were already indexed.
+    """
+
+    last_update_datetime = models.DateTimeField(null=True, blank=True, default=None)
@@ -4,24 +4,26 @@ This module defines custom query sets for various models used in the IntelOwl pr
 Each query set provides additional methods for filtering, annotating, and manipulating
 query results specific to the needs of the IntelOwl application.
 """
+import copy
 import datetime
 import json
 import uuid
-from typing import TYPE_CHECKING, Generator, Type
+from collections import defaultdict, deque
+from typing import TYPE_CHECKING, Dict, Generator, List, Tuple, Type
 
 from django.conf import settings
 from django.contrib.postgres.expressions import ArraySubquery
-from django.core.paginator import Paginator
 from treebeard.mp_tree import MP_NodeQuerySet
 
 if TYPE_CHECKING:
-    from api_app.models import PythonConfig
+    from api_app.models import AbstractReport, Job, Parameter, PythonConfig
     from api_app.serializers import AbstractBIInterface
 
 import logging
 
 from celery.canvas import Signature
-from django.db import IntegrityError, models
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
 from django.db.models import (
     BooleanField,
     Case,
@@ -64,11 +66,19 @@ class SendToBiQuerySet(models.QuerySet):
         """
         raise NotImplementedError()
 
-    @staticmethod
-    def _create_index_template():
+    # field ordering the objects sent to the BI, newest first
+    BI_TIMESTAMP_FIELD = "start_time"
+    # the template is created once for every process
+    _bi_index_template_created = False
+
+    @classmethod
+    def _create_index_template(cls):
         """
-        Creates an index template in Elasticsearch for BI data.
+        Creates an index template in Elasticsearch for BI data,
+        if it was not already created by this process.
         """
+        if SendToBiQuerySet._bi_index_template_created:
+            return
         with open(
             settings.CONFIG_ROOT / "elastic_search_mappings" / "intel_owl_bi.json"
         ) as f:
@@ -80,47 +90,109 @@ class SendToBiQuerySet(models.QuerySet):
             logger.info(
                 f"created template for Elastic named {settings.ELASTICSEARCH_BI_INDEX}"
             )
+        SendToBiQuerySet._bi_index_template_created = True
+
+    def _get_bi_related_fields(self) -> List[str]:
+        """
+        Relations used by the BI serializer, selected with the objects.
+        """
+        return []
 
-    def send_to_elastic_as_bi(self, max_timeout: int = 60) -> bool:
+    def _iterate_bi_pages(
+        self, max_objects: int, page_size: int
+    ) -> Generator[List[models.Model], None, None]:
+        """
+        Yields the objects of the queryset, newest first, in pages
+        found with keyset pagination on (`BI_TIMESTAMP_FIELD`, pk).
+
+        Every page is a query on the index of the timestamp,
+        without the OFFSET of the previous pages, so the objects
+        marked as sent meanwhile do not shift the following pages.
+
+        Args:
+            max_objects (int): The maximum number of objects.
+            page_size (int): The number of objects of every page.
+        """
+        field = self.BI_TIMESTAMP_FIELD
+        queryset = self.select_related(*self._get_bi_related_fields()).order_by(
+            f"-{field}", "-pk"
+        )
+        last = None
+        while max_objects > 0:
+            page_queryset = queryset
+            if last is not None:
+                # a range on the timestamp, so that the index is scanned
+                page_queryset = page_queryset.filter(
+                    **{f"{field}__lte": getattr(last, field)}
+                ).exclude(**{field: getattr(last, field), "pk__gte": last.pk})
+            page = list(page_queryset[: min(page_size, max_objects)])
+            if not page:
+                return
+            yield page
+            max_objects -= len(page)
+            last = page[-1]
+
+    def send_to_elastic_as_bi(
+        self, max_timeout: int = 60, max_objects: int = 10000, page_size: int = 1000
+    ) -> bool:
         """
         Sends the queryset's data to an Elasticsearch BI index.
 
+        Documents are serialized one page at a time and streamed
+        to Elasticsearch, the objects are marked as sent with one query
+        for every page, using the results of the bulk requests.
+
         Args:
             max_timeout (int): The maximum request timeout in seconds.
+            max_objects (int): The maximum number of objects to send.
+            page_size (int): The number of objects serialized and marked together.
 
         Returns:
             bool: True if there were errors during the operation, False otherwise.
         """
-        from elasticsearch.helpers import bulk
+        from elasticsearch.helpers import streaming_bulk
 
         logger.info("BI start")
         self._create_index_template()
-        BULK_MAX_SIZE = 1000
-        found_errors = False
-
-        p = Paginator(self, BULK_MAX_SIZE)
-        for i in p.page_range:
-            page = p.get_page(i)
-            objects = page.object_list
-            serializer = self._get_bi_serializer_class()(instance=objects, many=True)
-            objects_serialized = serializer.data
-            _, errors = bulk(
-                settings.ELASTICSEARCH_BI_CLIENT,
-                objects_serialized,
-                request_timeout=max_timeout,
-            )
-            if errors:
-                logger.error(
-                    f"Errors on sending to elastic: {errors}."
-                    " We are not marking objects as sent."
-                )
-                found_errors |= errors
+        serializer_class = self._get_bi_serializer_class()
+        # pks of the documents waiting for their result, in the order they are sent
+        pending = deque()
+
+        def documents():
+            for page in self._iterate_bi_pages(max_objects, page_size):
+                for obj, document in zip(
+                    page, serializer_class(instance=page, many=True).data
+                ):
+                    pending.append(obj.pk)
+                    yield document
+
+        errors = []
+        sent = []
+        for ok, item in streaming_bulk(
+            settings.ELASTICSEARCH_BI_CLIENT,
+            documents(),
+            chunk_size=page_size,
+            raise_on_error=False,
+            raise_on_exception=False,
+            request_timeout=max_timeout,
+        ):
+            pk = pending.popleft()
+            if ok:
+                sent.append(pk)
             else:
-                logger.info("BI sent")
-                self.model.objects.filter(
-                    pk__in=objects.values_list("pk", flat=True)
-                ).update(sent_to_bi=True)
-        return found_errors
+                errors.append(item)
+            if len(sent) >= page_size:
+                self.model.objects.filter(pk__in=sent).update(sent_to_bi=True)
+                sent = []
+        if sent:
+            self.model.objects.filter(pk__in=sent).update(sent_to_bi=True)
+        if errors:
+            logger.error(
+                f"{len(errors)} errors on sending to elastic, first one: {errors[0]}."
+                " We are not marking those objects as sent."
+            )
+        logger.info("BI sent")
+        return bool(errors)
 
 
 class CleanOnCreateQuerySet(models.QuerySet):
@@ -292,6 +364,43 @@ class JobQuerySet(MP_NodeQuerySet, CleanOnCreateQuerySet, SendToBiQuerySet):
                 if attempt == total_attempt_number - 1:
                     raise
 
+    def bulk_create_roots(
+        self, jobs: List["Job"], batch_size: int = 5000
+    ) -> List["Job"]:
+        """
+        Creates many root jobs with a bulk insert for every batch.
+
+        The paths of the new roots follow the last root,
+        like ``add_root`` does for a single job. Signals are not sent.
+
+        Args:
+            jobs (List[Job]): The jobs to create, without a path.
+            batch_size (int): The number of jobs inserted at once.
+
+        Returns:
+            List[Job]: The created jobs, with their primary keys.
+        """
+        # try multiple times hoping to for no race conditions
+        total_attempt_number = 5
+        for attempt in range(0, total_attempt_number):
+            last_root = self.model.get_last_root_node()
+            last_step = self.model._str2int(last_root.path) if last_root else 0
+            for step, job in enumerate(jobs, start=last_step + 1):
+                # primary keys of a failed attempt are discarded
+                job.pk = None
+                job.path = self.model._get_path(None, 1, step)
+                job.depth = 1
+                job.numchild = 0
+            try:
+                with transaction.atomic():
+                    return self.bulk_create(jobs, batch_size=batch_size)
+            except IntegrityError:
+                logger.warning(
+                    f"Found race condition for {len(jobs)} jobs. Trying again to calculate paths."
+                )
+                if attempt == total_attempt_number - 1:
+                    raise
+
     def delete(self, *args, **kwargs):
         """
         Deletes jobs, ensuring the correct method is called.
@@ -303,6 +412,108 @@ class JobQuerySet(MP_NodeQuerySet, CleanOnCreateQuerySet, SendToBiQuerySet):
         # just to be sure to call the correct method
         return MP_NodeQuerySet.delete(self, *args, **kwargs)
 
+    def bulk_delete(self) -> Tuple[int, List[str]]:
+        """
+        Deletes the jobs with their subtrees using set-based queries.
+
+        Unlike `delete`, the jobs and their related rows are not loaded
+        and no delete signal is sent: reports and many to many rows are deleted
+        with one query for every table, the parents of the subtrees keep
+        the correct number of children, investigations left without jobs
+        are deleted. The files of the analyzables left without jobs
+        are cleared from the analyzables, but they are not removed from the storage.
+
+        Returns:
+            Tuple[int, List[str]]: The number of deleted jobs and the names
+            of the files of the analyzables left without jobs.
+        """
+        from api_app.analyzables_manager.models import Analyzable
+        from api_app.investigations_manager.models import Investigation
+
+        # ancestors come before their descendants
+        roots = []
+        for path in sorted(self.values_list("path", flat=True)):
+            if not roots or not path.startswith(roots[-1]):
+                roots.append(path)
+        if not roots:
+            return 0, []
+        subtrees = Q()
+        for path in roots:
+            subtrees |= Q(path__startswith=path)
+
+        with transaction.atomic(using=self.db):
+            jobs = list(
+                self.model.objects.using(self.db)
+                .filter(subtrees)
+                .values_list("pk", "analyzable_id", "investigation_id", "status")
+            )
+            pks = [pk for pk, *_ in jobs]
+            for related in self.model._meta.related_objects:
+                related_objects = related.related_model._base_manager.using(
+                    self.db
+                ).filter(**{f"{related.field.name}__in": pks})
+                if related.on_delete is models.SET_NULL:
+                    related_objects.update(**{related.field.name: None})
+                elif (
+                    related.on_delete is models.CASCADE
+                    and not related.related_model._meta.related_objects
+                ):
+                    related_objects._raw_delete(self.db)
+                else:
+                    related_objects.delete()
+            for field in self.model._meta.many_to_many:
+                field.remote_field.through._base_manager.using(self.db).filter(
+                    **{f"{field.m2m_field_name()}__in": pks}
+                )._raw_delete(self.db)
+            deleted = (
+                self.model._base_manager.using(self.db)
+                .filter(pk__in=pks)
+                ._raw_delete(self.db)
+            )
+
+            # the parents outside the subtrees lose their children
+            parents = defaultdict(int)
+            for path in roots:
+                if len(path) > self.model.steplen:
+                    parents[path[: -self.model.steplen]] += 1
+            for parent_path, children in parents.items():
+                self.model.objects.using(self.db).filter(path=parent_path).update(
+                    numchild=F("numchild") - children
+                )
+
+            investigations = Investigation.objects.using(self.db).filter(
+                pk__in={
+                    investigation for _, _, investigation, _ in jobs if investigation
+                }
+            )
+            investigations.filter(
+                ~Exists(self.model.objects.filter(investigation=OuterRef("pk")))
+            ).delete()
+            if any(
+                status not in self.model.STATUSES.final_statuses()
+                for *_, status in jobs
+            ):
+                # running jobs are not counted anymore
+                for investigation in investigations:
+                    investigation.set_correct_status(save=True)
+
+            orphans = (
+                Analyzable.objects.using(self.db)
+                .filter(pk__in={analyzable for _, analyzable, *_ in jobs})
+                .exclude(Q(file="") | Q(file__isnull=True))
+                .filter(~Exists(self.model.objects.filter(analyzable=OuterRef("pk"))))
+            )
+            orphans = dict(orphans.values_list("pk", "file"))
+            Analyzable.objects.using(self.db).filter(pk__in=orphans.keys()).update(
+                file=""
+            )
+        return deleted, list(orphans.values())
+
+    BI_TIMESTAMP_FIELD = "received_request_time"
+
+    def _get_bi_related_fields(self) -> List[str]:
+        return ["user", "analyzable", "playbook_to_execute"]
+
     @classmethod
     def _get_bi_serializer_class(cls):
         """
@@ -676,6 +887,9 @@ class AbstractReportQuerySet(SendToBiQuerySet):
     - get_configurations: Retrieves configurations associated with the reports.
     """
 
+    def _get_bi_related_fields(self) -> List[str]:
+        return ["job__user", "config"]
+
     def filter_completed(self):
         """
         Filters reports that are completed.
@@ -816,6 +1030,8 @@ class PythonConfigQuerySet(AbstractConfigQuerySet):
     Methods:
     - annotate_configured: Annotates configurations indicating if they are fully configured.
     - annotate_runnable: Annotates configurations indicating if they are runnable.
+    - resolve_configured_params: Resolves in bulk the parameters of every configuration.
+    - generate_empty_reports: Generates in bulk the empty reports of every configuration.
     - get_signatures: Generates task signatures for each configuration.
     """
 
@@ -920,6 +1136,180 @@ class PythonConfigQuerySet(AbstractConfigQuerySet):
             )
         )
 
+    def resolve_configured_params(
+        self, user: User = None, runtime_configurations: Dict[int, Dict] = None
+    ) -> Dict[int, List["Parameter"]]:
+        """
+        Resolves the configured parameters of every configuration with two queries.
+        This is the bulk version of `PythonConfig.read_configured_params`,
+        the precedence of the values is the same of `annotate_value_for_user`.
+        Configurations with a required parameter without a valid value
+        are not returned, so that the caller can fall back to the single resolution
+        and raise the usual error.
+
+        Args:
+            user (User, optional): The user to check. Defaults to None.
+            runtime_configurations (dict, optional): The runtime configuration
+             of every configuration, by configuration pk. Defaults to None.
+
+        Returns:
+            dict: The configured parameters by configuration pk.
+        """
+        from api_app.models import Parameter, PluginConfig
+
+        if runtime_configurations is None:
+            runtime_configurations = {}
+        configs = list(self)
+        if not configs:
+            return {}
+        parameters_by_module = defaultdict(list)
+        for parameter in (
+            Parameter.objects.filter(
+                python_module__in={config.python_module_id for config in configs}
+            )
+            .select_related("python_module")
+            # same values of `annotate_value_for_user` when nothing is configured
+            ._alias_for_test()
+            .annotate(value_for_test=Cast(F("test_value"), output_field=JSONField()))
+        ):
+            parameters_by_module[parameter.python_module_id].append(parameter)
+
+        has_membership = bool(user and user.has_membership())
+        # (config pk, parameter pk) -> source -> first value found,
+        # like the `[:1]` of the subqueries
+        values = defaultdict(dict)
+        config_field = f"{self.model.snake_case_name}_id"
+        for config_pk, parameter_pk, owner_pk, for_organization, value in (
+            PluginConfig.objects.filter(
+                **{f"{config_field}__in": [config.pk for config in configs]}
+            )
+            .visible_for_user(user)
+            .order_by("pk")
+            .values_list(
+                config_field, "parameter_id", "owner_id", "for_organization", "value"
+            )
+        ):
+            sources = values[(config_pk, parameter_pk)]
+            if owner_pk is None:
+                sources.setdefault("default", value)
+            elif user and owner_pk == user.pk and not for_organization:
+                sources.setdefault("owner", value)
+            elif for_organization and has_membership:
+                sources.setdefault("org", value)
+
+        result = {}
+        for config in configs:
+            runtime_configuration = runtime_configurations.get(config.pk, {}) or {}
+            params = []
+            missing_required = False
+            for parameter in parameters_by_module[config.python_module_id]:
+                # every configuration needs its own instances
+                parameter = copy.copy(parameter)
+                key = (config.pk, parameter.pk)
+                sources = values.get(key, {})
+                runtime_value = runtime_configuration.get(parameter.name, None)
+                owner_value = sources.get("owner", None)
+                org_value = sources.get("org", None)
+                default_value = sources.get("default", None)
+                parameter.configured = key in values
+                parameter.is_from_org = (
+                    runtime_value is None
+                    and owner_value is None
+                    and org_value is not None
+                )
+                parameter.value = next(
+                    (
+                        value
+                        for value in (
+                            runtime_value,
+                            owner_value,
+                            org_value,
+                            default_value,
+                        )
+                        if value is not None
+                    ),
+                    parameter.value_for_test,
+                )
+                if parameter.required and not parameter.configured:
+                    if not settings.STAGE_CI or not parameter.value:
+                        missing_required = True
+                        break
+                if parameter.configured or (
+                    settings.STAGE_CI and parameter.value is not None
+                ):
+                    params.append(parameter)
+            if not missing_required:
+                result[config.pk] = params
+        return result
+
+    def generate_empty_reports(
+        self, job, task_ids: Dict[int, str], status: str, parameters: Dict[int, Dict]
+    ) -> List["AbstractReport"]:
+        """
+        Generates the empty reports of every configuration with bulk queries.
+        This is the bulk version of `PythonConfig.generate_empty_report`:
+        an already existing report for the same job and configuration
+        is updated in place instead of creating a new one.
+
+        Args:
+            job (Job): The job associated with the reports.
+            task_ids (dict): The ID of the task generating each report,
+             by configuration pk.
+            status (str): The status of the reports.
+            parameters (dict): The non-secret parameters of each report,
+             by configuration pk.
+
+        Returns:
+            list[AbstractReport]: The generated reports.
+        """
+        configs = list(self)
+        if not configs:
+            return []
+        report_class = self.model.report_class
+        start_time = now()
+        update_fields = ["status", "task_id", "start_time", "end_time", "parameters"]
+        reports = [
+            report_class(
+                job=job,
+                config=config,
+                status=status,
+                task_id=task_ids[config.pk],
+                start_time=start_time,
+                end_time=start_time,
+                parameters=parameters[config.pk],
+            )
+            for config in configs
+        ]
+        if ("config", "job") in report_class._meta.unique_together:
+            # INSERT ... ON CONFLICT (config, job) DO UPDATE
+            return report_class.objects.bulk_create(
+                reports,
+                update_conflicts=True,
+                unique_fields=["config", "job"],
+                update_fields=update_fields,
+            )
+        # without the unique constraint (e.g. visualizers may have multiple reports)
+        # we update the first existing report, like `update_or_create` does
+        existing_reports = {}
+        for report_pk, config_pk in (
+            report_class.objects.filter(job=job, config__in=configs)
+            .order_by("pk")
+            .values_list("pk", "config_id")
+        ):
+            existing_reports.setdefault(config_pk, report_pk)
+        reports_to_update, reports_to_create = [], []
+        for report in reports:
+            if report.config_id in existing_reports:
+                report.pk = existing_reports[report.config_id]
+                reports_to_update.append(report)
+            else:
+                reports_to_create.append(report)
+        if reports_to_update:
+            report_class.objects.bulk_update(reports_to_update, update_fields)
+        if reports_to_create:
+            report_class.objects.bulk_create(reports_to_create)
+        return reports_to_update + reports_to_create
+
     def get_signatures(self, job) -> Generator[Signature, None, None]:
         """
         Generates task signatures for each configuration.
@@ -934,28 +1324,55 @@ class PythonConfigQuerySet(AbstractConfigQuerySet):
         from intel_owl import tasks
 
         job: Job
-        for config in self:
+        configs = list(self)
+        for config in configs:
             config: PythonConfig
             if not hasattr(config, "runnable"):
                 raise RuntimeError(
                     "You have to call `annotate_runnable`"
                     " before being able to call `get_signature`"
                 )
-            # gen new task_id
             if not config.runnable:
                 raise RuntimeWarning(
                     "You are trying to get the signature of a not runnable plugin"
                 )
-
-            task_id = str(uuid.uuid4())
-            config.generate_empty_report(
-                job, task_id, AbstractReport.STATUSES.PENDING.value
-            )
+        runtime_configurations = {
+            config.pk: job.get_config_runtime_configuration(config)
+            for config in configs
+        }
+        # the parameters are resolved once for the whole job:
+        # the workers will read them instead of resolving them again
+        resolved_params = self.resolve_configured_params(
+            job.user, runtime_configurations
+        )
+        self.model.set_job_configured_params(job.pk, resolved_params)
+        # gen new task_ids
+        task_ids = {config.pk: str(uuid.uuid4()) for config in configs}
+        self.generate_empty_reports(
+            job,
+            task_ids,
+            AbstractReport.STATUSES.PENDING.value,
+            parameters={
+                config.pk: (
+                    {
+                        parameter.name: parameter.value
+                        for parameter in resolved_params[config.pk]
+                        if not parameter.is_secret
+                    }
+                    if config.pk in resolved_params
+                    # this raises the error of the missing parameter
+                    else config._get_params(job.user, runtime_configurations[config.pk])
+                )
+                for config in configs
+            },
+        )
+        for config in configs:
+            task_id = task_ids[config.pk]
             args = [
                 job.pk,
                 config.python_module_id,
                 config.pk,
-                job.get_config_runtime_configuration(config),
+                runtime_configurations[config.pk],
                 task_id,
             ]
             yield tasks.run_plugin.signature(
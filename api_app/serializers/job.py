@@ -4,11 +4,12 @@ import ipaddress
 import logging
 import re
 import uuid
-from typing import Dict, Generator, List, Union
+from typing import Dict, Generator, List, Tuple, Union
 
 import django.core
 from django.conf import settings
-from django.db.models import Q, QuerySet
+from django.db import transaction
+from django.db.models import Count, F, Manager, Q, QuerySet
 from django.http import QueryDict
 from django.utils.timezone import now
 from rest_framework import serializers as rfs
@@ -257,6 +258,7 @@ class _AbstractJobCreateSerializer(rfs.ModelSerializer):
             )
 
         attrs["visualizers_to_execute"] = self.set_visualizers_to_execute(**attrs)
+        attrs["analysis_fingerprint"] = self.get_analysis_fingerprint(attrs)
         attrs["warnings"] = list(self.filter_warnings)
         attrs["tags"] = attrs.pop("tags_labels", [])
         return attrs
@@ -329,28 +331,52 @@ class _AbstractJobCreateSerializer(rfs.ModelSerializer):
             else:
                 yield plugin_config
 
-    def check_previous_jobs(self, validated_data: Dict) -> Job:
-        logger.info("Checking previous jobs")
+    @staticmethod
+    def get_analysis_fingerprint(validated_data: Dict) -> str:
+        return Job.get_analysis_fingerprint(
+            validated_data.get("analyzers_to_execute", []),
+            validated_data.get("connectors_to_execute", []),
+            validated_data.get("visualizers_to_execute", []),
+            validated_data.get("playbook_to_execute", None),
+        )
+
+    def get_previous_jobs(self, validated_data: Dict) -> QuerySet:
+        """
+        Jobs of any analyzable that can be returned instead of a new one,
+        if they executed the same plugins.
+
+        Args:
+            validated_data (Dict): validated data of the new job
+
+        Returns:
+            QuerySet: the previous jobs
+        """
         if not validated_data["scan_check_time"]:
             raise ValidationError({"detail": "Scan check time can't be null"})
         status_to_exclude = [Job.STATUSES.KILLED, Job.STATUSES.FAILED]
         if not validated_data.get("playbook_to_execute", None):
             status_to_exclude.append(Job.STATUSES.REPORTED_WITH_FAILS)
-        qs = (
+        return (
             self.Meta.model.objects.visible_for_user(self.context["request"].user)
             .filter(
                 received_request_time__gte=now() - validated_data["scan_check_time"]
             )
-            .filter(Q(analyzable__pk=validated_data["analyzable"].pk))
+            .exclude(status__in=status_to_exclude)
         )
-        for analyzer in validated_data.get("analyzers_to_execute", []):
-            qs = qs.filter(analyzers_requested__in=[analyzer])
-        for connector in validated_data.get("connectors_to_execute", []):
-            qs = qs.filter(connectors_requested__in=[connector])
-        for visualizer in validated_data.get("visualizers_to_execute", []):
-            qs = qs.filter(visualizers_to_execute__in=[visualizer])
 
-        return qs.exclude(status__in=status_to_exclude).latest("received_request_time")
+    def check_previous_jobs(self, validated_data: Dict) -> Job:
+        logger.info("Checking previous jobs")
+        fingerprint = validated_data.get(
+            "analysis_fingerprint", None
+        ) or self.get_analysis_fingerprint(validated_data)
+        return (
+            self.get_previous_jobs(validated_data)
+            .filter(
+                analyzable__pk=validated_data["analyzable"].pk,
+                analysis_fingerprint=fingerprint,
+            )
+            .latest("received_request_time")
+        )
 
     def create(self, validated_data: Dict) -> Job:
         # POP VALUES!
@@ -494,6 +520,12 @@ class JobListSerializer(_AbstractJobViewSerializer):
         return obj.pivots_to_execute.all().values_list("name", flat=True)
 
 
+class JobTreeListSerializer(rfs.ListSerializer):
+    def to_representation(self, data):
+        roots = data.all() if isinstance(data, Manager) else data
+        return self.child.to_representation_trees(list(roots))
+
+
 class JobTreeSerializer(ModelSerializer):
     pivot_config = rfs.CharField(
         source="pivot_parent.pivot_config.name", allow_null=True, read_only=True
@@ -547,17 +579,51 @@ class JobTreeSerializer(ModelSerializer):
             "isp",
             "country",
         ]
+        list_serializer_class = JobTreeListSerializer
 
-    def to_representation(self, instance):
-        instance: Job
+    def _to_representation_node(self, instance: Job) -> Dict:
         data = super().to_representation(instance)
-        for child in instance.get_children():
-            # recursive call
-            data.setdefault("children", []).append(self.__class__(instance=child).data)
         if data["pivot_config"] is None:
             del data["pivot_config"]
         return data
 
+    def to_representation_trees(self, roots: List[Job]) -> List[Dict]:
+        """Build the representation of the trees of the jobs.
+
+        Every job of the trees is retrieved with a single query,
+        plus one for every type of data model, and nested in memory.
+
+        Args:
+            roots (List[Job]): the jobs at the top of the trees
+
+        Returns:
+            List[Dict]: the representations, in the order of the jobs
+        """
+        if not roots:
+            return []
+        query = Q()
+        for root in roots:
+            query |= Q(path__startswith=root.path)
+        nodes = {}
+        for job in (
+            Job.objects.filter(query)
+            .select_related(
+                "analyzable", "playbook_to_execute", "pivot_parent__pivot_config"
+            )
+            .prefetch_related("data_model")
+            # parents come before their children
+            .order_by("path")
+        ):
+            data = self._to_representation_node(job)
+            nodes[job.path] = data
+            parent = nodes.get(job.path[: -Job.steplen], None)
+            if parent is not None:
+                parent.setdefault("children", []).append(data)
+        return [nodes[root.path] for root in roots]
+
+    def to_representation(self, instance: Job):
+        return self.to_representation_trees([instance])[0]
+
 
 class JobSerializer(_AbstractJobViewSerializer):
     """
@@ -718,8 +784,8 @@ class MultipleJobSerializer(rfs.ListSerializer):
             # so we don't need to do anything because everything is already connected
             root = parent.get_root()
             if root.investigation:
-                root.investigation.status = root.investigation.STATUSES.RUNNING.value
-                root.investigation.save()
+                # the new jobs are running
+                root.investigation.set_correct_status(save=True)
                 return jobs
             # if we have a parent, it means we are pivoting from one job to another
             else:
@@ -744,8 +810,7 @@ class MultipleJobSerializer(rfs.ListSerializer):
             # set investigation into running status
             if len(jobs) >= 1 and jobs[0].investigation:
                 investigation = jobs[0].investigation
-                investigation.status = investigation.STATUSES.RUNNING.value
-                investigation.save()
+                investigation.set_correct_status(save=True)
                 return jobs
             # if we do not have a parent or an investigation, and we have multiple jobs,
             # we are in the multiple input case
@@ -762,9 +827,9 @@ class MultipleJobSerializer(rfs.ListSerializer):
             else:
                 return jobs
         investigation: Investigation
-        investigation.status = investigation.STATUSES.RUNNING.value
         investigation.for_organization = True
         investigation.save()
+        investigation.set_correct_status(save=True)
         return jobs
 
     def validate(self, attrs: dict) -> dict:
@@ -1014,24 +1079,46 @@ class ObservableAnalysisSerializer(_AbstractJobCreateSerializer):
 
     def validate(self, attrs: dict) -> dict:
         logger.debug(f"before attrs: {attrs}")
-        attrs["observable_name"] = self.defanged_values_removal(
-            attrs["observable_name"]
+        attrs["observable_name"], attrs["observable_classification"] = (
+            self.normalize_observable(
+                attrs["observable_name"], attrs.get("observable_classification", None)
+            )
         )
+        # calculate ``md5``
+        attrs["md5"] = calculate_md5(attrs["observable_name"].encode("utf-8"))
+        attrs = super().validate(attrs)
+        logger.debug(f"after attrs: {attrs}")
+        return attrs
+
+    @classmethod
+    def normalize_observable(
+        cls, name: str, classification: str = None
+    ) -> Tuple[str, str]:
+        """
+        Removes the defanging from the observable, calculates its classification
+        if missing and checks that it can be analyzed.
+
+        Args:
+            name (str): name of the observable
+            classification (str): classification of the observable, if known
+
+        Returns:
+            Tuple[str, str]: normalized name and classification of the observable
+        """
+        name = cls.defanged_values_removal(name)
         # calculate ``observable_classification``
-        if not attrs.get("observable_classification", None):
-            attrs["observable_classification"] = Classification.calculate_observable(
-                attrs["observable_name"]
-            )
-        if attrs["observable_classification"] in [
+        if not classification:
+            classification = Classification.calculate_observable(name)
+        if classification in [
             Classification.HASH,
             Classification.DOMAIN,
         ]:
             # force lowercase in ``observable_name``.
             # Ref: https://github.com/intelowlproject/IntelOwl/issues/658
-            attrs["observable_name"] = attrs["observable_name"].lower()
+            name = name.lower()
 
-        if attrs["observable_classification"] == Classification.IP.value:
-            ip = ipaddress.ip_address(attrs["observable_name"])
+        if classification == Classification.IP.value:
+            ip = ipaddress.ip_address(name)
             if ip.is_loopback:
                 raise ValidationError({"detail": "Loopback address"})
             elif ip.is_private:
@@ -1042,12 +1129,7 @@ class ObservableAnalysisSerializer(_AbstractJobCreateSerializer):
                 raise ValidationError({"detail": "Local link address"})
             elif ip.is_reserved:
                 raise ValidationError({"detail": "Reserved address"})
-
-        # calculate ``md5``
-        attrs["md5"] = calculate_md5(attrs["observable_name"].encode("utf-8"))
-        attrs = super().validate(attrs)
-        logger.debug(f"after attrs: {attrs}")
-        return attrs
+        return name, classification
 
     @staticmethod
     def defanged_values_removal(value):
@@ -1090,6 +1172,243 @@ class ObservableAnalysisSerializer(_AbstractJobCreateSerializer):
         return super().set_analyzers_to_execute(analyzers_to_execute, tlp)
 
 
+class BulkObservableAnalysisSerializer(ObservableAnalysisSerializer):
+    """
+    ``Job`` model's serializer for the analysis of many observables
+    with the same parameters, like the import of a feed.
+    Used for ``create()``.
+
+    The parameters are validated once for every classification of the
+    observables, instead of once for every observable, while the analyzables
+    and the jobs are created in batches.
+    """
+
+    max_element_per_request_number = 100000
+    batch_size = 5000
+
+    job_fields = (
+        "user",
+        "tlp",
+        "runtime_configuration",
+        "scan_mode",
+        "scan_check_time",
+        "playbook_requested",
+        "playbook_to_execute",
+        "investigation",
+        "warnings",
+        "analysis_fingerprint",
+    )
+    job_many_to_many_fields = (
+        "analyzers_requested",
+        "connectors_requested",
+        "analyzers_to_execute",
+        "connectors_to_execute",
+        "visualizers_to_execute",
+        "tags",
+    )
+
+    observable_name = None
+    observable_classification = None
+    parent_job = None
+    observables = rfs.ListField(required=True, allow_empty=False)
+
+    class Meta:
+        model = Job
+        fields = tuple(
+            field
+            for field in _AbstractJobCreateSerializer.Meta.fields
+            if field != "parent_job"
+        ) + ("observables",)
+
+    def validate_observables(self, observables: List) -> List:
+        if len(observables) > self.max_element_per_request_number:
+            raise ValidationError(
+                {
+                    "detail": "Exceed the threshold of "
+                    f"{self.max_element_per_request_number}"
+                    " elements for a single analysis"
+                }
+            )
+        return observables
+
+    def validate_tags_labels(self, tags_labels):
+        # the tags are shared by the jobs of every classification
+        return list(super().validate_tags_labels(tags_labels))
+
+    @staticmethod
+    def _get_error(observable, exc: ValidationError) -> Dict:
+        detail = exc.detail
+        if isinstance(detail, dict):
+            detail = detail.get("detail", detail)
+        return {"observable": observable, "detail": detail}
+
+    def validate(self, attrs: dict) -> dict:
+        errors = []
+        valid_observables = []
+        for observable in attrs.pop("observables"):
+            # same format of the multiple observables analysis:
+            # the classification is always calculated
+            if isinstance(observable, (list, tuple)) and observable:
+                observable = observable[-1]
+            if (
+                not isinstance(observable, str)
+                or not observable
+                or len(observable) > Analyzable._meta.get_field("name").max_length
+            ):
+                errors.append(
+                    {"observable": observable, "detail": "Not a valid observable"}
+                )
+                continue
+            valid_observables.append(observable)
+
+        # the classifications are calculated at once on the defanged names
+        defanged_names = [
+            self.defanged_values_removal(observable) for observable in valid_observables
+        ]
+        # normalized name -> classification, in the order of the request
+        observables = {}
+        for observable, name, classification in zip(
+            valid_observables,
+            defanged_names,
+            Classification.calculate_observables(defanged_names),
+        ):
+            try:
+                name, classification = self.normalize_observable(name, classification)
+            except ValidationError as exc:
+                errors.append(self._get_error(observable, exc))
+            else:
+                observables.setdefault(name, classification)
+
+        names_by_classification = {}
+        for name, classification in observables.items():
+            names_by_classification.setdefault(classification, []).append(name)
+        groups = []
+        for classification, names in names_by_classification.items():
+            self.filter_warnings.clear()
+            try:
+                group = super(ObservableAnalysisSerializer, self).validate(
+                    dict(attrs, observable_classification=classification)
+                )
+            except ValidationError as exc:
+                errors.extend(self._get_error(name, exc) for name in names)
+            else:
+                group["observables"] = names
+                groups.append(group)
+
+        if errors:
+            raise ValidationError({"detail": errors})
+        return {"observables": list(observables.keys()), "groups": groups}
+
+    def _get_previous_jobs(
+        self, groups: List[Dict], analyzables: List[List[Analyzable]]
+    ) -> Dict[int, Job]:
+        query = Q()
+        for group, group_analyzables in zip(groups, analyzables):
+            if group["scan_mode"] == ScanMode.CHECK_PREVIOUS_ANALYSIS.value:
+                query |= Q(
+                    analyzable__in=group_analyzables,
+                    analysis_fingerprint=group["analysis_fingerprint"],
+                )
+        if not query:
+            return {}
+        logger.info("Checking previous jobs")
+        # the parameters shared by the groups come from the same request
+        return {
+            job.analyzable_id: job
+            for job in self.get_previous_jobs(groups[0])
+            .filter(query)
+            .order_by("analyzable", "-received_request_time")
+            .distinct("analyzable")
+        }
+
+    def _create_many_to_many(self, jobs: List[Job], groups: List[Dict]) -> None:
+        for field_name in self.job_many_to_many_fields:
+            field = Job._meta.get_field(field_name)
+            through = field.remote_field.through
+            source = f"{field.m2m_field_name()}_id"
+            target = f"{field.m2m_reverse_field_name()}_id"
+            rows = [
+                through(**{source: job.pk, target: pk})
+                for job, group in zip(jobs, groups)
+                # the tags of the playbook could have been requested too
+                for pk in {obj.pk for obj in group.get(field_name, [])}
+            ]
+            through.objects.bulk_create(rows, batch_size=self.batch_size)
+
+    def create(self, validated_data: Dict) -> List[Job]:
+        send_task = validated_data.pop("send_task", False)
+        groups = validated_data["groups"]
+        analyzables = Analyzable.objects.get_or_create_observables(
+            (
+                (name, group["observable_classification"])
+                for group in groups
+                for name in group["observables"]
+            ),
+            batch_size=self.batch_size,
+        )
+
+        groups_analyzables = [
+            [
+                analyzables[calculate_md5(name.encode("utf-8"))]
+                for name in group["observables"]
+            ]
+            for group in groups
+        ]
+        previous_jobs = self._get_previous_jobs(groups, groups_analyzables)
+        jobs_by_name = {}
+        new_jobs, new_jobs_groups = [], []
+        for group, group_analyzables in zip(groups, groups_analyzables):
+            for name, analyzable in zip(group["observables"], group_analyzables):
+                job = previous_jobs.get(analyzable.pk, None)
+                if job is None:
+                    job = Job(
+                        analyzable=analyzable,
+                        **{
+                            field: group[field]
+                            for field in self.job_fields
+                            if field in group
+                        },
+                    )
+                    new_jobs.append(job)
+                    new_jobs_groups.append(group)
+                jobs_by_name[name] = job
+        logger.info(
+            f"Creating {len(new_jobs)} jobs, "
+            f"{len(jobs_by_name) - len(new_jobs)} observables were already analyzed"
+        )
+
+        investigation = groups[0]["investigation"]
+        if not investigation and len(new_jobs) > 1:
+            # same investigation of the multiple observables analysis
+            investigation = Investigation.objects.create(
+                name=f"Custom investigation: {len(new_jobs)} jobs",
+                owner=self.context["request"].user,
+                for_organization=True,
+                start_time=now(),
+            )
+            for job in new_jobs:
+                job.investigation = investigation
+        with transaction.atomic():
+            Job.objects.bulk_create_roots(new_jobs, batch_size=self.batch_size)
+            self._create_many_to_many(new_jobs, new_jobs_groups)
+        if investigation and new_jobs:
+            investigation.set_correct_status(save=True)
+
+        if send_task:
+            from intel_owl.tasks import job_pipeline
+
+            logger.info(f"Sending tasks for {len(new_jobs)} jobs")
+            for index, (job, group) in enumerate(zip(new_jobs, new_jobs_groups)):
+                job_pipeline.apply_async(
+                    args=[job.pk],
+                    queue=get_queue_name(settings.DEFAULT_QUEUE),
+                    MessageGroupId=str(uuid.uuid4()),
+                    priority=job.priority,
+                    eta=now() + datetime.timedelta(seconds=group["delay"] * index),
+                )
+        return [jobs_by_name[name] for name in validated_data["observables"]]
+
+
 class JobEnvelopeSerializer(rfs.ListSerializer):
     @property
     def data(self):
@@ -1166,6 +1485,21 @@ class JobResponseSerializer(rfs.ModelSerializer):
         return initial
 
 
+class MultipleJobAvailabilitySerializer(rfs.ListSerializer):
+    """
+    Serializer for ask_multi_analysis_availability
+    """
+
+    def update(self, instance, validated_data):
+        raise NotImplementedError("This serializer does not support update().")
+
+    def create(self, validated_data: List[Dict]) -> List[Job]:
+        jobs = self.child.get_last_jobs(validated_data)
+        if None in jobs:
+            raise Job.DoesNotExist("Some analyses are not available")
+        return jobs
+
+
 class JobAvailabilitySerializer(rfs.ModelSerializer):
     """
     Serializer for ask_analysis_availability
@@ -1174,6 +1508,7 @@ class JobAvailabilitySerializer(rfs.ModelSerializer):
     class Meta:
         model = Job
         fields = ["md5", "analyzers", "playbooks", "running_only", "minutes_ago"]
+        list_serializer_class = MultipleJobAvailabilitySerializer
 
     md5 = rfs.CharField(max_length=128, required=True)
     analyzers = rfs.SlugRelatedField(
@@ -1195,50 +1530,111 @@ class JobAvailabilitySerializer(rfs.ModelSerializer):
         attrs = super().validate(attrs)
         playbooks = attrs.get("playbooks", [])
         analyzers = attrs.get("analyzers", [])
-        if not analyzers and not playbooks:
-            attrs["analyzers"] = list(AnalyzerConfig.objects.all())
-        elif len(playbooks) != 0 and len(analyzers) != 0:
+        # without analyzers and playbooks, every analyzer is requested:
+        # they are loaded once for every request by ``get_last_jobs``
+        if len(playbooks) != 0 and len(analyzers) != 0:
             raise rfs.ValidationError(
                 "Either only send the 'playbooks' parameter or the 'analyzers' one."
             )
         return attrs
 
-    def create(self, validated_data):
+    def _get_availability_queryset(
+        self,
+        analyzers: List[AnalyzerConfig],
+        playbooks: List[PlaybookConfig],
+        running_only: bool,
+        minutes_ago: int = None,
+    ) -> QuerySet:
         statuses_to_check = [Job.STATUSES.RUNNING]
 
-        if not validated_data["running_only"]:
+        if not running_only:
             statuses_to_check.append(Job.STATUSES.REPORTED_WITHOUT_FAILS)
             # since with playbook
             # it is expected behavior
             # for analyzers to often fail
-            if validated_data.get("playbooks", []):
+            if playbooks:
                 statuses_to_check.append(Job.STATUSES.REPORTED_WITH_FAILS)
-        # this means that the user is trying to
-        # check availability of the case where all
-        # analyzers were run but no playbooks were
-        # triggered.
-        query = Q(analyzable__md5=validated_data["md5"]) & Q(
+        qs = Job.objects.visible_for_user(self.context["request"].user).filter(
             status__in=statuses_to_check
         )
-        if validated_data.get("playbooks", []):
-            query &= Q(playbook_requested__name__in=validated_data["playbooks"])
+        if playbooks:
+            qs = qs.filter(playbook_requested__in=playbooks)
         else:
-            analyzers = validated_data.get("analyzers", [])
-            for analyzer in analyzers:
-                query &= Q(analyzers_requested__name__in=[analyzer])
-        # we want a job that has every analyzer requested
-        if validated_data.get("minutes_ago", None):
-            minutes_ago_time = now() - datetime.timedelta(
-                minutes=validated_data["minutes_ago"]
-            )
-            query &= Q(received_request_time__gte=minutes_ago_time)
+            # we want a job that has every analyzer requested
+            qs = qs.annotate(
+                analyzers_found=Count(
+                    "analyzers_requested",
+                    filter=Q(analyzers_requested__in=analyzers),
+                    distinct=True,
+                )
+            ).filter(analyzers_found=len(analyzers))
+        if minutes_ago:
+            minutes_ago_time = now() - datetime.timedelta(minutes=minutes_ago)
+            qs = qs.filter(received_request_time__gte=minutes_ago_time)
+        return qs
 
-        last_job_for_md5 = (
-            Job.objects.visible_for_user(self.context["request"].user)
-            .filter(query)
-            .only("pk")
-            .latest("received_request_time")
+    @staticmethod
+    def _get_parameters_key(data: Dict) -> Tuple:
+        return (
+            tuple(sorted(analyzer.pk for analyzer in data.get("analyzers", []))),
+            tuple(sorted(playbook.pk for playbook in data.get("playbooks", []))),
+            data["running_only"],
+            data.get("minutes_ago", None),
         )
+
+    def get_last_jobs(self, validated_data: List[Dict]) -> List[Union[Job, None]]:
+        """
+        Finds the last job of every md5 with one query for every combination
+        of the other parameters, usually shared by the whole request.
+
+        Args:
+            validated_data (List[Dict]): validated data of every md5
+
+        Returns:
+            List[Union[Job, None]]: the last job of every md5, if available
+        """
+        all_analyzers = None
+        md5s_by_parameters = {}
+        for data in validated_data:
+            key = self._get_parameters_key(data)
+            if key not in md5s_by_parameters:
+                parameters = {
+                    "analyzers": data.get("analyzers", []),
+                    "playbooks": data.get("playbooks", []),
+                    "running_only": data["running_only"],
+                    "minutes_ago": data.get("minutes_ago", None),
+                }
+                # this means that the user is trying to
+                # check availability of the case where all
+                # analyzers were run but no playbooks were
+                # triggered.
+                if not parameters["analyzers"] and not parameters["playbooks"]:
+                    if all_analyzers is None:
+                        all_analyzers = list(AnalyzerConfig.objects.all())
+                    parameters["analyzers"] = all_analyzers
+                md5s_by_parameters[key] = (parameters, set())
+            md5s_by_parameters[key][1].add(data["md5"])
+
+        jobs = {}
+        for key, (parameters, md5s) in md5s_by_parameters.items():
+            for job in (
+                self._get_availability_queryset(**parameters)
+                .filter(analyzable__md5__in=md5s)
+                .annotate(analyzable_md5=F("analyzable__md5"))
+                # the last job of every analyzable
+                .order_by("analyzable", "-received_request_time")
+                .distinct("analyzable")
+            ):
+                jobs[(key, job.analyzable_md5)] = job
+        return [
+            jobs.get((self._get_parameters_key(data), data["md5"]), None)
+            for data in validated_data
+        ]
+
+    def create(self, validated_data):
+        last_job_for_md5 = self.get_last_jobs([validated_data])[0]
+        if last_job_for_md5 is None:
+            raise Job.DoesNotExist("Analysis not available")
         return last_job_for_md5
 
 
@@ -1,7 +1,7 @@
 # flake8: noqa
 import json
 import logging
-from typing import Any
+from typing import Any, Callable, Dict
 
 from django.core.cache import cache
 from django.core.exceptions import ValidationError as DjangoValidationError
@@ -209,63 +209,129 @@ class ParameterSerializer(rfs.ModelSerializer):
 
 
 class PythonConfigListSerializer(rfs.ListSerializer):
+    """
+    The representation of a plugin is made of a base, equal for every user,
+    and of an overlay with the parameters and the state of the plugin for the user.
+    Overlays are shared by the members of an organization, and by the users
+    without organization, unless they have their own plugin configs.
+    Both are cached and built on demand.
+    """
+
     plugins = rfs.PrimaryKeyRelatedField(read_only=True)
+    CACHE_TIMEOUT = 60 * 60 * 24 * 7
 
-    def to_representation_single_plugin(self, plugin: PythonConfig, user: User):
-        cache_name = (
-            f"serializer_{plugin.__class__.__name__}_{plugin.name}_{user.username}"
-        )
+    @classmethod
+    def _get_or_set_cache(cls, cache_name: str, default: Callable[[], Dict]) -> Dict:
         cache_hit = cache.get(cache_name)
-        if not cache_hit:
-            plugin_representation = self.child.to_representation(plugin)
-            plugin_representation["secrets"] = {}
-            plugin_representation["params"] = {}
-            total_parameters = 0
-            parameter_required_not_configured = []
-            for param in plugin.python_module.parameters.annotate_configured(
-                plugin, user
-            ).annotate_value_for_user(plugin, user):
-                total_parameters += 1
-                if param.required and not param.configured:
-                    parameter_required_not_configured.append(param.name)
-                param_representation = ParameterSerializer(param).data
-                param_representation.pop("name")
-                key = "secrets" if param.is_secret else "params"
-
-                plugin_representation[key][param.name] = param_representation
-
-            if not parameter_required_not_configured:
-                logger.debug(f"Plugin {plugin.name} is configured")
-                configured = True
-                details = "Ready to use!"
-            else:
-                logger.debug(f"Plugin {plugin.name} is not configured")
-                details = (
-                    f"{', '.join(parameter_required_not_configured)} "
-                    "secret"
-                    f"{'' if len(parameter_required_not_configured) == 1 else 's'}"
-                    " not set;"
-                    f" ({total_parameters - len(parameter_required_not_configured)} "
-                    f"of {total_parameters} satisfied)"
-                )
-                configured = False
-            plugin_representation["disabled"] = not plugin.enabled_for_user(user)
-            plugin_representation["verification"] = {
-                "configured": configured,
-                "details": details,
-                "missing_secrets": parameter_required_not_configured,
-            }
+        if cache_hit is None:
+            value = default()
             logger.info(f"Setting cache {cache_name}")
-            cache.set(cache_name, plugin_representation, timeout=60 * 60 * 24 * 7)
-            return plugin_representation
+            cache.set(cache_name, value, timeout=cls.CACHE_TIMEOUT)
+            return value
+        cache.touch(cache_name, timeout=cls.CACHE_TIMEOUT)
+        return cache_hit
+
+    @staticmethod
+    def get_overlay_scope(
+        plugin: PythonConfig, user: User, has_plugin_configs: bool = None
+    ) -> str:
+        """Get who shares the overlay of the plugin with the user.
+
+        Args:
+            plugin (PythonConfig): the plugin
+            user (User): the user
+            has_plugin_configs (bool): whether the user owns plugin configs
+                of the plugin, retrieved if not given
+
+        Returns:
+            str: scope of the overlay
+        """
+        if has_plugin_configs is None:
+            has_plugin_configs = PluginConfig.objects.filter(
+                owner=user, **{plugin.snake_case_name: plugin.pk}
+            ).exists()
+        if has_plugin_configs:
+            return PythonConfig.get_user_cache_scope(user.username)
+        if user.has_membership():
+            return PythonConfig.get_organization_cache_scope(
+                user.membership.organization
+            )
+        return PythonConfig.DEFAULT_CACHE_SCOPE
+
+    @staticmethod
+    def _get_overlay(plugin: PythonConfig, user: User) -> Dict:
+        overlay = {"secrets": {}, "params": {}}
+        total_parameters = 0
+        parameter_required_not_configured = []
+        for param in plugin.python_module.parameters.annotate_configured(
+            plugin, user
+        ).annotate_value_for_user(plugin, user):
+            total_parameters += 1
+            if param.required and not param.configured:
+                parameter_required_not_configured.append(param.name)
+            param_representation = ParameterSerializer(param).data
+            param_representation.pop("name")
+            key = "secrets" if param.is_secret else "params"
+
+            overlay[key][param.name] = param_representation
+
+        if not parameter_required_not_configured:
+            logger.debug(f"Plugin {plugin.name} is configured")
+            configured = True
+            details = "Ready to use!"
         else:
-            cache.touch(cache_name, timeout=60 * 60 * 24 * 7)
-            return cache_hit
+            logger.debug(f"Plugin {plugin.name} is not configured")
+            details = (
+                f"{', '.join(parameter_required_not_configured)} "
+                "secret"
+                f"{'' if len(parameter_required_not_configured) == 1 else 's'}"
+                " not set;"
+                f" ({total_parameters - len(parameter_required_not_configured)} "
+                f"of {total_parameters} satisfied)"
+            )
+            configured = False
+        overlay["disabled"] = not plugin.enabled_for_user(user)
+        overlay["verification"] = {
+            "configured": configured,
+            "details": details,
+            "missing_secrets": parameter_required_not_configured,
+        }
+        return overlay
+
+    def to_representation_base(self, plugin: PythonConfig) -> Dict:
+        return self._get_or_set_cache(
+            plugin.get_cache_key(PythonConfig.BASE_CACHE_SCOPE),
+            lambda: self.child.to_representation(plugin),
+        )
+
+    def to_representation_single_plugin(
+        self, plugin: PythonConfig, user: User, has_plugin_configs: bool = None
+    ) -> Dict:
+        base = self.to_representation_base(plugin)
+        overlay = self._get_or_set_cache(
+            plugin.get_cache_key(
+                self.get_overlay_scope(plugin, user, has_plugin_configs)
+            ),
+            lambda: self._get_overlay(plugin, user),
+        )
+        return {**base, **overlay}
 
     def to_representation(self, data):
         user = self.context["request"].user
+        plugins_configured = {}
         for plugin in data:
-            yield self.to_representation_single_plugin(plugin, user)
+            if plugin.snake_case_name not in plugins_configured:
+                # a single query for every plugin the user has configured
+                plugins_configured[plugin.snake_case_name] = set(
+                    PluginConfig.objects.filter(
+                        owner=user, **{f"{plugin.snake_case_name}__isnull": False}
+                    ).values_list(plugin.snake_case_name, flat=True)
+                )
+            yield self.to_representation_single_plugin(
+                plugin,
+                user,
+                plugin.pk in plugins_configured[plugin.snake_case_name],
+            )
 
 
 class PythonModulSerializerComplete(rfs.ModelSerializer):
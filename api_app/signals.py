@@ -6,6 +6,7 @@ from typing import Type
 from django import dispatch
 from django.conf import settings
 from django.contrib.admin.models import LogEntry
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
 from django.dispatch import receiver
 
@@ -14,11 +15,13 @@ from api_app.investigations_manager.models import Investigation
 from api_app.models import (
     Job,
     ListCachable,
+    OrganizationPluginConfiguration,
     Parameter,
     PluginConfig,
     PythonConfig,
     PythonModule,
 )
+from certego_saas.apps.organization.membership import Membership
 
 migrate_finished = dispatch.Signal()
 
@@ -57,8 +60,12 @@ def post_delete_job(sender, instance: Job, **kwargs):
     # Try/catch is needed for multiple delete of jobs in the same investigation
     # because the signals is called _after_ every deletion
     try:
-        if instance.investigation_id and instance.investigation.jobs.count() == 0:
-            instance.investigation.delete()
+        if instance.investigation_id:
+            if instance.investigation.jobs.count() == 0:
+                instance.investigation.delete()
+            elif instance.status not in Job.STATUSES.final_statuses():
+                # a running job is not counted anymore
+                instance.investigation.set_correct_status(save=True)
     except Investigation.DoesNotExist:
         pass
 
@@ -83,6 +90,8 @@ def post_migrate_api_app(
     logger.info(f"Post migrate {args} {kwargs}")
     if check_unapplied:
         return
+    # migrations may have changed the parameters without sending signals
+    PythonConfig.invalidate_configured_params_cache()
     from django_celery_beat.models import PeriodicTask
 
     from intel_owl.tasks import update
@@ -106,7 +115,8 @@ def post_migrate_api_app(
 def post_save_plugin_config(sender, instance: PluginConfig, *args, **kwargs):
     """
     Signal receiver for the post_save signal of the PluginConfig model.
-    Refreshes cache keys associated with the PluginConfig instance.
+    Invalidates the configured parameters cache and
+    refreshes cache keys associated with the PluginConfig instance.
 
     Args:
         sender (Model): The model class sending the signal.
@@ -114,6 +124,7 @@ def post_save_plugin_config(sender, instance: PluginConfig, *args, **kwargs):
         *args: Additional positional arguments.
         **kwargs: Additional keyword arguments.
     """
+    PythonConfig.invalidate_configured_params_cache()
     instance.refresh_cache_keys()
 
 
@@ -121,7 +132,8 @@ def post_save_plugin_config(sender, instance: PluginConfig, *args, **kwargs):
 def post_delete_plugin_config(sender, instance: PluginConfig, *args, **kwargs):
     """
     Signal receiver for the post_delete signal of the PluginConfig model.
-    Refreshes cache keys associated with the PluginConfig instance after deletion.
+    Invalidates the configured parameters cache and
+    refreshes cache keys associated with the PluginConfig instance after deletion.
 
     Args:
         sender (Model): The model class sending the signal.
@@ -129,9 +141,40 @@ def post_delete_plugin_config(sender, instance: PluginConfig, *args, **kwargs):
         *args: Additional positional arguments.
         **kwargs: Additional keyword arguments.
     """
+    PythonConfig.invalidate_configured_params_cache()
     instance.refresh_cache_keys()
 
 
+@receiver(models.signals.post_save, sender=OrganizationPluginConfiguration)
+@receiver(models.signals.post_delete, sender=OrganizationPluginConfiguration)
+def post_save_or_delete_organization_plugin_configuration(
+    sender, instance: OrganizationPluginConfiguration, *args, **kwargs
+):
+    """
+    Signal receiver for the post_save and post_delete signals
+    of the OrganizationPluginConfiguration model.
+    Deletes the cached representations of the plugin for the organization,
+    because the plugin could have been enabled or disabled.
+
+    Args:
+        sender (Model): The model class sending the signal.
+        instance (OrganizationPluginConfiguration): The instance of the model
+            being saved or deleted.
+        *args: Additional positional arguments.
+        **kwargs: Additional keyword arguments.
+    """
+    try:
+        config, organization = instance.config, instance.organization
+    except ObjectDoesNotExist:
+        # the organization was deleted before this instance
+        return
+    if config is None:
+        # the configuration was deleted before this instance
+        return
+    config.delete_class_cache_keys()
+    config.refresh_cache_keys(organization=organization)
+
+
 @receiver(models.signals.post_save, sender=Parameter)
 def post_save_parameter(sender, instance: Parameter, *args, **kwargs):
     """
@@ -144,6 +187,7 @@ def post_save_parameter(sender, instance: Parameter, *args, **kwargs):
         *args: Additional positional arguments.
         **kwargs: Additional keyword arguments.
     """
+    PythonConfig.invalidate_configured_params_cache()
     # delete list view cache
     instance.refresh_cache_keys()
 
@@ -160,10 +204,28 @@ def post_delete_parameter(sender, instance: Parameter, *args, **kwargs):
         *args: Additional positional arguments.
         **kwargs: Additional keyword arguments.
     """
+    PythonConfig.invalidate_configured_params_cache()
     # delete list view cache
     instance.refresh_cache_keys()
 
 
+@receiver(models.signals.post_save, sender=Membership)
+@receiver(models.signals.post_delete, sender=Membership)
+def post_save_or_delete_membership(sender, instance: Membership, *args, **kwargs):
+    """
+    Signal receiver for the post_save and post_delete signals of the Membership model.
+    Invalidates the configured parameters cache, because organization
+    parameters depend on the membership of their owner.
+
+    Args:
+        sender (Model): The model class sending the signal.
+        instance (Membership): The instance of the model being saved or deleted.
+        *args: Additional positional arguments.
+        **kwargs: Additional keyword arguments.
+    """
+    PythonConfig.invalidate_configured_params_cache()
+
+
 @receiver(models.signals.post_save, sender=PythonModule)
 def post_save_python_module_periodic_tasks(
     sender: Type[PythonModule], instance: PythonModule, *args, **kwargs
@@ -243,6 +305,7 @@ def post_save_python_config_cache(sender, instance, *args, **kwargs):
     if issubclass(sender, ListCachable):
         instance.delete_class_cache_keys()
     if issubclass(sender, PythonConfig):
+        PythonConfig.invalidate_configured_params_cache()
         instance.refresh_cache_keys()
 
 
@@ -264,6 +327,7 @@ def post_delete_python_config_cache(sender, instance, *args, **kwargs):
     if issubclass(sender, ListCachable):
         instance.delete_class_cache_keys()
     if issubclass(sender, PythonConfig):
+        PythonConfig.invalidate_configured_params_cache()
         instance.refresh_cache_keys()
 
 
@@ -14,6 +14,7 @@ from .views import (
     analyze_multiple_files,
     analyze_multiple_observables,
     analyze_observable,
+    analyze_observables_bulk,
     ask_analysis_availability,
     ask_multi_analysis_availability,
     plugin_state_viewer,
@@ -41,6 +42,11 @@ urlpatterns = [
         analyze_multiple_observables,
         name="analyze_multiple_observables",
     ),
+    path(
+        "analyze_observables_bulk",
+        analyze_observables_bulk,
+        name="analyze_observables_bulk",
+    ),
     path(
         "plugin_report_queries",
         ElasticSearchView.as_view(),
@@ -1,6 +1,26 @@
 import datetime
-
-from django.db.models import F, Q, QuerySet, Value
+from typing import TYPE_CHECKING, Generator, Tuple, Type
+
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    DateTimeField,
+    DurationField,
+    Exists,
+    ExpressionWrapper,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Greatest, Power
 from django.db.models.lookups import IRegex, Range
 from django.utils.timezone import now
 
@@ -8,39 +28,110 @@ from api_app.analyzables_manager.models import Analyzable
 from api_app.choices import Classification
 from api_app.user_events_manager.choices import DecayProgressionEnum
 
+if TYPE_CHECKING:
+    from api_app.data_model_manager.models import BaseDataModel
+
 
 class UserEventQuerySet(QuerySet):
 
-    def decay(self):
-        from api_app.user_events_manager.models import UserEvent
+    def _get_data_model_events(
+        self,
+    ) -> Generator[Tuple[Type["BaseDataModel"], "UserEventQuerySet", str], None, None]:
+        """
+        Groups the events by the class of their data models.
+
+        Yields:
+            Tuple[Type[BaseDataModel], UserEventQuerySet, str]: the class
+            of the data models, the events and their field with the
+            primary key of the data model.
+        """
+        field = self.model._meta.get_field("data_model")
+        if isinstance(field, GenericForeignKey):
+            for content_type in ContentType.objects.filter(
+                pk__in=self.values("data_model_content_type")
+            ):
+                yield (
+                    content_type.model_class(),
+                    self.filter(data_model_content_type=content_type),
+                    "data_model_object_id",
+                )
+        else:
+            yield field.related_model, self, "data_model"
+
+    def decay(self) -> int:
+        """
+        Decays the events that reached their next decay.
+
+        The reliability of their data models is decreased and
+        the next decay is computed from the decay progression
+        with a couple of UPDATE statements for each class of data models,
+        without loading the events.
 
+        Returns:
+            int: The number of decayed events.
+        """
+        decay_time = now()
         objects = (
             self.exclude(decay_progression=DecayProgressionEnum.FIXED.value)
             .exclude(next_decay__isnull=True)
             .filter(
-                next_decay__lte=now(),
+                next_decay__lte=decay_time,
             )
         )
-        # TODO we can probably translate all of this in sql query
-        for obj in objects:
-            obj: UserEvent
-            obj.decay_times += 1
-            obj.data_model.reliability -= 1
-            if obj.data_model.reliability == 0:
-                obj.next_decay = None
-            else:
-                if obj.decay_progression == DecayProgressionEnum.LINEAR.value:
-                    obj.next_decay += datetime.timedelta(days=obj.decay_timedelta_days)
-                elif (
-                    obj.decay_progression
-                    == DecayProgressionEnum.INVERSE_EXPONENTIAL.value
-                ):
-                    obj.next_decay += datetime.timedelta(
-                        days=obj.decay_timedelta_days ** (obj.decay_times + 1)
-                    )
-            obj.data_model.save()
-            obj.save()
-        return objects.count()
+        one_day = Value(datetime.timedelta(days=1))
+        decayed = 0
+        with transaction.atomic():
+            for data_model_class, events, field in objects._get_data_model_events():
+                # every event decreases the reliability of its data model
+                decays = (
+                    events.filter(**{field: OuterRef("pk")})
+                    .order_by()
+                    .values(field)
+                    .annotate(decays=Count("pk"))
+                    .values("decays")
+                )
+                data_model_class.objects.filter(pk__in=events.values(field)).update(
+                    reliability=Greatest(F("reliability") - Subquery(decays), 0)
+                )
+                decayed += events.update(
+                    decay_times=F("decay_times") + 1,
+                    next_decay=Case(
+                        When(
+                            Exists(
+                                data_model_class.objects.filter(
+                                    pk=OuterRef(field), reliability=0
+                                )
+                            ),
+                            then=None,
+                        ),
+                        When(
+                            decay_progression=DecayProgressionEnum.LINEAR.value,
+                            then=F("next_decay")
+                            + ExpressionWrapper(
+                                F("decay_timedelta_days") * one_day,
+                                output_field=DurationField(),
+                            ),
+                        ),
+                        When(
+                            decay_progression=DecayProgressionEnum.INVERSE_EXPONENTIAL.value,
+                            then=F("next_decay")
+                            + ExpressionWrapper(
+                                # the decay times of the event, after this one, plus one
+                                Cast(
+                                    Power(
+                                        F("decay_timedelta_days"), F("decay_times") + 2
+                                    ),
+                                    IntegerField(),
+                                )
+                                * one_day,
+                                output_field=DurationField(),
+                            ),
+                        ),
+                        default=F("next_decay"),
+                        output_field=DateTimeField(),
+                    ),
+                )
+        return decayed
 
     def visible_for_user(self, user):
         if user.has_membership():
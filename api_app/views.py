@@ -8,7 +8,7 @@ from abc import ABCMeta, abstractmethod
 
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Count, Q
+from django.db.models import Count, Q, prefetch_related_objects
 from django.db.models.functions import Trunc
 from django.http import FileResponse
 from django.utils.timezone import now
@@ -59,6 +59,7 @@ from .serializers.elastic import (
     ElasticResponseSerializer,
 )
 from .serializers.job import (
+    BulkObservableAnalysisSerializer,
     CommentSerializer,
     FileJobSerializer,
     JobAvailabilitySerializer,
@@ -141,6 +142,14 @@ def ask_multi_analysis_availability(request):
         result = []
     else:
         result = jobs
+        prefetch_related_objects(
+            result,
+            "analyzers_to_execute",
+            "connectors_to_execute",
+            "visualizers_to_execute",
+            "playbook_to_execute",
+            "investigation",
+        )
     jrs = JobResponseSerializer(result, many=True).data
     logger.info(f"finished ask_multi_analysis_availability from user {request.user}")
     return Response(
@@ -266,6 +275,47 @@ def analyze_multiple_observables(request):
     )
 
 
+@api_view(["POST"])
+def analyze_observables_bulk(request):
+    """
+    API endpoint to start analysis jobs for a large number of observables.
+
+    This endpoint is meant for the import of many observables with the same
+    analyzers and parameters, like the IOCs of a feed. The parameters are validated
+    once for every classification of the observables, and the jobs are created
+    in batches, so it accepts many more observables than `analyze_multiple_observables`.
+    Duplicated observables are analyzed once.
+
+    Parameters:
+    - request (POST): Contains the observables and analyzer details.
+
+    Returns:
+    - 200: JSON response with the job details for each distinct observable.
+    """
+    logger.info(f"received analyze_observables_bulk from user {request.user}")
+    oas = BulkObservableAnalysisSerializer(
+        data=request.data, context={"request": request}
+    )
+    oas.is_valid(raise_exception=True)
+    jobs = oas.save(send_task=True)
+    prefetch_related_objects(
+        jobs,
+        "analyzers_to_execute",
+        "connectors_to_execute",
+        "visualizers_to_execute",
+        "playbook_to_execute",
+        "investigation",
+    )
+    jrs = JobResponseSerializer(jobs, many=True).data
+    logger.info(
+        f"finished analyze_observables_bulk from user {request.user}: {len(jobs)} jobs"
+    )
+    return Response(
+        jrs,
+        status=status.HTTP_200_OK,
+    )
+
+
 class CommentViewSet(ModelViewSet):
     """
     CommentViewSet provides the following actions:
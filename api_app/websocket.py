@@ -1,16 +1,25 @@
+import datetime
 import logging
-from typing import List
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Type
 
 from asgiref.sync import async_to_sync
 from channels.generic.websocket import JsonWebsocketConsumer
 from channels.layers import get_channel_layer
+from django.apps import apps
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.utils.functional import cached_property
+from django.utils.timezone import now
 
 from api_app.choices import Status
-from api_app.models import Job
+from api_app.models import AbstractReport, Job
 from api_app.serializers.job import WsJobSerializer
+from api_app.serializers.report import AbstractReportSerializer
 from certego_saas.apps.organization.membership import Membership
+from intel_owl.celery import get_queue_name
 
 User = get_user_model()
 
@@ -27,6 +36,9 @@ class JobConsumer(JsonWebsocketConsumer):
     job status.
     """
 
+    # reports waiting for the end of the debounce window of their job
+    PENDING_REPORTS_TIMEOUT = 60 * 10
+
     class JobChannelGroups:
         """
         Helper class to manage channel groups for a job.
@@ -171,7 +183,10 @@ class JobConsumer(JsonWebsocketConsumer):
         job_data = event["job"]
         logger.debug(f"job data: {job_data}")
         self.send_json(content=job_data)
-        if job_data["status"] in Status.final_statuses():
+        # the full job is always sent after the last patch
+        if not job_data.get("patch", False) and (
+            job_data["status"] in Status.final_statuses()
+        ):
             logger.debug("job sent to the client and terminated, close ws")
             self.close()
 
@@ -203,3 +218,128 @@ class JobConsumer(JsonWebsocketConsumer):
                 group,
                 {"type": "send.job", "job": job_data},
             )
+
+    @staticmethod
+    def _get_report_serializer_class(
+        report: AbstractReport,
+    ) -> Type[AbstractReportSerializer]:
+        # this import is required for a cyclic import
+        from api_app.analyzers_manager.serializers import AnalyzerReportSerializer
+        from api_app.connectors_manager.serializers import ConnectorReportSerializer
+        from api_app.pivots_manager.serializers import PivotReportSerializer
+        from api_app.visualizers_manager.serializers import VisualizerReportSerializer
+
+        for serializer_class in [
+            AnalyzerReportSerializer,
+            ConnectorReportSerializer,
+            PivotReportSerializer,
+            VisualizerReportSerializer,
+        ]:
+            if isinstance(report, serializer_class.Meta.model):
+                return serializer_class
+        raise TypeError(f"Unable to serialize report {report}")
+
+    @classmethod
+    def serialize_and_send_reports(
+        cls, job_id: int, reports: List[AbstractReport]
+    ) -> None:
+        """
+        Sends a patch of the job, with its status and the given reports,
+        to the appropriate channel groups.
+
+        Reports do not depend on the permissions of the users,
+        so the patch is serialized once for every group.
+        Clients update the reports of the job with the same id,
+        adding the others.
+
+        Args:
+            job_id (int): The id of the job of the reports.
+            reports (List[AbstractReport]): The updated reports.
+        """
+        job = Job.objects.only("pk", "status").get(pk=job_id)
+        patch = {"patch": True, "id": job.pk, "status": job.status}
+        for report in reports:
+            report_data = cls._get_report_serializer_class(report)(report).data
+            patch.setdefault(f"{report_data['type']}_reports", []).append(report_data)
+        channel_layer = get_channel_layer()
+        for group in cls.JobChannelGroups(job).group_list:
+            logger.debug(f"send patch of the job {job.pk} to the group: {group}")
+            async_to_sync(channel_layer.group_send)(
+                group,
+                {"type": "send.job", "job": patch},
+            )
+
+    @staticmethod
+    def _get_pending_reports_prefix(job_id: int) -> str:
+        return f"ws_job_{job_id}_report_"
+
+    @staticmethod
+    def _get_debounce_key(job_id: int) -> str:
+        return f"ws_job_{job_id}_debounce"
+
+    @classmethod
+    def schedule_reports(cls, job_id: int, reports: List[AbstractReport]) -> None:
+        """
+        Schedules the patch of the given reports of the job.
+
+        Reports updated in the same debounce window, also by other workers,
+        are sent together in a single patch at the end of the window.
+
+        Args:
+            job_id (int): The id of the job of the reports.
+            reports (List[AbstractReport]): The updated reports.
+        """
+        window = settings.WEBSOCKETS_PATCH_DEBOUNCE_SECONDS
+        if window <= 0:
+            cls.serialize_and_send_reports(job_id, reports)
+            return
+        prefix = cls._get_pending_reports_prefix(job_id)
+        # the pending reports are saved before taking the window:
+        # a window being flushed either finds them or is already closed
+        cache.set_many(
+            {
+                f"{prefix}{report._meta.model_name}_{report.pk}": report._meta.label
+                for report in reports
+            },
+            timeout=cls.PENDING_REPORTS_TIMEOUT,
+        )
+        # the first report of the window schedules the patch,
+        # the timeout closes the window if the task is lost
+        if cache.add(cls._get_debounce_key(job_id), True, timeout=window * 10):
+            from intel_owl.tasks import send_pending_reports
+
+            send_pending_reports.apply_async(
+                args=[job_id],
+                queue=get_queue_name(settings.DEFAULT_QUEUE),
+                MessageGroupId=str(uuid.uuid4()),
+                eta=now() + datetime.timedelta(seconds=window),
+            )
+
+    @classmethod
+    def send_pending_reports(cls, job_id: int) -> None:
+        """
+        Sends a single patch with the reports of the job scheduled
+        in the closing debounce window.
+
+        Args:
+            job_id (int): The id of the job of the reports.
+        """
+        cache.delete(cls._get_debounce_key(job_id))
+        pending = cache.get_where(cls._get_pending_reports_prefix(job_id))
+        if not pending:
+            return
+        cache.delete_many(pending.keys())
+        if Job.objects.filter(pk=job_id, status__in=Status.final_statuses()).exists():
+            logger.debug(f"job {job_id} is concluded, patch not required")
+            return
+        pks: Dict[str, List[int]] = defaultdict(list)
+        for key, label in pending.items():
+            pks[label].append(int(key.rsplit("_", 1)[1]))
+        reports = []
+        for label, report_pks in pks.items():
+            reports.extend(
+                apps.get_model(label)
+                .objects.filter(pk__in=report_pks)
+                .select_related("config")
+            )
+        cls.serialize_and_send_reports(job_id, reports)
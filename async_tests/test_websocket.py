@@ -192,13 +192,14 @@ class JobConsumerTestCase(WebsocketTestCase):
             time.sleep(1)
             job_analyzer_terminated = await communicator.receive_json_from()
             time.sleep(1)
+            # only the reports of the plugin are sent
+            self.assertTrue(job_analyzer_terminated["patch"])
             self.assertEqual(job_analyzer_terminated["id"], 1029)
-            self.assertEqual(job_analyzer_terminated["observable_name"], "test.com")
             self.assertEqual(
                 job_analyzer_terminated["status"], Job.STATUSES.PENDING.value
             )
-            self.assertIsNotNone(job_analyzer_terminated["analyzer_reports"])
-            self.assertIsNone(job_analyzer_terminated["finished_analysis_time"])
+            self.assertEqual(len(job_analyzer_terminated["analyzer_reports"]), 1)
+            self.assertNotIn("observable_name", job_analyzer_terminated)
             # terminate job (force status)
             job.status = Job.STATUSES.REPORTED_WITHOUT_FAILS
             await sync_to_async(job.save)()
@@ -21,6 +21,8 @@ if ! python manage.py migrate --check
     echo "Issue with migration exiting"
     exit 1
 fi
+# move the cached entries if the cache is not stored in the database anymore
+python manage.py migrate_cache
 # Collect static files
 python manage.py collectstatic --noinput
 echo "------------------------------"
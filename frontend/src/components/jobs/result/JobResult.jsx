@@ -11,6 +11,7 @@ import {
   ANALYZABLES_URI,
 } from "../../../constants/apiURLs";
 import { JobOverview } from "./JobOverview";
+import { applyJobPatch } from "./utils/applyJobPatch";
 
 import {
   generateJobNotification,
@@ -150,6 +151,14 @@ export default function JobResult() {
       console.debug("ws received:");
       console.debug(jobWsData);
       const wsJobData = JSON.parse(jobWsData.data);
+      if (wsJobData.patch) {
+        // only the updated reports are sent while the job is running
+        setData((previousData) => ({
+          ...previousData,
+          job: applyJobPatch(previousData.job, wsJobData),
+        }));
+        return;
+      }
       if (Object.values(JobFinalStatuses).includes(wsJobData.status)) {
         jobWebsocket.current.close(1000);
       }
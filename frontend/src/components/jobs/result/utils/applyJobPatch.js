@@ -0,0 +1,22 @@
+export function applyJobPatch(job, patch) {
+  /**
+   * Return the job updated with a patch received from the websocket:
+   * reports replace the ones with the same id, the others are added.
+   */
+  const updatedJob = { ...job };
+  Object.entries(patch).forEach(([key, value]) => {
+    if (key === "patch") return;
+    if (key.endsWith("_reports")) {
+      const reports = [...(job[key] || [])];
+      value.forEach((report) => {
+        const index = reports.findIndex((elem) => elem.id === report.id);
+        if (index === -1) reports.push(report);
+        else reports[index] = report;
+      });
+      updatedJob[key] = reports;
+    } else {
+      updatedJob[key] = value;
+    }
+  });
+  return updatedJob;
+}
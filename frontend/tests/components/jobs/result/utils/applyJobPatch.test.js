@@ -0,0 +1,37 @@
+const {
+  applyJobPatch,
+} = require("../../../../../src/components/jobs/result/utils/applyJobPatch");
+
+describe("applyJobPatch test", () => {
+  test("reports are replaced or added", () => {
+    const job = {
+      id: 2,
+      status: "analyzers_running",
+      analyzer_reports: [
+        { id: 1, name: "AbuseIPDB", status: "RUNNING" },
+        { id: 2, name: "Classic_DNS", status: "SUCCESS" },
+      ],
+      connector_reports: [],
+    };
+    const patch = {
+      patch: true,
+      id: 2,
+      status: "analyzers_completed",
+      analyzer_reports: [{ id: 1, name: "AbuseIPDB", status: "SUCCESS" }],
+      visualizer_reports: [{ id: 3, name: "DNS", status: "SUCCESS" }],
+    };
+    const result = applyJobPatch(job, patch);
+    expect(result.status).toBe("analyzers_completed");
+    expect(result.patch).toBeUndefined();
+    expect(result.analyzer_reports).toEqual([
+      { id: 1, name: "AbuseIPDB", status: "SUCCESS" },
+      { id: 2, name: "Classic_DNS", status: "SUCCESS" },
+    ]);
+    expect(result.connector_reports).toEqual([]);
+    expect(result.visualizer_reports).toEqual([
+      { id: 3, name: "DNS", status: "SUCCESS" },
+    ]);
+    // the original job is not modified
+    expect(job.analyzer_reports[0].status).toBe("RUNNING");
+  });
+});
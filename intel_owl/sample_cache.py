@@ -0,0 +1,176 @@
+# This file is a part of IntelOwl https://github.com/intelowlproject/IntelOwl
+# See the file 'LICENSE' for copying permission.
+
+import fcntl
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SampleCache:
+    """
+    Content addressed cache of the samples downloaded from a remote storage,
+    shared by every worker process of the host.
+
+    Every sample is saved once as `<root>/<sha256[:2]>/<sha256>`, next to a lock
+    file. Users of a sample hold a shared lock on it until they release it,
+    the download is done holding an exclusive lock. When the disk budget
+    is exceeded, the least recently used samples that are not locked are removed.
+    """
+
+    EVICTION_LOCK_NAME = ".eviction.lock"
+
+    def __init__(self, root: Path, max_size: int):
+        self.root = Path(root)
+        self.max_size = max_size
+        # file descriptors of the locks held by this process, for every sample
+        self._locks: Dict[str, List[int]] = {}
+
+    def get_path(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256
+
+    @staticmethod
+    def _get_lock_path(path: Path) -> Path:
+        return path.with_name(f"{path.name}.lock")
+
+    @staticmethod
+    def _lock(lock_path: Path, operation: int) -> int:
+        """Lock the file, retrying if it was removed by an eviction meanwhile.
+
+        Args:
+            lock_path (Path): path of the lock file
+            operation (int): `fcntl.LOCK_SH` or `fcntl.LOCK_EX`
+
+        Returns:
+            int: file descriptor holding the lock
+        """
+        while True:
+            fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o660)
+            fcntl.flock(fd, operation)
+            try:
+                if os.stat(lock_path).st_ino == os.fstat(fd).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    def acquire(self, sha256: str, fetch: Callable[[BinaryIO], None]) -> str:
+        """Return the local path of the sample, downloading it if missing.
+
+        The sample can't be evicted until `release` is called.
+
+        Args:
+            sha256 (str): sha256 of the sample
+            fetch (Callable[[BinaryIO], None]): writes the sample in the given file
+
+        Returns:
+            str: path of the sample
+        """
+        path = self.get_path(sha256)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lock_path = self._get_lock_path(path)
+        fd = self._lock(lock_path, fcntl.LOCK_SH)
+        try:
+            if not path.exists():
+                # upgrading the lock is not atomic: another process
+                # could have downloaded the sample in the meantime
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                if not path.exists():
+                    self._download(path, fetch)
+                    downloaded = True
+                else:
+                    downloaded = False
+                fcntl.flock(fd, fcntl.LOCK_SH)
+            else:
+                downloaded = False
+                # the modification time is used as last access for the eviction
+                os.utime(path)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._locks.setdefault(str(path), []).append(fd)
+        if downloaded:
+            self.evict()
+        return str(path)
+
+    def release(self, path: str) -> None:
+        """Release the sample acquired with `acquire`.
+
+        Args:
+            path (str): path of the sample
+        """
+        fds = self._locks.get(path, [])
+        if not fds:
+            logger.warning(f"Sample {path} was not acquired")
+            return
+        os.close(fds.pop())
+        if not fds:
+            del self._locks[path]
+
+    @staticmethod
+    def _download(path: Path, fetch: Callable[[BinaryIO], None]) -> None:
+        logger.info(f"Downloading sample {path.name}")
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                fetch(f)
+            # readers never see a partially written sample
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _get_samples(self) -> List[Tuple[Path, os.stat_result]]:
+        samples = []
+        for directory in self.root.iterdir():
+            if not directory.is_dir():
+                continue
+            for path in directory.iterdir():
+                if path.name.startswith(".") or path.suffix == ".lock":
+                    continue
+                try:
+                    samples.append((path, path.stat()))
+                except FileNotFoundError:
+                    continue
+        return samples
+
+    def evict(self) -> None:
+        """Remove the least recently used samples exceeding the disk budget.
+
+        Samples in use by any process are skipped.
+        """
+        eviction_fd = os.open(
+            self.root / self.EVICTION_LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o660
+        )
+        try:
+            try:
+                fcntl.flock(eviction_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # another process is already evicting
+                return
+            samples = self._get_samples()
+            size = sum(stat.st_size for _, stat in samples)
+            for path, stat in sorted(samples, key=lambda sample: sample[1].st_mtime):
+                if size <= self.max_size:
+                    break
+                lock_path = self._get_lock_path(path)
+                fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o660)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # in use
+                    os.close(fd)
+                    continue
+                try:
+                    logger.info(f"Evicting sample {path.name}")
+                    path.unlink(missing_ok=True)
+                    lock_path.unlink(missing_ok=True)
+                    size -= stat.st_size
+                finally:
+                    os.close(fd)
+        finally:
+            os.close(eviction_fd)
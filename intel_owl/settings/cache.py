@@ -1,25 +1,36 @@
 # This file is a part of IntelOwl https://github.com/intelowlproject/IntelOwl
 # See the file 'LICENSE' for copying permission.
-from typing import Any, Dict
+import re
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
 from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.redis import RedisCache
 from django.db import ProgrammingError, connections, router
 
+from ._util import get_secret
+
 
 def plain_key(key, key_prefix, version):
     return key  # just return the key without doing anything
 
 
+def _glob_escape(pattern: str) -> str:
+    return re.sub(r"([*?\[\]\\])", r"\\\1", pattern)
+
+
 class DatabaseCacheExtended(DatabaseCache):
     """
     Reference SO:
     https://stackoverflow.com/questions/37621392/enumerating-keys-in-django-database-cache
     """
 
-    def get_where(self, starts_with: str, version=None) -> Dict[str, Any]:
-        """
-        Usage: cache.get_where('string%')
-        """
+    def _get_rows_where(
+        self, starts_with: str, version=None
+    ) -> List[Tuple[str, str, datetime]]:
         db = router.db_for_read(self.cache_model_class)
         table = connections[db].ops.quote_name(self._table)
         query = self.make_and_validate_key(starts_with + "%", version=version)
@@ -31,17 +42,172 @@ class DatabaseCacheExtended(DatabaseCache):
                     [query],
                 )
             except ProgrammingError:
-                return {}
-            rows = cursor.fetchall()
+                return []
+            return cursor.fetchall()
+
+    def get_where(self, starts_with: str, version=None) -> Dict[str, Any]:
+        """
+        Usage: cache.get_where('string%')
+        """
+        rows = self._get_rows_where(starts_with, version=version)
         if len(rows) < 1:
             return {}
         return self.get_many([row[0] for row in rows], version=version)
 
+    def get_expires_where(self, starts_with: str, version=None) -> Dict[str, datetime]:
+        """
+        Expiration dates of the keys starting with the given string
+        """
+        return {
+            row[0]: row[2] for row in self._get_rows_where(starts_with, version=version)
+        }
+
+
+class RedisCacheExtended(RedisCache):
+    """
+    Redis cache with the same `get_where` of `DatabaseCacheExtended`.
+
+    Every key is indexed in a sorted set for each of its prefixes ending
+    with `PREFIX_SEPARATOR`, scored with its expiration time, so that
+    looking for a prefix reads only the members of the longest indexed prefix
+    instead of scanning the whole keyspace.
+    Only the queries without `PREFIX_SEPARATOR` scan the keyspace.
+    """
 
-CACHES = {
-    "default": {
-        "BACKEND": "intel_owl.settings.cache.DatabaseCacheExtended",
-        "LOCATION": "intelowl_cache",
-        "KEY_FUNCTION": "intel_owl.settings.cache.plain_key",
+    PREFIX_SEPARATOR = "_"
+    INDEX_KEY_PREFIX = "prefix_index:"
+
+    @classmethod
+    def _get_prefixes(cls, key: str) -> List[str]:
+        # keys without separator are not indexed:
+        # `get_where` finds them scanning the keyspace
+        prefixes = []
+        position = key.find(cls.PREFIX_SEPARATOR)
+        while position != -1:
+            prefixes.append(key[: position + 1])
+            position = key.find(cls.PREFIX_SEPARATOR, position + 1)
+        return prefixes
+
+    @classmethod
+    def _get_index_key(cls, prefix: str) -> str:
+        return f"{cls.INDEX_KEY_PREFIX}{prefix}"
+
+    def _index(self, keys: Iterable[str], timeout: Optional[int]) -> None:
+        now = time.time()
+        expires = float("inf") if timeout is None else now + timeout
+        index = defaultdict(list)
+        for key in keys:
+            for prefix in self._get_prefixes(key):
+                index[self._get_index_key(prefix)].append(key)
+        pipeline = self._cache.get_client(write=True).pipeline(transaction=False)
+        for index_key, members in index.items():
+            if timeout == 0:
+                # the keys were deleted
+                pipeline.zrem(index_key, *members)
+            else:
+                pipeline.zadd(index_key, dict.fromkeys(members, expires))
+            # drop the keys expired meanwhile
+            pipeline.zremrangebyscore(index_key, "-inf", now)
+        pipeline.execute()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = super().add(key, value, timeout=timeout, version=version)
+        if added:
+            self._index(
+                [self.make_and_validate_key(key, version=version)],
+                self.get_backend_timeout(timeout),
+            )
+        return added
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        super().set(key, value, timeout=timeout, version=version)
+        self._index(
+            [self.make_and_validate_key(key, version=version)],
+            self.get_backend_timeout(timeout),
+        )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed_keys = super().set_many(data, timeout=timeout, version=version)
+        self._index(
+            [self.make_and_validate_key(key, version=version) for key in data],
+            self.get_backend_timeout(timeout),
+        )
+        return failed_keys
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        touched = super().touch(key, timeout=timeout, version=version)
+        if touched:
+            self._index(
+                [self.make_and_validate_key(key, version=version)],
+                self.get_backend_timeout(timeout),
+            )
+        return touched
+
+    def delete(self, key, version=None):
+        deleted = super().delete(key, version=version)
+        self._index([self.make_and_validate_key(key, version=version)], 0)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        super().delete_many(keys, version=version)
+        self._index(
+            [self.make_and_validate_key(key, version=version) for key in keys], 0
+        )
+
+    def get_where(self, starts_with: str, version=None) -> Dict[str, Any]:
+        """
+        Usage: cache.get_where('string')
+        """
+        query = self.make_and_validate_key(starts_with, version=version)
+        # longest indexed prefix of the query
+        prefix = query[: query.rfind(self.PREFIX_SEPARATOR) + 1]
+        client = self._cache.get_client()
+        if prefix:
+            members = client.zrangebyscore(
+                self._get_index_key(prefix), time.time(), "+inf"
+            )
+        else:
+            members = client.scan_iter(match=f"{_glob_escape(query)}*")
+        keys = []
+        for member in members:
+            if isinstance(member, bytes):
+                member = member.decode()
+            if member.startswith(query) and not member.startswith(
+                self.INDEX_KEY_PREFIX
+            ):
+                keys.append(member)
+        if len(keys) < 1:
+            return {}
+        return self.get_many(keys, version=version)
+
+
+DATABASE_CACHE_LOCATION = "intelowl_cache"
+# when set, the cache is moved from the database to redis:
+# `python manage.py migrate_cache` moves the entries cached in the database
+CACHE_REDIS_URL = get_secret("CACHE_REDIS_URL", "")
+if CACHE_REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "intel_owl.settings.cache.RedisCacheExtended",
+            "LOCATION": CACHE_REDIS_URL,
+            "KEY_FUNCTION": "intel_owl.settings.cache.plain_key",
+        }
     }
-}
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "intel_owl.settings.cache.DatabaseCacheExtended",
+            "LOCATION": DATABASE_CACHE_LOCATION,
+            "KEY_FUNCTION": "intel_owl.settings.cache.plain_key",
+        }
+    }
+
+# max number of entries of the per-process cache of the plugins parameters
+CONFIGURED_PARAMS_CACHE_MAX_ENTRIES = int(
+    get_secret("CONFIGURED_PARAMS_CACHE_MAX_ENTRIES", 1024)
+)
+# seconds the parameters resolved while building a job pipeline are kept
+JOB_CONFIGURED_PARAMS_CACHE_TIMEOUT = int(
+    get_secret("JOB_CONFIGURED_PARAMS_CACHE_TIMEOUT", 60 * 60)
+)
@@ -1,5 +1,6 @@
 # This file is a part of IntelOwl https://github.com/intelowlproject/IntelOwl
 # See the file 'LICENSE' for copying permission.
+import os
 from pathlib import Path, PosixPath
 
 from ._util import get_secret
@@ -15,6 +16,17 @@ MEDIA_ROOT = BASE_DIR / "files_required"
 CONFIG_ROOT = PROJECT_LOCATION / "configuration"
 BLINT_REPORTS_PATH = MEDIA_ROOT / "blint"
 YARA_RULES_PATH = MEDIA_ROOT / "yara"  # path for manual yara rules
+# memory budget (in MB) of the compiled yara rules kept loaded by every worker
+YARA_RULES_CACHE_SIZE_MB = int(get_secret("YARA_RULES_CACHE_SIZE_MB", 512))
+# memory budget (in MB) of the artifacts of the samples, like their content
+# or their parsed structures, shared by the file analyzers of every worker
+FILE_ANALYZER_ARTIFACT_CACHE_SIZE_MB = int(
+    get_secret("FILE_ANALYZER_ARTIFACT_CACHE_SIZE_MB", 256)
+)
+# processes used to validate the yara rules that changed after an update
+YARA_COMPILE_WORKERS = int(get_secret("YARA_COMPILE_WORKERS", os.cpu_count() or 1))
+# threads used to scan a sample with the rules of different repositories
+YARA_SCAN_WORKERS = int(get_secret("YARA_SCAN_WORKERS", 1))
 
 LOG_DIR = Path("/") / "var" / "log" / "intel_owl"
 # test / ci
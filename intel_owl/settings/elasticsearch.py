@@ -32,6 +32,10 @@ if ELASTICSEARCH_BI_ENABLED:
 ELASTICSEARCH_DSL_ENABLED = (
     secrets.get_secret("ELASTICSEARCH_DSL_ENABLED", False) == "True"
 )
+# threads indexing the plugin reports when the indexing is behind
+ELASTICSEARCH_DSL_CATCH_UP_WORKERS = int(
+    secrets.get_secret("ELASTICSEARCH_DSL_CATCH_UP_WORKERS", 4)
+)
 if ELASTICSEARCH_DSL_ENABLED:
     ELASTICSEARCH_DSL_HOST = secrets.get_secret("ELASTICSEARCH_DSL_HOST")
     if ELASTICSEARCH_DSL_HOST:
@@ -1,9 +1,10 @@
 # This file is a part of IntelOwl https://github.com/intelowlproject/IntelOwl
 # See the file 'LICENSE' for copying permission.
 
-import os
+import shutil
 
 from django.core.files.storage import FileSystemStorage
+from django.utils.functional import cached_property
 
 from intel_owl import secrets
 
@@ -19,6 +20,9 @@ STATICFILES_DIRS = [
 
 NFS = get_secret("NFS", "False") == "True"
 LOCAL_STORAGE = get_secret("LOCAL_STORAGE", "True") == "True"
+# samples downloaded from the remote storage, shared by the analyzers of the host
+SAMPLE_CACHE_PATH = MEDIA_ROOT / "samples"
+SAMPLE_CACHE_SIZE_MB = int(get_secret("SAMPLE_CACHE_SIZE_MB", 2048))
 # Storage settings
 if LOCAL_STORAGE:
 
@@ -28,31 +32,37 @@ if LOCAL_STORAGE:
             # we have one single sample for every analyzer
             return file.path
 
+        @staticmethod
+        def release(path):
+            # the single sample is never removed
+            return
+
     DEFAULT_FILE_STORAGE = "intel_owl.settings.FileSystemStorageWrapper"
 else:
     from storages.backends.s3boto3 import S3Boto3Storage
 
     class S3Boto3StorageWrapper(S3Boto3Storage):
-        def retrieve(self, file, analyzer):
-            # FIXME we can optimize this a lot.
-            #  Right now we are doing an http request FOR analyzer. We can have a
-            #  proxy that will store the content and then save it locally
+        @cached_property
+        def sample_cache(self):
+            from intel_owl.sample_cache import SampleCache
+
+            return SampleCache(SAMPLE_CACHE_PATH, SAMPLE_CACHE_SIZE_MB * 1024 * 1024)
 
-            # The idea is to download the file in MEDIA_ROOT/analyzer/namefile
-            # if it does not exist
-            path_dir = os.path.join(MEDIA_ROOT, analyzer)
+        def retrieve(self, file, analyzer):
+            # the sample is downloaded once for every analyzer of the host
+            # and kept until it is evicted by the disk budget
             name = file.name
-            _path = os.path.join(path_dir, name)
-            if not os.path.exists(_path):
-                os.makedirs(path_dir, exist_ok=True)
+
+            def fetch(local_file_object):
                 if not self.exists(name):
                     raise AssertionError
                 with self.open(name) as s3_file_object:
-                    content = s3_file_object.read()
-                    s3_file_object.seek(0)
-                    with open(_path, "wb") as local_file_object:
-                        local_file_object.write(content)
-            return _path
+                    shutil.copyfileobj(s3_file_object, local_file_object)
+
+            return self.sample_cache.acquire(file.instance.sha256, fetch)
+
+        def release(self, path):
+            self.sample_cache.release(path)
 
     DEFAULT_FILE_STORAGE = "intel_owl.settings.S3Boto3StorageWrapper"
     AWS_STORAGE_BUCKET_NAME = secrets.get_secret("AWS_STORAGE_BUCKET_NAME")
@@ -3,6 +3,10 @@ import socket
 from intel_owl import secrets
 
 websockets_url = secrets.get_secret("WEBSOCKETS_URL", "redis://redis:6379/0")
+# reports updated in this window are sent to the clients in a single patch
+WEBSOCKETS_PATCH_DEBOUNCE_SECONDS = float(
+    secrets.get_secret("WEBSOCKETS_PATCH_DEBOUNCE_SECONDS", 1)
+)
 if not websockets_url:
     if socket.gethostname() in ["uwsgi", "daphne"]:
         raise RuntimeError("Unable to configure websockets. Please set WEBSOCKETS_URL")
@@ -4,11 +4,14 @@
 from __future__ import absolute_import, unicode_literals
 
 import datetime
+import itertools
 import json
 import logging
+import time
 import typing
 import uuid
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Generator
 
 import inflection
 from celery import Task, shared_task, signals
@@ -16,17 +19,24 @@ from celery.worker.consumer import Consumer
 from celery.worker.control import control_command
 from celery.worker.request import Request
 from django.conf import settings
+from django.db import connection
 from django.utils.timezone import now
 from django_celery_beat.models import PeriodicTask
-from elasticsearch.helpers import bulk
+from elasticsearch.helpers import BulkIndexError, bulk
 
 from api_app.choices import ReportStatus, Status
 from intel_owl import secrets
 from intel_owl.celery import app, get_queue_name
 from intel_owl.settings._util import get_environment
 
+if TYPE_CHECKING:
+    from api_app.models import AbstractReport
+
 logger = logging.getLogger(__name__)
 
+# plugin reports indexed by each thread when the indexing is behind
+PLUGIN_REPORT_ELASTIC_WINDOW = datetime.timedelta(minutes=5)
+
 
 class FailureLoggedRequest(Request):
     def on_timeout(self, soft, timeout):
@@ -75,33 +85,54 @@ def execute_ingestor(config_name: str):
 
 
 @shared_task(base=FailureLoggedTask, soft_time_limit=10000)
-def remove_old_jobs():
+def remove_old_jobs(chunk_size: int = 1000):
     """
     this is to remove old jobs to avoid to fill the database.
     Retention can be modified.
+
+    Expired jobs are deleted with their subtrees in chunks, with set-based
+    queries, while the files of the analyzables left without jobs
+    are removed from the storage in background threads.
     """
+    from api_app.analyzables_manager.models import Analyzable
     from api_app.models import Job
 
     logger.info("started remove_old_jobs")
 
     retention_days = int(secrets.get_secret("OLD_JOBS_RETENTION_DAYS", 14))
     date_to_check = now() - datetime.timedelta(days=retention_days)
-    old_jobs = Job.objects.filter(finished_analysis_time__lt=date_to_check)
-    num_jobs_to_delete = old_jobs.count()
-    logger.info(f"found {num_jobs_to_delete} old jobs to delete")
-    for old_job in old_jobs.iterator():
-        # if the job that we are going to delete is the last one, and it has a file
-        if old_job.analyzable.jobs.count() == 1 and old_job.analyzable.file:
-            old_job.analyzable.file.delete()
-        try:
-            old_job.delete()
-        except Job.DoesNotExist as e:
-            logger.warning(
-                f"job {old_job.id} does not exist. Err: {e}", stack_info=True
+    old_jobs = Job.objects.filter(finished_analysis_time__lt=date_to_check).order_by(
+        "pk"
+    )
+    storage = Analyzable._meta.get_field("file").storage
+    start = time.perf_counter()
+    num_jobs_deleted = 0
+    last_pk = None
+    with ThreadPoolExecutor() as pool:
+        removals = []
+        while True:
+            chunk = old_jobs if last_pk is None else old_jobs.filter(pk__gt=last_pk)
+            chunk = list(chunk.values_list("pk", flat=True)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1]
+            deleted, files = Job.objects.filter(pk__in=chunk).bulk_delete()
+            num_jobs_deleted += deleted
+            removals.extend(pool.submit(storage.delete, name) for name in files)
+            logger.info(
+                f"remove_old_jobs: deleted {num_jobs_deleted} jobs, "
+                f"removing {len(removals)} files, "
+                f"elapsed {time.perf_counter() - start:.1f}s"
             )
+        for removal in removals:
+            if removal.exception():
+                logger.warning(f"unable to remove file: {removal.exception()}")
 
-    logger.info("finished remove_old_jobs")
-    return num_jobs_to_delete
+    logger.info(
+        f"finished remove_old_jobs: deleted {num_jobs_deleted} jobs "
+        f"and {len(removals)} files in {time.perf_counter() - start:.1f}s"
+    )
+    return num_jobs_deleted
 
 
 @shared_task(base=FailureLoggedTask)
@@ -137,6 +168,7 @@ def check_stuck_analysis(minutes_ago: int = 25, check_pending: bool = False):
         job.status = Job.STATUSES.FAILED.value
         job.finished_analysis_time = now()
         job.save(update_fields=["status", "finished_analysis_time"])
+        job.update_investigation_status()
 
     logger.info("started check_stuck_analysis")
     running_jobs = Job.objects.running(
@@ -281,7 +313,7 @@ def run_plugin(
     task_id: int,
 ):
     from api_app.classes import Plugin
-    from api_app.models import Job, PythonModule
+    from api_app.models import PythonModule
     from api_app.websocket import JobConsumer
 
     logger.info(
@@ -308,16 +340,23 @@ def run_plugin(
         config.reports.filter(job__pk=job_id).update(
             status=plugin.report_model.STATUSES.FAILED.value
         )
-    job = Job.objects.get(pk=job_id)
-    JobConsumer.serialize_and_send_job(job)
+    # only the reports of the plugin changed
+    JobConsumer.schedule_reports(
+        job_id, list(config.reports.filter(job__pk=job_id).select_related("config"))
+    )
 
 
-@shared_task(base=FailureLoggedTask, name="create_caches", soft_time_limit=200)
-def create_caches(user_pk: int):
-    # we create the cache hit
-    from certego_saas.apps.user.models import User
+@shared_task(base=FailureLoggedTask, name="send_pending_reports", soft_time_limit=30)
+def send_pending_reports(job_id: int):
+    from api_app.websocket import JobConsumer
+
+    JobConsumer.send_pending_reports(job_id)
+
 
-    user = User.objects.get(pk=user_pk)
+@shared_task(base=FailureLoggedTask, name="create_caches", soft_time_limit=200)
+def create_caches():
+    # we create the cache hit of the representations shared by every user,
+    # the ones of users and organizations are created when requested
     from api_app.analyzers_manager.models import AnalyzerConfig
     from api_app.analyzers_manager.serializers import AnalyzerConfigSerializer
     from api_app.connectors_manager.models import ConnectorConfig
@@ -338,15 +377,13 @@ def create_caches(user_pk: int):
         (IngestorConfig, IngestorConfigSerializer),
     ]:
         for plugin in python_config_class.objects.all():
-            PythonConfigListSerializer(
-                child=serializer_class()
-            ).to_representation_single_plugin(plugin, user)
+            PythonConfigListSerializer(child=serializer_class()).to_representation_base(
+                plugin
+            )
 
 
 @signals.beat_init.connect
 def beat_init_connect(*args, sender: Consumer = None, **kwargs):
-    from certego_saas.models import User
-
     logger.info("Starting beat_init signal")
     # update of plugins that needs it
     for task in PeriodicTask.objects.filter(
@@ -360,14 +397,11 @@ def beat_init_connect(*args, sender: Consumer = None, **kwargs):
             args=[python_module_pk],
         )
 
-    # creating cache excluding system users
-    for user in User.objects.exclude(email=""):
-        logger.info(f"Creating cache for user {user.username}")
-        create_caches.apply_async(
-            queue=get_queue_name(settings.DEFAULT_QUEUE),
-            MessageGroupId=str(uuid.uuid4()),
-            args=[user.pk],
-        )
+    logger.info("Creating cache of the plugins")
+    create_caches.apply_async(
+        queue=get_queue_name(settings.DEFAULT_QUEUE),
+        MessageGroupId=str(uuid.uuid4()),
+    )
 
 
 @shared_task(base=FailureLoggedTask, name="send_bi_to_elastic", soft_time_limit=300)
@@ -390,117 +424,192 @@ def send_bi_to_elastic(max_timeout: int = 60, max_objects: int = 10000):
             report_class: typing.Type[AbstractReport]
             report_class.objects.filter(sent_to_bi=False).filter_completed().defer(
                 "report"
-            ).order_by("-start_time")[:max_objects].send_to_elastic_as_bi(
-                max_timeout=max_timeout
-            )
-        Job.objects.filter(sent_to_bi=False).filter_completed().order_by(
-            "-received_request_time"
-        )[:max_objects].send_to_elastic_as_bi(max_timeout=max_timeout)
-
+            ).send_to_elastic_as_bi(max_timeout=max_timeout, max_objects=max_objects)
+        Job.objects.filter(sent_to_bi=False).filter_completed().send_to_elastic_as_bi(
+            max_timeout=max_timeout, max_objects=max_objects
+        )
 
-@shared_task(
-    base=FailureLoggedTask, name="send_plugin_report_to_elastic", soft_time_limit=300
-)
-def send_plugin_report_to_elastic(max_timeout: int = 60, max_objects: int = 10000):
 
+def _get_plugin_report_documents(
+    report_class: typing.Type["AbstractReport"],
+    start_time: datetime.datetime,
+    end_time: datetime.datetime,
+) -> Generator[Dict, None, None]:
+    index_prefix = (
+        "plugin-report-"
+        f"{get_environment()}-"
+        f"{inflection.underscore(report_class.__name__).replace('_', '-')}-"
+    )
+    reports = (
+        report_class.objects.filter(
+            status__in=ReportStatus.final_statuses(),
+            end_time__gte=start_time,
+            end_time__lt=end_time,
+        )
+        .select_related("config", "job__user__membership__organization")
+        .order_by("end_time", "pk")
+    )
+    for report in reports.iterator(chunk_size=1000):
+        yield {
+            "_op_type": "index",
+            # the windows indexed again overwrite the reports already sent:
+            # both index and id depend only on the report
+            "_index": f"{index_prefix}{report.end_time.date()}",
+            "_id": f"{report_class.__name__}-{report.pk}",
+            "_source": {
+                "user": {"username": report.user.username},
+                "membership": (
+                    {
+                        "is_owner": report.user.membership.is_owner,
+                        "is_admin": report.user.membership.is_admin,
+                        "organization": {
+                            "name": report.user.membership.organization.name,
+                        },
+                    }
+                    if report.user.has_membership()
+                    else {}
+                ),
+                "config": {
+                    "name": report.config.name,
+                    "plugin_name": report.config.plugin_name.lower(),
+                },
+                "job": {"id": report.job.id},
+                "start_time": report.start_time,
+                "end_time": report.end_time,
+                "status": report.status,
+                "report": report.report,
+                "errors": report.errors,
+            },
+        }
+
+
+def _send_plugin_reports_to_elastic(
+    start_time: datetime.datetime,
+    end_time: datetime.datetime,
+    max_timeout: int,
+    max_objects: int,
+) -> None:
     from api_app.analyzers_manager.models import AnalyzerReport
     from api_app.connectors_manager.models import ConnectorReport
-    from api_app.models import AbstractReport
     from api_app.pivots_manager.models import PivotReport
 
-    if settings.ELASTICSEARCH_DSL_ENABLED and settings.ELASTICSEARCH_DSL_HOST:
-        upper_threshold = now().replace(second=0, microsecond=0)
-        lower_threshold = upper_threshold - datetime.timedelta(minutes=1)
-        logger.info(
-            f"add to elastic reports from: {lower_threshold} to {upper_threshold}"
+    logger.info(f"add to elastic reports from: {start_time} to {end_time}")
+    # Add document. Remove ingestors and visualizers because they contain data useless in term of search functionality:
+    # ingestors contain samples and visualizers data about organizing the info inside the page.
+    documents = itertools.chain.from_iterable(
+        _get_plugin_report_documents(report_class, start_time, end_time)
+        for report_class in [AnalyzerReport, ConnectorReport, PivotReport]
+    )
+    # documents are generated while they are sent, max_objects at a time
+    success, errors = bulk(  # noqa
+        settings.ELASTICSEARCH_DSL_CLIENT,
+        documents,
+        chunk_size=max_objects,
+        raise_on_error=False,
+        stats_only=False,
+        request_timeout=max_timeout,
+    )
+    logger.info(
+        f"{success} documents added to elastic from: {start_time} to {end_time}"
+    )
+    retryable_errors = [error for error in errors if _is_retryable(error)]
+    if len(retryable_errors) < len(errors):
+        # elastic will never accept these documents: sending them again
+        # would stop the indexing of the following reports
+        logger.error(
+            f"Documents rejected by elastic from: {start_time} to {end_time}: "
+            f"{[error for error in errors if not _is_retryable(error)]}"
+        )
+    if retryable_errors:
+        # the checkpoint must not move past the reports that were not indexed
+        raise BulkIndexError(
+            f"{len(retryable_errors)} document(s) failed to index from: "
+            f"{start_time} to {end_time}",
+            retryable_errors,
         )
 
-        def _convert_report_to_elastic_document(
-            _class: AbstractReport,
-            start_time: datetime.datetime,
-            end_time: datetime.datetime,
-        ) -> List[Dict]:
-            report_list: list(AbstractReport) = _class.objects.filter(
-                status__in=ReportStatus.final_statuses(),
-                end_time__gte=start_time,
-                end_time__lt=end_time,
-            )
-            report_document_list = [
-                {
-                    "_op_type": "index",
-                    "_index": (
-                        "plugin-report-"
-                        f"{get_environment()}-"
-                        f"{inflection.underscore(_class.__name__).replace('_', '-')}-"
-                        f"{now().date()}"
-                    ),
-                    "_source": {
-                        "user": {"username": report.user.username},
-                        "membership": (
-                            {
-                                "is_owner": report.user.membership.is_owner,
-                                "is_admin": report.user.membership.is_admin,
-                                "organization": {
-                                    "name": report.user.membership.organization.name,
-                                },
-                            }
-                            if report.user.has_membership()
-                            else {}
-                        ),
-                        "config": {
-                            "name": report.config.name,
-                            "plugin_name": report.config.plugin_name.lower(),
-                        },
-                        "job": {"id": report.job.id},
-                        "start_time": report.start_time,
-                        "end_time": report.end_time,
-                        "status": report.status,
-                        "report": report.report,
-                        "errors": report.errors,
-                    },
-                }
-                for report in report_list
-            ]
-            logger.info(
-                f"{_class.__name__} has {len(report_document_list)} new documents to upload"
-            )
-            return report_document_list
 
-        # Add document. Remove ingestors and visualizers because they contain data useless in term of search functionality:
-        # ingestors contain samples and visualizers data about organizing the info inside the page.
-        all_report_document_list = (
-            _convert_report_to_elastic_document(
-                AnalyzerReport, lower_threshold, upper_threshold
-            )
-            + _convert_report_to_elastic_document(
-                ConnectorReport, lower_threshold, upper_threshold
-            )
-            + _convert_report_to_elastic_document(
-                PivotReport, lower_threshold, upper_threshold
-            )
+def _is_retryable(error: Dict) -> bool:
+    # each bulk error is {op_type: {"_id": ..., "status": ..., "error": ...}}
+    status = next(iter(error.values()), {}).get("status", None)
+    return status is None or status == 429 or status >= 500
+
+
+@shared_task(
+    base=FailureLoggedTask, name="send_plugin_report_to_elastic", soft_time_limit=300
+)
+def send_plugin_report_to_elastic(max_timeout: int = 60, max_objects: int = 500):
+    from api_app.models import LastElasticReportUpdate
+
+    if settings.ELASTICSEARCH_DSL_ENABLED and settings.ELASTICSEARCH_DSL_HOST:
+        upper_threshold = now().replace(second=0, microsecond=0)
+        checkpoint = LastElasticReportUpdate.get_solo()
+        # reports are indexed from the last successful execution,
+        # so that minutes skipped by beat are recovered
+        lower_threshold = (
+            checkpoint.last_update_datetime
+            or upper_threshold - datetime.timedelta(minutes=1)
         )
-        logger.info(f"Documents to add to elastic: {len(all_report_document_list)}")
-        if all_report_document_list:
-            logger.info(
-                ", ".join(
-                    [
-                        f"{document['_source']['job']['id']}-{document['_source']['config']['name']}"
-                        for document in all_report_document_list
-                    ]
-                )
-            )
-            _, errors = bulk(  # noqa
-                settings.ELASTICSEARCH_DSL_CLIENT,
-                all_report_document_list,
-                raise_on_error=False,
-                stats_only=False,
+        workers = max(settings.ELASTICSEARCH_DSL_CATCH_UP_WORKERS, 1)
+        windows = []
+        # each worker catches up at most one hour for each execution
+        while lower_threshold < upper_threshold and len(windows) < workers * 12:
+            window_end = min(
+                lower_threshold + PLUGIN_REPORT_ELASTIC_WINDOW, upper_threshold
             )
-            if not errors:
-                logger.info("Documents correctly inserted!")
-            else:
-                logger.error(f"Errors on document indexing: {errors}")
-        else:
+            windows.append((lower_threshold, window_end))
+            lower_threshold = window_end
+        if not windows:
             logger.info("No documents to add")
+            return
+
+        def send_window(window, close_connection: bool) -> None:
+            try:
+                _send_plugin_reports_to_elastic(*window, max_timeout, max_objects)
+            finally:
+                if close_connection:
+                    # every thread has its own connection
+                    connection.close()
+
+        if len(windows) == 1 or workers == 1:
+
+            def exceptions():
+                for window in windows:
+                    try:
+                        send_window(window, close_connection=False)
+                    except Exception as e:
+                        yield e
+                    else:
+                        yield None
+
+            _advance_elastic_checkpoint(checkpoint, windows, exceptions())
+        else:
+            logger.info(f"Indexing of plugin reports behind: {len(windows)} windows")
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(send_window, window, close_connection=True)
+                    for window in windows
+                ]
+                _advance_elastic_checkpoint(
+                    checkpoint, windows, (future.exception() for future in futures)
+                )
+                # the windows after a failed one are indexed again next time
+                for future in futures:
+                    future.cancel()
+
+
+def _advance_elastic_checkpoint(checkpoint, windows, exceptions) -> None:
+    # the checkpoint is saved as each window is indexed, in order,
+    # so that an interrupted catch up restarts from the last indexed window
+    for window, exception in zip(windows, exceptions):
+        if exception is not None:
+            logger.error(
+                f"Unable to index reports from {window[0]} to {window[1]}",
+                exc_info=exception,
+            )
+            break
+        checkpoint.last_update_datetime = window[1]
+        checkpoint.save()
 
 
 @shared_task(
@@ -0,0 +1,82 @@
+# This file is a part of IntelOwl https://github.com/intelowlproject/IntelOwl
+# See the file 'LICENSE' for copying permission.
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from api_app.analyzers_manager.artifact_cache import SampleArtifactCache
+from api_app.analyzers_manager.classes import FileAnalyzer
+
+
+class SampleArtifactCacheTestCase(TestCase):
+    def test_get_computes_once(self):
+        cache = SampleArtifactCache(1024)
+        factory = MagicMock(return_value=b"content")
+        self.assertEqual(b"content", cache.get(1, "sha256", "content", factory, len))
+        self.assertEqual(b"content", cache.get(1, "sha256", "content", factory, len))
+        factory.assert_called_once()
+        # every job computes its own artifacts
+        cache.get(2, "sha256", "content", factory, len)
+        self.assertEqual(2, factory.call_count)
+        self.assertEqual(
+            "magic", cache.get(1, "sha256", "magic", MagicMock(return_value="magic"))
+        )
+
+    def test_eviction(self):
+        cache = SampleArtifactCache(10)
+        cache.get(1, "first", "content", lambda: b"a" * 6, len)
+        cache.get(1, "second", "content", lambda: b"b" * 4, len)
+        factory = MagicMock(return_value=b"a" * 6)
+        cache.get(1, "first", "content", factory, len)
+        factory.assert_not_called()
+        # the least recently used sample is evicted
+        cache.get(1, "third", "content", lambda: b"c" * 2, len)
+        factory = MagicMock(return_value=b"b" * 4)
+        cache.get(1, "second", "content", factory, len)
+        factory.assert_called_once()
+        # artifacts exceeding the budget are not cached
+        cache.get(1, "fourth", "content", lambda: b"d" * 20, len)
+        factory = MagicMock(return_value=b"d" * 20)
+        cache.get(1, "fourth", "content", factory, len)
+        factory.assert_called_once()
+        self.assertLessEqual(cache._size, cache.max_size)
+        cache.invalidate()
+        self.assertEqual(set(), cache.get_job_ids())
+        self.assertEqual(0, cache._size)
+
+    def test_invalidate_jobs(self):
+        cache = SampleArtifactCache(1024)
+        cache.get(1, "first", "content", lambda: b"a", len)
+        cache.get(2, "first", "content", lambda: b"a", len)
+        cache.get(3, "second", "content", lambda: b"b", len)
+        self.assertEqual({1, 2, 3}, cache.get_job_ids())
+        cache.invalidate([1, 3])
+        self.assertEqual({2}, cache.get_job_ids())
+        self.assertEqual(1, cache._size)
+
+    def test_factory_exception_is_not_cached(self):
+        cache = SampleArtifactCache(1024)
+        factory = MagicMock(side_effect=[ValueError("not a PE"), "pe"])
+        with self.assertRaises(ValueError):
+            cache.get(1, "sha256", "pe", factory)
+        self.assertEqual("pe", cache.get(1, "sha256", "pe", factory))
+
+    def test_file_analyzer_read_file_bytes(self):
+        cache = SampleArtifactCache(1024)
+        analyzer = MagicMock(spec=FileAnalyzer)
+        analyzer.job_id = 1
+        analyzer._job = SimpleNamespace(
+            analyzable=SimpleNamespace(
+                sha256="sha256", read=MagicMock(return_value=b"content")
+            )
+        )
+        analyzer.get_artifact = lambda *args: FileAnalyzer.get_artifact(analyzer, *args)
+        with patch("api_app.analyzers_manager.classes.sample_artifact_cache", cache):
+            analyzer.cache_artifacts = False
+            FileAnalyzer.read_file_bytes(analyzer)
+            FileAnalyzer.read_file_bytes(analyzer)
+            self.assertEqual(2, analyzer._job.analyzable.read.call_count)
+            analyzer.cache_artifacts = True
+            for _ in range(3):
+                self.assertEqual(b"content", FileAnalyzer.read_file_bytes(analyzer))
+            self.assertEqual(3, analyzer._job.analyzable.read.call_count)
@@ -0,0 +1,140 @@
+# This file is a part of IntelOwl https://github.com/intelowlproject/IntelOwl
+# See the file 'LICENSE' for copying permission.
+import ipaddress
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+from api_app.analyzers_manager.feed_index import FeedIndex, JsonFeedIndex
+
+logger = logging.getLogger(__name__)
+
+
+class FeedIndexTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.feed_path = os.path.join(self.directory, "feed.txt")
+        FeedIndex._indexes.clear()
+        JsonFeedIndex._indexes.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        FeedIndex._indexes.clear()
+        JsonFeedIndex._indexes.clear()
+
+    def _write(self, content: str):
+        with open(self.feed_path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def test_entries(self):
+        index = FeedIndex.from_lines(["# comment", "1.2.3.4", "", "example.com\r"])
+        self.assertIn("1.2.3.4", index)
+        self.assertIn("example.com", index)
+        self.assertNotIn("1.2.3.5", index)
+        self.assertNotIn("# comment", index)
+        self.assertNotIn("", index)
+
+    def test_networks(self):
+        index = FeedIndex.from_lines(
+            ["10.0.0.0/8", "11.0.0.0/8", "3.90.198.217", "2001:db8::/32", "invalid"],
+            networks=True,
+        )
+        self.assertEqual(3, len(index))
+        for ip in ("10.0.0.1", "11.255.255.255", "3.90.198.217", "2001:db8::1"):
+            self.assertIn(ip, index)
+        for ip in ("9.255.255.255", "12.0.0.0", "3.90.198.218", "2001:db9::1"):
+            self.assertNotIn(ip, index)
+        self.assertNotIn("example.com", index)
+
+    def test_load(self):
+        self._write("1.2.3.4\n")
+        with patch.object(FeedIndex, "build", wraps=FeedIndex.build) as build:
+            index = FeedIndex.load(self.feed_path)
+            self.assertIn("1.2.3.4", index)
+            # the index is built once, then saved
+            build.assert_called_once()
+            FeedIndex._indexes.clear()
+            index = FeedIndex.load(self.feed_path)
+            self.assertIn("1.2.3.4", index)
+            build.assert_called_once()
+        # the index is kept in memory until the feed changes
+        self.assertIs(index, FeedIndex.load(self.feed_path))
+        self._write("5.6.7.8\n")
+        os.utime(self.feed_path, ns=(0, 0))
+        index = FeedIndex.load(self.feed_path)
+        self.assertIn("5.6.7.8", index)
+        self.assertNotIn("1.2.3.4", index)
+
+    def test_json_feed(self):
+        self._write(
+            json.dumps(
+                [
+                    {"value": "1.2.3.4", "tags": ["first"]},
+                    {"value": "example.com", "tags": []},
+                    {"value": "1.2.3.4", "tags": ["second"]},
+                    {"tags": ["no value"]},
+                    {"value": None, "tags": ["null value"]},
+                ]
+            )
+        )
+        index = JsonFeedIndex.load(self.feed_path, key="value")
+        self.assertEqual(
+            [["first"], ["second"]], [tweet["tags"] for tweet in index.get("1.2.3.4")]
+        )
+        self.assertIn("example.com", index)
+        self.assertNotIn("None", index)
+        self.assertEqual([], index.get("5.6.7.8"))
+        self.assertEqual(3, len(index))
+        # persisted and memoized like the flat file indexes
+        self.assertTrue(os.path.exists(JsonFeedIndex.get_index_path(self.feed_path)))
+        self.assertIs(index, JsonFeedIndex.load(self.feed_path, key="value"))
+        self.assertEqual({}, FeedIndex._indexes)
+        # a different key invalidates the saved index
+        JsonFeedIndex._indexes.clear()
+        index = JsonFeedIndex.load(self.feed_path, key="tags")
+        self.assertIn("['first']", index)
+
+    def _test_lookups(self, number: int):
+        lines = [str(ipaddress.IPv4Address(i * 7)) for i in range(number)]
+        self._write("\n".join(lines))
+        step = max(number // 20, 1)
+        observables = [lines[i] for i in range(0, number, step)] + ["8.8.8.8"]
+
+        start = time.perf_counter()
+        for observable in observables:
+            # the lookup before the index
+            with open(self.feed_path, "r", encoding="utf-8") as f:
+                observable in f.read().split("\n")
+        flat_file = time.perf_counter() - start
+
+        FeedIndex.build(self.feed_path)
+        FeedIndex._indexes.clear()
+        start = time.perf_counter()
+        results = [
+            observable in FeedIndex.load(self.feed_path) for observable in observables
+        ]
+        indexed = time.perf_counter() - start
+        self.assertEqual([True] * (len(observables) - 1) + [False], results)
+        return len(observables), flat_file, indexed
+
+    def test_lookups(self):
+        self._test_lookups(1000)
+
+    @skipUnless(
+        os.environ.get("FEED_INDEX_BENCHMARK_LINES"),
+        "set FEED_INDEX_BENCHMARK_LINES to run the lookups on a large feed",
+    )
+    def test_benchmark(self):
+        # set FEED_INDEX_BENCHMARK_LINES=1000000 for a 1M lines feed
+        lines = int(os.environ["FEED_INDEX_BENCHMARK_LINES"])
+        lookups, flat_file, indexed = self._test_lookups(lines)
+        logger.info(
+            f"{lookups} lookups on a feed of {lines} lines: "
+            f"flat file {flat_file:.3f}s, indexed (with first load) {indexed:.3f}s"
+        )
+        self.assertLess(indexed, flat_file)
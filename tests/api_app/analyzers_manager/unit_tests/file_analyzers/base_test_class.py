@@ -8,6 +8,7 @@ from unittest.mock import MagicMock
 
 from django.utils import timezone
 
+from api_app.analyzers_manager.artifact_cache import sample_artifact_cache
 from api_app.analyzers_manager.models import AnalyzerConfig
 from api_app.choices import TLP
 
@@ -98,6 +99,8 @@ class BaseFileAnalyzerTest(TestCase):
 
     def setUp(self):
         super().setUp()
+        # the mocked artifacts of another analyzer must not be shared
+        sample_artifact_cache.invalidate()
         if self.analyzer_class:
             analyzer_module = self.analyzer_class.__module__
             logging.getLogger(analyzer_module).setLevel(logging.CRITICAL)
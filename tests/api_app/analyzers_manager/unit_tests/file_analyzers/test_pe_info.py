@@ -95,7 +95,7 @@ class PEInfoTest(BaseFileAnalyzerTest):
             ),
             # Mock magic
             patch(
-                "api_app.analyzers_manager.file_analyzers.pe_info.magic.from_buffer",
+                "api_app.analyzers_manager.file_analyzers.pe_info.magic.from_file",
                 return_value=mock_magic_output,
             ),
             # Mock DotNetPE
@@ -1,6 +1,20 @@
+import os
+import shutil
+import tempfile
+from pathlib import PosixPath
+from unittest import TestCase
 from unittest.mock import patch
 
-from api_app.analyzers_manager.file_analyzers.yara_scan import YaraScan
+import yara
+from django.test import override_settings
+
+from api_app.analyzers_manager.file_analyzers.yara_scan import (
+    YaraRepo,
+    YaraRulesCache,
+    YaraScan,
+    YaraStorage,
+    _validate_rule,
+)
 
 from .base_test_class import BaseFileAnalyzerTest
 
@@ -33,3 +47,159 @@ class TestYaraScan(BaseFileAnalyzerTest):
                 ],
             )
         ]
+
+
+class TestYaraRulesCache(TestCase):
+    def setUp(self):
+        self.directory = PosixPath(tempfile.mkdtemp())
+        self.compiled_path = self.directory / "intel_owl_compiled.yas"
+        yara.compile(source='rule first { strings: $a = "first" condition: $a }').save(
+            str(self.compiled_path)
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_loads_once(self):
+        cache = YaraRulesCache(1024 * 1024)
+        with patch(
+            "api_app.analyzers_manager.file_analyzers.yara_scan.yara.load",
+            wraps=yara.load,
+        ) as load:
+            first = cache.get(self.compiled_path)
+            second = cache.get(self.compiled_path)
+        self.assertIs(first, second)
+        load.assert_called_once()
+
+    def test_get_reloads_recompiled_file(self):
+        cache = YaraRulesCache(1024 * 1024)
+        first = cache.get(self.compiled_path)
+        yara.compile(
+            source='rule second { strings: $a = "second" condition: $a }'
+        ).save(str(self.compiled_path))
+        os.utime(self.compiled_path, ns=(0, 0))
+        second = cache.get(self.compiled_path)
+        self.assertIsNot(first, second)
+        self.assertEqual("second", str(second.match(data=b"second")[0]))
+
+    def test_memory_budget(self):
+        other_path = self.directory / "other.yas"
+        yara.compile(source='rule other { strings: $a = "other" condition: $a }').save(
+            str(other_path)
+        )
+        cache = YaraRulesCache(self.compiled_path.stat().st_size)
+        cache.get(self.compiled_path)
+        cache.get(other_path)
+        self.assertEqual([str(other_path)], list(cache._rules))
+
+    def test_invalidate(self):
+        cache = YaraRulesCache(1024 * 1024)
+        cache.get(self.compiled_path)
+        cache.invalidate(self.compiled_path)
+        self.assertEqual(0, len(cache._rules))
+        self.assertEqual(0, cache._size)
+
+
+class TestYaraRepoCompile(TestCase):
+    def setUp(self):
+        self.directory = PosixPath(tempfile.mkdtemp())
+        (self.directory / "first").mkdir()
+        (self.directory / "second").mkdir()
+        self._write("first/a.yar", "a")
+        self._write("first/b.yar", "b")
+        self._write("second/c.yar", "c")
+        (self.directory / "second" / "broken.yar").write_text("rule {")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, path: str, name: str):
+        (self.directory / path).write_text(
+            f'rule {name} {{ strings: $a = "{name}" condition: $a }}'
+        )
+
+    def _compile(self):
+        with override_settings(YARA_COMPILE_WORKERS=1), patch(
+            "api_app.analyzers_manager.file_analyzers.yara_scan._validate_rule",
+            wraps=_validate_rule,
+        ) as validate, patch(
+            "api_app.analyzers_manager.file_analyzers.yara_scan.yara.compile",
+            wraps=yara.compile,
+        ) as compile_:
+            rules = YaraRepo("", directory=self.directory).compile()
+        return rules, validate, compile_
+
+    def test_compile_incremental(self):
+        rules, validate, _ = self._compile()
+        self.assertEqual(3, len(rules))
+        self.assertEqual(4, validate.call_count)
+        self.assertTrue((self.directory / "first" / "intel_owl_compiled.json").exists())
+
+        # nothing changed
+        rules, validate, compile_ = self._compile()
+        self.assertEqual(3, len(rules))
+        validate.assert_not_called()
+        compile_.assert_not_called()
+
+        # only the changed rule is validated, only its directory is compiled
+        self._write("first/b.yar", "b2")
+        rules, validate, compile_ = self._compile()
+        validate.assert_called_once_with(str(self.directory / "first" / "b.yar"))
+        self.assertEqual(2, compile_.call_count)
+        self.assertEqual(
+            ["b2"], [str(match) for rule in rules for match in rule.match(data=b"b2")]
+        )
+
+
+class TestYaraStorage(TestCase):
+    def setUp(self):
+        self.directory = PosixPath(tempfile.mkdtemp())
+        for repo, name in (("first", "a"), ("second", "b")):
+            (self.directory / repo).mkdir()
+            (self.directory / repo / f"{name}.yar").write_text(
+                f'rule {name} {{ strings: $a = "{name}{name}" condition: $a }}'
+            )
+        self.storage = YaraStorage()
+        for repo in ("first", "second"):
+            self.storage.add_repo(
+                f"https://example.com/{repo}.zip", directory=self.directory / repo
+            )
+        self.sample = self.directory / "sample"
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _analyze(self, content: bytes, workers: int = 1):
+        self.sample.write_bytes(content)
+        with override_settings(YARA_SCAN_WORKERS=workers, YARA_COMPILE_WORKERS=1):
+            return self.storage.analyze(str(self.sample), "sample")
+
+    def test_analyze(self):
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                result, errors = self._analyze(b"xxaaxxbb", workers)
+                self.assertEqual([], errors)
+                # the report shape is unchanged
+                self.assertCountEqual(["first", "second"], list(result.keys()))
+                self.assertEqual(["a"], [match["match"] for match in result["first"]])
+                self.assertEqual(["b"], [match["match"] for match in result["second"]])
+
+    def test_analyze_empty_file(self):
+        result, errors = self._analyze(b"")
+        self.assertEqual([], errors)
+        self.assertEqual([], result["first"])
+        self.assertEqual([], result["second"])
+
+    def test_analyze_repo_error(self):
+        with patch.object(
+            YaraRepo,
+            "analyze",
+            autospec=True,
+            side_effect=lambda repo, data, filename: (
+                [] if repo.directory.name == "first" else 1 / 0
+            ),
+        ):
+            result, errors = self._analyze(b"aa")
+        self.assertEqual([], result["first"])
+        self.assertNotIn("second", result)
+        self.assertEqual(1, len(errors))
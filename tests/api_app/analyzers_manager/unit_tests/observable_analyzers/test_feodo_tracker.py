@@ -1,6 +1,7 @@
 from pathlib import Path
 from unittest.mock import patch
 
+from api_app.analyzers_manager.models import AnalyzerConfig
 from api_app.analyzers_manager.observable_analyzers.feodo_tracker import Feodo_Tracker
 from tests.api_app.analyzers_manager.unit_tests.observable_analyzers.base_test_class import (
     BaseAnalyzerTest,
@@ -65,3 +66,14 @@ class FeodoTrackerTestCase(BaseAnalyzerTest):
             import json
 
             json.dump(data, f)
+
+    def test_update_on_run(self):
+        config = AnalyzerConfig.objects.filter(
+            python_module=self.analyzer_class.python_module
+        ).first()
+        analyzer = self._setup_analyzer(config, "ip", self.get_sample_observable("ip"))
+        analyzer.update_on_run = True
+        with patch.object(Feodo_Tracker, "update", return_value=True) as update:
+            response = analyzer.run()
+        update.assert_called_once()
+        self.assertIn("found", response)
@@ -1,5 +1,6 @@
-from unittest.mock import mock_open, patch
+from unittest.mock import patch
 
+from api_app.analyzers_manager.feed_index import FeedIndex
 from api_app.analyzers_manager.observable_analyzers.phishing_army import PhishingArmy
 from tests.api_app.analyzers_manager.unit_tests.observable_analyzers.base_test_class import (
     BaseAnalyzerTest,
@@ -20,7 +21,11 @@ class PhishingArmyTestCase(BaseAnalyzerTest):
                 "requests.get",
                 return_value=MockUpResponse({}, 200, content=mock_db_content.encode()),
             ),
-            patch("builtins.open", mock_open(read_data=mock_db_content)),
+            patch.object(
+                FeedIndex,
+                "load",
+                return_value=FeedIndex.from_lines(mock_db_content.splitlines()),
+            ),
             patch("os.path.isfile", return_value=True),
             patch("os.path.exists", return_value=True),
         ]
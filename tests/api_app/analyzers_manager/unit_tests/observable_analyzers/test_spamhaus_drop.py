@@ -1,6 +1,14 @@
+import ipaddress
+import mmap
+import tempfile
+from unittest import TestCase
 from unittest.mock import patch
 
-from api_app.analyzers_manager.observable_analyzers.spamhaus_drop import SpamhausDropV4
+from api_app.analyzers_manager.observable_analyzers.spamhaus_drop import (
+    SpamhausDropV4,
+    build_index,
+    lookup_index,
+)
 from tests.api_app.analyzers_manager.unit_tests.observable_analyzers.base_test_class import (
     BaseAnalyzerTest,
 )
@@ -22,3 +30,52 @@ class SpamhausDropV4TestCase(BaseAnalyzerTest):
             "requests.get",
             return_value=MockUpResponse(mock_data, 200),
         )
+
+
+class SpamhausDropIndexTestCase(TestCase):
+    @staticmethod
+    def _lookup(entries, data_type, value):
+        with tempfile.TemporaryFile() as f:
+            f.write(build_index(entries, data_type))
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as index:
+                return lookup_index(index, value)
+
+    def test_networks(self):
+        entries = [
+            {"cidr": "1.10.16.0/20", "sblid": "SBL1"},
+            {"cidr": "1.0.0.0/8", "sblid": "SBL2"},
+            {"cidr": "2.56.192.0/19", "sblid": "SBL3"},
+            {"type": "metadata", "timestamp": 1},
+        ]
+        for ip, sblids in (
+            ("1.10.16.5", ["SBL2", "SBL1"]),
+            ("1.200.0.0", ["SBL2"]),
+            ("2.56.192.0", ["SBL3"]),
+            ("2.56.224.0", []),
+            ("0.0.0.1", []),
+        ):
+            with self.subTest(ip=ip):
+                matches = self._lookup(entries, "ipv4", int(ipaddress.ip_address(ip)))
+                self.assertEqual(sblids, [match["sblid"] for match in matches])
+        matches = self._lookup(
+            [{"cidr": "2001:678:738::/48", "sblid": "SBL4"}],
+            "ipv6",
+            int(ipaddress.ip_address("2001:678:738::1")),
+        )
+        self.assertEqual(["SBL4"], [match["sblid"] for match in matches])
+
+    def test_asn(self):
+        entries = [
+            {"asn": 6517, "asname": "first"},
+            {"asn": 10, "asname": "second"},
+            {"asn": 6517, "asname": "third"},
+            {"type": "metadata", "timestamp": 1},
+        ]
+        self.assertEqual(
+            ["first", "third"],
+            [match["asname"] for match in self._lookup(entries, "asn", 6517)],
+        )
+        self.assertEqual([], self._lookup(entries, "asn", 11))
+        self.assertEqual([], self._lookup(entries, "asn", 2**70))
+        self.assertEqual([], self._lookup([], "asn", 10))
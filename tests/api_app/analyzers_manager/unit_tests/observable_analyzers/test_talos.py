@@ -1,5 +1,6 @@
-from unittest.mock import mock_open, patch
+from unittest.mock import patch
 
+from api_app.analyzers_manager.feed_index import FeedIndex
 from api_app.analyzers_manager.observable_analyzers.talos import Talos
 from tests.api_app.analyzers_manager.unit_tests.observable_analyzers.base_test_class import (
     BaseAnalyzerTest,
@@ -15,7 +16,11 @@ class TalosTestCase(BaseAnalyzerTest):
         fake_file_content = "91.192.100.61\n8.8.8.8\n1.1.1.1"
 
         return [
-            patch("builtins.open", mock_open(read_data=fake_file_content)),
+            patch.object(
+                FeedIndex,
+                "load",
+                return_value=FeedIndex.from_lines(fake_file_content.splitlines()),
+            ),
             patch("os.path.isfile", return_value=True),
             patch("os.path.exists", return_value=True),
         ]
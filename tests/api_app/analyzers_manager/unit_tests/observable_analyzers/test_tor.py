@@ -1,5 +1,6 @@
-from unittest.mock import mock_open, patch
+from unittest.mock import patch
 
+from api_app.analyzers_manager.feed_index import FeedIndex
 from api_app.analyzers_manager.observable_analyzers.tor import Tor
 from tests.api_app.analyzers_manager.unit_tests.observable_analyzers.base_test_class import (
     BaseAnalyzerTest,
@@ -13,7 +14,6 @@ class TorTestCase(BaseAnalyzerTest):
     @staticmethod
     def get_mocked_response():
         tor_db_content = "93.95.230.253\n1.2.3.4\n8.8.8.8\n"
-        file_mock = mock_open(read_data=tor_db_content)
 
         return [
             patch(
@@ -27,7 +27,11 @@ LastStatus 2022-08-18 14:00:00
 ExitAddress 93.95.230.253 2022-08-18 14:44:33""",
                 ),
             ),
-            patch("builtins.open", file_mock),
+            patch.object(
+                FeedIndex,
+                "load",
+                return_value=FeedIndex.from_lines(tor_db_content.splitlines()),
+            ),
             patch("os.path.exists", return_value=True),
             patch("os.path.isfile", return_value=True),
         ]
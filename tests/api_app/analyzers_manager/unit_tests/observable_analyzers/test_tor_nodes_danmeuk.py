@@ -1,5 +1,6 @@
-from unittest.mock import mock_open, patch
+from unittest.mock import patch
 
+from api_app.analyzers_manager.feed_index import FeedIndex
 from api_app.analyzers_manager.observable_analyzers.tor_nodes_danmeuk import (
     TorNodesDanMeUK,
 )
@@ -26,5 +27,9 @@ class TorNodesDanMeUKTestCase(BaseAnalyzerTest):
                 "api_app.analyzers_manager.observable_analyzers.tor_nodes_danmeuk.os.path.exists",
                 return_value=True,
             ),
-            patch("builtins.open", mock_open(read_data=mock_db_content)),
+            patch.object(
+                FeedIndex,
+                "load",
+                return_value=FeedIndex.from_lines(mock_db_content.splitlines()),
+            ),
         ]
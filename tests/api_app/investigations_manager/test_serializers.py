@@ -1,3 +1,6 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 from api_app.analyzables_manager.models import Analyzable
 from api_app.choices import Classification
 from api_app.investigations_manager.models import Investigation
@@ -73,3 +76,37 @@ class InvestigationTreeSerializerTestCase(CustomTestCase):
         job.delete()
         inv.delete()
         an1.delete()
+
+    def test_to_representation_queries(self):
+        an1 = Analyzable.objects.create(
+            name="test.com",
+            classification=Classification.DOMAIN,
+        )
+        job = Job.objects.create(
+            analyzable=an1,
+            user=self.user,
+            status="killed",
+        )
+        inv: Investigation = Investigation.objects.create(name="Test", owner=self.user)
+        inv.jobs.add(job)
+        queries_count = []
+        parent = job
+        for _ in range(2):
+            # a chain and a leaf for every level
+            j2 = parent.add_child(analyzable=an1, user=self.user, status="killed")
+            parent.add_child(analyzable=an1, user=self.user, status="killed")
+            parent = Job.objects.get(pk=j2.pk)
+            inv.refresh_from_db()
+            with CaptureQueriesContext(connection) as queries:
+                result = InvestigationTreeSerializer(instance=inv).data
+            queries_count.append(len(queries))
+        # the queries do not depend on the size of the tree
+        self.assertEqual(queries_count[0], queries_count[1])
+        root = result["jobs"][0]
+        self.assertEqual(2, len(root["children"]))
+        self.assertEqual(2, len(root["children"][0]["children"]))
+        self.assertNotIn("children", root["children"][1])
+        self.assertNotIn("children", root["children"][0]["children"][0])
+        self.assertEqual(parent.pk, root["children"][0]["children"][0]["pk"])
+        job.delete()
+        an1.delete()
@@ -306,6 +306,109 @@ class ApiViewTests(CustomViewSetTestCase):
         )
         job.delete()
 
+    def test_analyze_observables_bulk(self):
+        data = self.mixed_observable_data.copy()
+        # duplicated, after the removal of the defanging
+        data["observables"] = data["observables"] + [["ip", "8[.]8[.]8[.]8"]]
+
+        response = self.client.post(
+            "/api/analyze_observables_bulk", data, format="json"
+        )
+        contents = response.json()
+        msg = (response.status_code, contents)
+        self.assertEqual(response.status_code, 200, msg=msg)
+        self.assertEqual(3, contents["count"], msg=msg)
+
+        jobs = [
+            models.Job.objects.get(pk=content["job_id"])
+            for content in contents["results"]
+        ]
+        self.assertEqual(
+            ["8.8.8.8", "example.com", "8.8.2.2"],
+            [job.analyzable.name for job in jobs],
+            msg=msg,
+        )
+        self.assertEqual(Classification.DOMAIN, jobs[1].analyzable.classification)
+        self.assertCountEqual(
+            data["analyzers_requested"],
+            list(jobs[0].analyzers_requested.all().values_list("name", flat=True)),
+            msg=msg,
+        )
+        self.assertCountEqual(
+            data["analyzers_requested"],
+            list(jobs[0].analyzers_to_execute.all().values_list("name", flat=True)),
+            msg=msg,
+        )
+        self.assertCountEqual(
+            [data["analyzers_requested"][0]],
+            list(jobs[1].analyzers_to_execute.all().values_list("name", flat=True)),
+            msg=msg,
+        )
+        self.assertEqual(
+            "Custom investigation: 3 jobs", jobs[0].investigation.name, msg=msg
+        )
+        self.assertEqual(
+            {job.investigation_id for job in jobs},
+            {content["investigation"] for content in contents["results"]},
+            msg=msg,
+        )
+        # roots of their own trees
+        for job in jobs:
+            self.assertTrue(job.is_root())
+            self.assertEqual(job, job.get_root())
+        self.assertEqual(3, len({job.path for job in jobs}))
+
+        # the previous analysis is returned
+        models.Job.objects.filter(pk=jobs[0].pk).update(
+            status=models.Job.STATUSES.REPORTED_WITHOUT_FAILS
+        )
+        response = self.client.post(
+            "/api/analyze_observables_bulk",
+            {**data, "observables": [["ip", "8.8.8.8"]]},
+            format="json",
+        )
+        contents = response.json()
+        msg = (response.status_code, contents)
+        self.assertEqual(response.status_code, 200, msg=msg)
+        self.assertEqual(jobs[0].pk, contents["results"][0]["job_id"], msg=msg)
+        investigation = jobs[0].investigation
+        for job in jobs:
+            job.delete()
+        investigation.delete()
+
+    def test_analyze_observables_bulk__errors(self):
+        data = self.mixed_observable_data.copy()
+        data["observables"] = data["observables"] + [["ip", "192.168.1.1"], ""]
+        response = self.client.post(
+            "/api/analyze_observables_bulk", data, format="json"
+        )
+        contents = response.json()
+        msg = (response.status_code, contents)
+        self.assertEqual(response.status_code, 400, msg=msg)
+        self.assertCountEqual(
+            [
+                {"observable": "192.168.1.1", "detail": "Private address"},
+                {"observable": "", "detail": "Not a valid observable"},
+            ],
+            contents["errors"]["detail"],
+            msg=msg,
+        )
+
+        # the domain can't be analyzed by the analyzer of the ips
+        data = self.mixed_observable_data.copy()
+        data["analyzers_requested"] = data["analyzers_requested"][1:]
+        response = self.client.post(
+            "/api/analyze_observables_bulk", data, format="json"
+        )
+        contents = response.json()
+        msg = (response.status_code, contents)
+        self.assertEqual(response.status_code, 400, msg=msg)
+        self.assertEqual(
+            ["example.com"],
+            [error["observable"] for error in contents["errors"]["detail"]],
+            msg=msg,
+        )
+
     def test_observable_no_analyzers_only_connector(self):
         models.PluginConfig.objects.create(
             value="test subject",
@@ -430,6 +533,65 @@ class ApiViewTests(CustomViewSetTestCase):
         )
         self.assertEqual(response.status_code, 200)
 
+    def test_ask_multi_analysis_availability__last_jobs(self):
+        an1 = Analyzable.objects.create(
+            name="test.com", classification=Classification.DOMAIN
+        )
+        an2 = Analyzable.objects.create(
+            name="test2.com", classification=Classification.DOMAIN
+        )
+        a1, a2 = AnalyzerConfig.objects.filter(
+            name__in=["Classic_DNS", "CIRCLPassiveDNS"]
+        )
+        jobs = []
+        for analyzable, analyzers, status in [
+            (an1, [a1, a2], models.Job.STATUSES.REPORTED_WITHOUT_FAILS),
+            (an1, [a1, a2], models.Job.STATUSES.REPORTED_WITHOUT_FAILS),
+            (an1, [a1, a2], models.Job.STATUSES.FAILED),
+            (an2, [a1], models.Job.STATUSES.RUNNING),
+        ]:
+            job = models.Job.objects.create(
+                analyzable=analyzable, user=self.user, status=status
+            )
+            job.analyzers_requested.set(analyzers)
+            jobs.append(job)
+        models.Job.objects.filter(pk=jobs[0].pk).update(
+            received_request_time=jobs[0].received_request_time
+            - datetime.timedelta(hours=1)
+        )
+
+        data = [
+            {"md5": an1.md5, "analyzers": [a1.name, a2.name]},
+            {"md5": an2.md5, "analyzers": [a1.name]},
+            {"md5": an1.md5, "analyzers": [a2.name]},
+        ]
+        response = self.client.post(
+            "/api/ask_multi_analysis_availability", data, format="json"
+        )
+        contents = response.json()
+        msg = (response.status_code, contents)
+        self.assertEqual(response.status_code, 200, msg=msg)
+        self.assertEqual(3, contents["count"], msg=msg)
+        self.assertEqual(
+            [jobs[1].pk, jobs[3].pk, jobs[1].pk],
+            [result["job_id"] for result in contents["results"]],
+            msg=msg,
+        )
+
+        # the job of the second analyzable did not run every analyzer
+        data[1]["analyzers"] = [a1.name, a2.name]
+        response = self.client.post(
+            "/api/ask_multi_analysis_availability", data, format="json"
+        )
+        contents = response.json()
+        msg = (response.status_code, contents)
+        self.assertEqual(response.status_code, 200, msg=msg)
+        self.assertEqual(0, contents["count"], msg=msg)
+        for job in jobs:
+            job.delete()
+        an1.delete()
+        an2.delete()
+
     def test_analyze_multiple_files__exe(self):
         data = self.analyze_multiple_files_data.copy()
         response = self.client.post(
@@ -3,6 +3,8 @@
 
 from unittest.mock import patch
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from kombu import uuid
 
 from api_app.analyzables_manager.models import Analyzable
@@ -60,6 +62,27 @@ class PluginTestCase(CustomTestCase):
             else:
                 self.assertEqual(plugin.report.status, plugin.report.STATUSES.SUCCESS)
 
+    def test_start_single_report_update(self):
+        with patch.multiple(Connector, __abstractmethods__=set()), patch.object(
+            Connector, "run"
+        ) as run:
+            run.return_value = {"key": "value"}
+            plugin = Connector(self.cc)
+            with CaptureQueriesContext(connection) as queries:
+                plugin.start(self.job.pk, {}, uuid())
+            table = plugin.report_model._meta.db_table
+            updates = [
+                query
+                for query in queries.captured_queries
+                if query["sql"].startswith(f'UPDATE "{table}"')
+            ]
+            # status, report and end time are saved together
+            self.assertEqual(1, len(updates), updates)
+            plugin.report.refresh_from_db()
+            self.assertEqual(plugin.report.status, plugin.report.STATUSES.SUCCESS)
+            self.assertEqual({"key": "value"}, plugin.report.report)
+            self.assertIsNotNone(plugin.report.end_time)
+
     def test_start_errors(self):
         def raise_error(self):
             raise TypeError("Test")
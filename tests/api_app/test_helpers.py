@@ -1,9 +1,19 @@
 # This file is a part of IntelOwl https://github.com/intelowlproject/IntelOwl
 # See the file 'LICENSE' for copying permission.
+import ipaddress
+import logging
+import os
+import random
+import re
+import time
+from unittest import skipUnless
 
 from django.test import TestCase
 
 from api_app.choices import Classification
+from api_app.helpers import get_hash_type
+
+logger = logging.getLogger(__name__)
 
 
 class HelperTests(TestCase):
@@ -40,3 +50,118 @@ class HelperTests(TestCase):
         observable = "iammeia"
         result = Classification.calculate_observable(observable)
         self.assertEqual(result, Classification.GENERIC)
+
+    def test_calculate_observables(self):
+        observables = [
+            "7.7.7.7",
+            "2001:db8::1",
+            "www[.]test[.]com",
+            "ftp://www.test.com",
+            "b318ff1839771c22e50d316af613dc70",
+            "iammeia",
+            "7.7.7.7",
+        ]
+        self.assertEqual(
+            [
+                Classification.IP,
+                Classification.IP,
+                Classification.DOMAIN,
+                Classification.URL,
+                Classification.HASH,
+                Classification.GENERIC,
+                Classification.IP,
+            ],
+            Classification.calculate_observables(observables),
+        )
+        self.assertEqual(
+            [Classification.calculate_observable(o) for o in observables],
+            Classification.calculate_observables(observables),
+        )
+        self.assertEqual([], Classification.calculate_observables([]))
+
+    def test_get_hash_type(self):
+        self.assertEqual("md5", get_hash_type("b318ff1839771c22e50d316af613dc70"))
+        self.assertEqual("sha-1", get_hash_type("A" * 40))
+        self.assertEqual("sha-256", get_hash_type("a" * 64))
+        self.assertEqual("sha-512", get_hash_type("0" * 128))
+        self.assertIsNone(get_hash_type("g" * 32))
+        self.assertIsNone(get_hash_type("a" * 33))
+        self.assertIsNone(get_hash_type(""))
+
+    @staticmethod
+    def _reference_classification(value: str) -> str:
+        # every pattern, in order, without any dispatch
+        try:
+            ipaddress.ip_address(value)
+            return Classification.IP
+        except ValueError:
+            pass
+        if re.match(
+            r"^.+://[a-z\d-]{1,200}"
+            r"(?:\.[a-zA-Z\d\u2044\u2215!#$&(-;=?-\[\]_~]{1,200})+"
+            r"(?::\d{2,6})?"
+            r"(?:/[a-zA-Z\d\u2044\u2215!#$&(-;=?-\[\]_~]{1,200})*"
+            r"(?:\.\w+)?",
+            value,
+        ):
+            return Classification.URL
+        if re.match(
+            r"^([\[\\]?\.[\]\\]?)?[a-z\d\-_]{1,63}"
+            r"(([\[\\]?\.[\]\\]?)[a-z\d\-_]{1,63})+$",
+            value,
+            re.IGNORECASE,
+        ):
+            return Classification.DOMAIN
+        if re.match(r"^([a-f\d]{32}|[a-f\d]{40}|[a-f\d]{64})$", value, re.I):
+            return Classification.HASH
+        return Classification.GENERIC
+
+    @staticmethod
+    def _get_observables(number: int):
+        rnd = random.Random(0)
+        alphabet = "abcdef0123456789.:/[]\\-_xyz"
+        observables = []
+        for _ in range(number // 5):
+            length = rnd.choice([3, 12, 32, 40, 64])
+            observables += [
+                "".join(rnd.choice(alphabet) for _ in range(length)),
+                "".join(rnd.choice("0123456789abcdef") for _ in range(length)),
+                ".".join(str(rnd.randint(0, 300)) for _ in range(4)),
+                f"www.{rnd.randint(0, 10000)}.test.com",
+                f"https://test.com/{rnd.randint(0, 10000)}?q=1",
+            ]
+        return observables
+
+    def _test_classification(self, number: int):
+        observables = self._get_observables(number)
+        expected = [self._reference_classification(o) for o in observables]
+        self.assertEqual(
+            expected, [Classification.calculate_observable(o) for o in observables]
+        )
+        self.assertEqual(expected, Classification.calculate_observables(observables))
+
+    def test_calculate_observables_reference(self):
+        self._test_classification(1000)
+
+    @skipUnless(
+        os.environ.get("CLASSIFICATION_BENCHMARK_OBSERVABLES"),
+        "set CLASSIFICATION_BENCHMARK_OBSERVABLES to classify many observables",
+    )
+    def test_benchmark_calculate_observables(self):
+        # set CLASSIFICATION_BENCHMARK_OBSERVABLES=1000000 for 1M observables
+        number = int(os.environ["CLASSIFICATION_BENCHMARK_OBSERVABLES"])
+        self._test_classification(number)
+        observables = self._get_observables(number)
+        start = time.perf_counter()
+        for observable in observables:
+            self._reference_classification(observable)
+        reference_time = time.perf_counter() - start
+        start = time.perf_counter()
+        Classification.calculate_observables(observables)
+        batch_time = time.perf_counter() - start
+        logger.info(
+            f"classification of {len(observables)} observables: "
+            f"reference {reference_time:.2f}s, batch {batch_time:.2f}s"
+        )
+        # the precompiled patterns were measured about twice as fast
+        self.assertLess(batch_time * 1.25, reference_time)
@@ -6,7 +6,8 @@ from json import loads
 from celery._state import get_current_app
 from celery.canvas import Signature
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError, transaction
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
 from django_celery_beat.models import PeriodicTask
 from kombu import uuid
 
@@ -25,7 +26,7 @@ from api_app.models import (
 )
 from api_app.pivots_manager.models import PivotConfig
 from api_app.playbooks_manager.models import PlaybookConfig
-from api_app.visualizers_manager.models import VisualizerConfig
+from api_app.visualizers_manager.models import VisualizerConfig, VisualizerReport
 from certego_saas.apps.organization.membership import Membership
 from certego_saas.apps.organization.organization import Organization
 from tests import CustomTestCase
@@ -547,3 +548,293 @@ class JobTestCase(CustomTestCase):
         self.assertCountEqual(
             j1.pivots_to_execute.filter(name="test").values_list("pk", flat=True), []
         )
+
+    def test_get_config_reports_stats(self):
+        an = Analyzable.objects.create(
+            name="test.com",
+            classification=Classification.DOMAIN,
+        )
+        job = Job.objects.create(
+            user=self.user,
+            analyzable=an,
+            status=Job.STATUSES.VISUALIZERS_RUNNING.value,
+        )
+        for config, status in [
+            (AnalyzerConfig.objects.first(), AnalyzerReport.STATUSES.SUCCESS),
+            (AnalyzerConfig.objects.last(), AnalyzerReport.STATUSES.FAILED),
+        ]:
+            AnalyzerReport.objects.create(
+                job=job,
+                config=config,
+                status=status.value,
+                task_id=str(uuid()),
+                parameters={},
+            )
+        VisualizerReport.objects.create(
+            job=job,
+            config=VisualizerConfig.objects.first(),
+            status=VisualizerReport.STATUSES.SUCCESS.value,
+            task_id=str(uuid()),
+            parameters={},
+        )
+        with CaptureQueriesContext(connection) as queries:
+            stats = job._get_config_reports_stats()
+        self.assertEqual(1, len(queries))
+        self.assertEqual(3, stats["all"])
+        self.assertEqual(2, stats["success"])
+        self.assertEqual(1, stats["failed"])
+        self.assertEqual(0, stats["killed"])
+        job.set_final_status()
+        self.assertEqual(Job.STATUSES.REPORTED_WITH_FAILS.value, job.status)
+        job.delete()
+        an.delete()
+
+    def test_set_final_status_investigation(self):
+        from api_app.investigations_manager.models import Investigation
+
+        an = Analyzable.objects.create(
+            name="test.com",
+            classification=Classification.DOMAIN,
+        )
+        investigation = Investigation.objects.create(name="test", owner=self.user)
+        jobs = [
+            Job.objects.create(
+                user=self.user,
+                analyzable=an,
+                status=Job.STATUSES.RUNNING.value,
+                investigation=investigation,
+            )
+            for _ in range(5)
+        ]
+        jobs.append(
+            jobs[0].add_child(
+                user=self.user,
+                analyzable=an,
+                status=Job.STATUSES.RUNNING.value,
+            )
+        )
+        investigation.set_correct_status()
+        self.assertEqual(6, investigation.running_jobs)
+        self.assertEqual(investigation.STATUSES.RUNNING.value, investigation.status)
+
+        queries_count = []
+        for job in jobs:
+            with CaptureQueriesContext(connection) as queries:
+                job.set_final_status()
+            queries_count.append(len(queries))
+        # the queries do not depend on the size of the investigation,
+        # the jobs are counted again only by the last one
+        self.assertEqual(1, len(set(queries_count[:-1])), queries_count)
+        investigation.refresh_from_db()
+        self.assertEqual(0, investigation.running_jobs)
+        self.assertEqual(investigation.STATUSES.CONCLUDED.value, investigation.status)
+        self.assertIsNotNone(investigation.end_time)
+
+        # already concluded
+        jobs[0].set_final_status()
+        investigation.refresh_from_db()
+        self.assertEqual(0, investigation.running_jobs)
+        for job in jobs[:5]:
+            job.delete()
+        an.delete()
+        self.assertFalse(Investigation.objects.filter(pk=investigation.pk).exists())
+
+    def test_get_analysis_fingerprint(self):
+        a1, a2 = AnalyzerConfig.objects.order_by("pk")[:2]
+        c1 = ConnectorConfig.objects.order_by("pk").first()
+        v1 = VisualizerConfig.objects.order_by("pk").first()
+        playbook = PlaybookConfig.objects.order_by("pk").first()
+        fingerprint = Job.get_analysis_fingerprint([a1, a2], [c1], [v1], playbook)
+        self.assertEqual(64, len(fingerprint))
+        # the order of the plugins does not matter
+        self.assertEqual(
+            fingerprint, Job.get_analysis_fingerprint([a2, a1], [c1], [v1], playbook)
+        )
+        for other in [
+            Job.get_analysis_fingerprint([a1], [c1], [v1], playbook),
+            Job.get_analysis_fingerprint([a1, a2], [], [v1], playbook),
+            Job.get_analysis_fingerprint([a1, a2], [c1], [], playbook),
+            Job.get_analysis_fingerprint([a1, a2], [c1], [v1]),
+        ]:
+            self.assertNotEqual(fingerprint, other)
+
+
+class PythonConfigTestCase(CustomTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.muc = VisualizerConfig.objects.create(
+            name="test",
+            description="test",
+            python_module=PythonModule.objects.get(
+                base_path=PythonModuleBasePaths.Visualizer.value, module="yara.Yara"
+            ),
+            disabled=False,
+        )
+        self.param = Parameter.objects.create(
+            python_module=self.muc.python_module,
+            name="test",
+            type="str",
+            is_secret=False,
+            required=False,
+        )
+        self.pc = PluginConfig.objects.create(
+            owner=self.user,
+            for_organization=False,
+            value="test",
+            parameter=self.param,
+            visualizer_config=self.muc,
+        )
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.pc.delete()
+        self.param.delete()
+        self.muc.delete()
+
+    def test_get_configured_params_cached(self):
+        with CaptureQueriesContext(connection) as cold:
+            params = self.muc.get_configured_params(self.user, {})
+        with CaptureQueriesContext(connection) as warm:
+            cached_params = self.muc.get_configured_params(self.user, {})
+        self.assertLess(len(warm.captured_queries), len(cold.captured_queries))
+        self.assertEqual(
+            {param.name: param.value for param in params},
+            {param.name: param.value for param in cached_params},
+        )
+        self.assertEqual(
+            "test", {param.name: param.value for param in cached_params}["test"]
+        )
+
+    def test_get_configured_params_runtime_configuration(self):
+        self.muc.get_configured_params(self.user, {})
+        params = self.muc.get_configured_params(self.user, {"test": "runtime"})
+        self.assertEqual(
+            "runtime", {param.name: param.value for param in params}["test"]
+        )
+
+    def test_get_configured_params_invalidation(self):
+        self.muc.get_configured_params(self.user, {})
+        self.pc.value = "new_value"
+        self.pc.save()
+        params = self.muc.get_configured_params(self.user, {})
+        self.assertEqual(
+            "new_value", {param.name: param.value for param in params}["test"]
+        )
+
+    def test_resolve_configured_params(self):
+        runtime_configurations = {self.muc.pk: {"test": "runtime"}}
+        single = {
+            param.name: (param.value, param.is_from_org)
+            for param in self.muc.read_configured_params(
+                self.user, runtime_configurations[self.muc.pk]
+            )
+        }
+        with CaptureQueriesContext(connection) as bulk_queries:
+            resolved = VisualizerConfig.objects.filter(
+                pk=self.muc.pk
+            ).resolve_configured_params(self.user, runtime_configurations)
+        self.assertLessEqual(len(bulk_queries.captured_queries), 3)
+        self.assertEqual(
+            single,
+            {
+                param.name: (param.value, param.is_from_org)
+                for param in resolved[self.muc.pk]
+            },
+        )
+
+    def test_get_signatures_store_job_configured_params(self):
+        an = Analyzable.objects.create(name="8.8.8.8", classification=Classification.IP)
+        job = Job.objects.create(user=self.user, analyzable=an)
+        job.visualizers_to_execute.set([self.muc])
+        list(
+            VisualizerConfig.objects.filter(pk=self.muc.pk)
+            .annotate_runnable(self.user)
+            .get_signatures(job)
+        )
+        params = self.muc.get_job_configured_params(job.pk)
+        self.assertIsNotNone(params)
+        self.assertEqual("test", {param.name: param.value for param in params}["test"])
+        self.assertEqual("test", self.muc.reports.get(job=job).parameters["test"])
+        job.delete()
+        an.delete()
+
+    def test_get_signatures_job_configured_params_without_secrets(self):
+        secret = Parameter.objects.create(
+            python_module=self.muc.python_module,
+            name="api_key",
+            type="str",
+            is_secret=True,
+            required=False,
+        )
+        pc = PluginConfig.objects.create(
+            owner=self.user,
+            for_organization=False,
+            value="secret_value",
+            parameter=secret,
+            visualizer_config=self.muc,
+        )
+        an = Analyzable.objects.create(name="8.8.8.8", classification=Classification.IP)
+        job = Job.objects.create(user=self.user, analyzable=an)
+        job.visualizers_to_execute.set([self.muc])
+        list(
+            VisualizerConfig.objects.filter(pk=self.muc.pk)
+            .annotate_runnable(self.user)
+            .get_signatures(job)
+        )
+        params = {
+            param.name: param.value
+            for param in self.muc.get_job_configured_params(job.pk)
+        }
+        self.assertEqual("test", params["test"])
+        # the secret is resolved by the worker
+        self.assertIsNone(params["api_key"])
+        self.assertNotIn("api_key", self.muc.reports.get(job=job).parameters)
+        job.delete()
+        an.delete()
+        pc.delete()
+        secret.delete()
+
+    def test_generate_empty_reports(self):
+        an = Analyzable.objects.create(name="8.8.8.8", classification=Classification.IP)
+        job = Job.objects.create(user=self.user, analyzable=an)
+        report = self.muc.generate_empty_report(
+            job, uuid(), VisualizerReport.STATUSES.FAILED.value
+        )
+        task_id = uuid()
+        VisualizerConfig.objects.filter(pk=self.muc.pk).generate_empty_reports(
+            job,
+            {self.muc.pk: task_id},
+            VisualizerReport.STATUSES.PENDING.value,
+            {self.muc.pk: {"test": "test"}},
+        )
+        self.assertEqual(1, self.muc.reports.filter(job=job).count())
+        report.refresh_from_db()
+        self.assertEqual(VisualizerReport.STATUSES.PENDING.value, report.status)
+        self.assertEqual(task_id, str(report.task_id))
+
+        configs = AnalyzerConfig.objects.order_by("pk")[:3]
+        existing_report = AnalyzerReport.objects.create(
+            job=job,
+            config=configs[0],
+            status=AnalyzerReport.STATUSES.FAILED.value,
+            task_id=uuid(),
+            parameters={},
+        )
+        with CaptureQueriesContext(connection) as queries:
+            AnalyzerConfig.objects.filter(
+                pk__in=[config.pk for config in configs]
+            ).generate_empty_reports(
+                job,
+                {config.pk: uuid() for config in configs},
+                AnalyzerReport.STATUSES.PENDING.value,
+                {config.pk: {} for config in configs},
+            )
+        self.assertEqual(2, len(queries.captured_queries))
+        self.assertEqual(3, job.analyzerreports.count())
+        existing_report.refresh_from_db()
+        self.assertEqual(AnalyzerReport.STATUSES.PENDING.value, existing_report.status)
+        self.assertEqual(
+            3, job.analyzerreports.filter_retryable().get_configurations().count()
+        )
+        job.delete()
+        an.delete()
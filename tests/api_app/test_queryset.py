@@ -1,19 +1,30 @@
 import datetime
+import logging
+import os
+import time
+from unittest import skipUnless
+from unittest.mock import patch
 
+from django.db import connection
 from django.db.models import F
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now
 from django_celery_beat.models import CrontabSchedule
 
 from api_app.analyzables_manager.models import Analyzable
-from api_app.analyzers_manager.models import AnalyzerConfig
+from api_app.analyzers_manager.models import AnalyzerConfig, AnalyzerReport
 from api_app.choices import Classification, PythonModuleBasePaths
 from api_app.ingestors_manager.models import IngestorConfig
 from api_app.models import Job, Parameter, PluginConfig, PythonModule
 from api_app.playbooks_manager.models import PlaybookConfig
+from api_app.queryset import SendToBiQuerySet
 from certego_saas.apps.organization.membership import Membership
 from certego_saas.apps.organization.organization import Organization
 from tests import CustomTestCase
 
+logger = logging.getLogger(__name__)
+
 
 class PythonConfiguQuerySetTestCase(CustomTestCase):
     def test_annotate_configured_multiple_parameter(self):
@@ -757,3 +768,177 @@ class JobQuerySetTestCase(CustomTestCase):
         schedule.delete()
         j.delete()
         an.delete()
+
+    def test_bulk_delete(self):
+        an = Analyzable.objects.create(
+            name="test.com",
+            classification=Classification.DOMAIN,
+        )
+        an2 = Analyzable.objects.create(
+            name="8.8.8.8",
+            classification=Classification.IP,
+        )
+        status = Job.STATUSES.REPORTED_WITHOUT_FAILS.value
+        root = Job.objects.create(user=self.user, analyzable=an, status=status)
+        child = root.add_child(user=self.user, analyzable=an2, status=status)
+        grandchild = child.add_child(user=self.user, analyzable=an2, status=status)
+        other_root = Job.objects.create(user=self.user, analyzable=an2, status=status)
+        other_child = other_root.add_child(
+            user=self.user, analyzable=an2, status=status
+        )
+        config = AnalyzerConfig.objects.first()
+        child.analyzers_to_execute.set([config])
+        AnalyzerReport.objects.create(
+            job=grandchild,
+            config=config,
+            status=AnalyzerReport.STATUSES.SUCCESS.value,
+            task_id="task",
+            parameters={},
+        )
+
+        # the grandchild is deleted with its parent
+        deleted, files = Job.objects.filter(
+            pk__in=[child.pk, other_child.pk]
+        ).bulk_delete()
+        self.assertEqual(3, deleted)
+        self.assertEqual([], files)
+        self.assertCountEqual(
+            [root.pk, other_root.pk], Job.objects.values_list("pk", flat=True)
+        )
+        self.assertFalse(AnalyzerReport.objects.filter(job=grandchild.pk).exists())
+        self.assertFalse(
+            Job.analyzers_to_execute.through.objects.filter(job=child.pk).exists()
+        )
+        root.refresh_from_db()
+        other_root.refresh_from_db()
+        self.assertEqual(0, root.numchild)
+        self.assertEqual(0, other_root.numchild)
+        self.assertEqual((0, []), Job.objects.none().bulk_delete())
+
+
+def _fake_streaming_bulk(client, actions, chunk_size, **kwargs):
+    # elastic answers in the order of the actions, one chunk at a time
+    actions = iter(actions)
+    while chunk := [action for _, action in zip(range(chunk_size), actions)]:
+        for action in chunk:
+            yield action["_source"]["status"] != "FAILED", action
+
+
+@override_settings(ELASTICSEARCH_BI_CLIENT=None, ELASTICSEARCH_BI_INDEX="bi")
+@patch.object(SendToBiQuerySet, "_create_index_template")
+@patch("elasticsearch.helpers.streaming_bulk", side_effect=_fake_streaming_bulk)
+class SendToBiQuerySetTestCase(CustomTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.an = Analyzable.objects.create(
+            name="test.com",
+            classification=Classification.DOMAIN,
+        )
+        self.job = Job.objects.create(
+            user=self.user, analyzable=self.an, status=Job.STATUSES.RUNNING.value
+        )
+        self.config = AnalyzerConfig.objects.first()
+
+    def _create_reports(self, number: int, failed_every: int = 0):
+        start_time = now()
+        AnalyzerReport.objects.bulk_create(
+            [
+                AnalyzerReport(
+                    job=self.job,
+                    config=self.config,
+                    # some reports share the start time
+                    start_time=start_time - datetime.timedelta(seconds=i // 3),
+                    status=(
+                        AnalyzerReport.STATUSES.FAILED.value
+                        if failed_every and not i % failed_every
+                        else AnalyzerReport.STATUSES.SUCCESS.value
+                    ),
+                    task_id=f"task-{i}",
+                    parameters={},
+                )
+                for i in range(number)
+            ],
+            batch_size=10000,
+        )
+
+    def test_send_to_elastic_as_bi(self, streaming_bulk, *args):
+        self._create_reports(50, failed_every=7)
+        newest = list(
+            AnalyzerReport.objects.order_by("-start_time", "-pk").values_list(
+                "pk", flat=True
+            )[:30]
+        )
+        with CaptureQueriesContext(connection) as queries:
+            errors = AnalyzerReport.objects.filter(
+                sent_to_bi=False
+            ).send_to_elastic_as_bi(max_objects=30, page_size=8)
+        self.assertTrue(errors)
+        streaming_bulk.assert_called_once()
+        sent = set(
+            AnalyzerReport.objects.filter(sent_to_bi=True).values_list("pk", flat=True)
+        )
+        failed = set(
+            AnalyzerReport.objects.filter(
+                status=AnalyzerReport.STATUSES.FAILED.value
+            ).values_list("pk", flat=True)
+        )
+        # the newest reports are sent, failed documents are not marked
+        self.assertEqual(set(newest) - failed, sent)
+        # 4 pages, one select and one update for each page
+        self.assertEqual(8, len(queries))
+
+        # pages are not shifted by the reports marked as sent
+        AnalyzerReport.objects.filter(sent_to_bi=False).send_to_elastic_as_bi(
+            page_size=8
+        )
+        self.assertEqual(
+            failed,
+            set(
+                AnalyzerReport.objects.filter(sent_to_bi=False).values_list(
+                    "pk", flat=True
+                )
+            ),
+        )
+
+    @skipUnless(
+        os.environ.get("BI_BENCHMARK_REPORTS"),
+        "set BI_BENCHMARK_REPORTS to export a large backlog",
+    )
+    def test_benchmark_send_to_elastic_as_bi(self, *args):
+        # set BI_BENCHMARK_REPORTS=1000000 for a backlog of 1M reports
+        reports = int(os.environ["BI_BENCHMARK_REPORTS"])
+        page_size = 1000
+        self._create_reports(reports)
+        queryset = (
+            AnalyzerReport.objects.filter(sent_to_bi=False)
+            .filter_completed()
+            .defer("report")
+        )
+
+        # the last page found with OFFSET and with keyset pagination
+        ordered = queryset.order_by("-start_time", "-pk")
+        first = (reports - 1) // page_size * page_size
+        start = time.perf_counter()
+        offset_page = list(ordered[first:reports])
+        offset_time = time.perf_counter() - start
+        pages = queryset._iterate_bi_pages(reports, page_size)
+        while True:
+            start = time.perf_counter()
+            keyset_page = next(pages, None)
+            if keyset_page is None:
+                break
+            keyset_time = time.perf_counter() - start
+            last_page = keyset_page
+        self.assertEqual(offset_page, last_page)
+
+        start = time.perf_counter()
+        errors = queryset.send_to_elastic_as_bi(
+            max_objects=reports, page_size=page_size
+        )
+        export_time = time.perf_counter() - start
+        self.assertFalse(errors)
+        logger.info(
+            f"last page of {reports} reports: offset {offset_time:.4f}s, "
+            f"keyset {keyset_time:.4f}s; export {export_time:.2f}s"
+        )
+        self.assertFalse(AnalyzerReport.objects.filter(sent_to_bi=False).exists())
@@ -1,19 +1,26 @@
 # This file is a part of IntelOwl https://github.com/intelowlproject/IntelOwl
 # See the file 'LICENSE' for copying permission.
 import datetime
+import logging
+import os
+import time
+from unittest import skipUnless
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.utils.timezone import now
 from rest_framework.exceptions import ValidationError
 
 from api_app.analyzables_manager.models import Analyzable
 from api_app.analyzers_manager.models import AnalyzerConfig
 from api_app.analyzers_manager.serializers import AnalyzerConfigSerializer
-from api_app.choices import Classification, PythonModuleBasePaths
+from api_app.choices import Classification, PythonModuleBasePaths, ScanMode
 from api_app.connectors_manager.models import ConnectorConfig
+from api_app.helpers import calculate_md5
 from api_app.models import Job, Parameter, PluginConfig, PythonModule
 from api_app.playbooks_manager.models import PlaybookConfig
 from api_app.serializers.job import (
+    BulkObservableAnalysisSerializer,
     CommentSerializer,
     FileJobSerializer,
     JobRecentScanSerializer,
@@ -33,6 +40,7 @@ from tests import CustomTestCase
 from tests.mock_utils import MockUpRequest
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 class JobRecentScanSerializerTestCase(CustomTestCase):
@@ -231,6 +239,7 @@ class AbstractJobCreateSerializerTestCase(CustomTestCase):
             user=self.user,
             status=Job.STATUSES.REPORTED_WITHOUT_FAILS,
             received_request_time=now() - datetime.timedelta(hours=3),
+            analysis_fingerprint=Job.get_analysis_fingerprint([a1, a2], [], []),
         )
         j1.analyzers_requested.add(a1)
         j1.analyzers_requested.add(a2)
@@ -244,36 +253,26 @@ class AbstractJobCreateSerializerTestCase(CustomTestCase):
                 validated_data={
                     "scan_check_time": datetime.timedelta(days=1),
                     "analyzable": an,
-                    "analyzers_to_execute": [],
-                }
-            ),
-        )
-        self.assertEqual(
-            j1,
-            self.ajcs.check_previous_jobs(
-                validated_data={
-                    "scan_check_time": datetime.timedelta(days=1),
-                    "analyzable": an,
-                    "analyzers_to_execute": [a1],
-                }
-            ),
-        )
-        self.assertEqual(
-            j1,
-            self.ajcs.check_previous_jobs(
-                validated_data={
-                    "scan_check_time": datetime.timedelta(days=1),
-                    "analyzable": an,
-                    "analyzers_to_execute": [a1, a2],
+                    "analyzers_to_execute": [a2, a1],
                 }
             ),
         )
+        # only jobs that executed the same plugins are reused
+        for analyzers in [[], [a1], [a1, a2, a3]]:
+            with self.assertRaises(Job.DoesNotExist):
+                self.ajcs.check_previous_jobs(
+                    validated_data={
+                        "scan_check_time": datetime.timedelta(days=1),
+                        "analyzable": an,
+                        "analyzers_to_execute": analyzers,
+                    }
+                )
         with self.assertRaises(Job.DoesNotExist):
             self.ajcs.check_previous_jobs(
                 validated_data={
-                    "scan_check_time": datetime.timedelta(days=1),
+                    "scan_check_time": datetime.timedelta(hours=1),
                     "analyzable": an,
-                    "analyzers_to_execute": [a1, a2, a3],
+                    "analyzers_to_execute": [a1, a2],
                 }
             )
         j1.delete()
@@ -580,6 +579,113 @@ class ObservableJobCreateSerializerTestCase(CustomTestCase):
         self.assertCountEqual(analyzers, [a])
 
 
+class BulkObservableAnalysisSerializerTestCase(CustomTestCase):
+    def _get_serializer(self, observables, **data):
+        return BulkObservableAnalysisSerializer(
+            data={
+                "observables": observables,
+                "analyzers_requested": ["Classic_DNS"],
+                "tags_labels": ["feed"],
+                **data,
+            },
+            context={"request": MockUpRequest(self.user)},
+        )
+
+    def test_validate(self):
+        serializer = self._get_serializer(
+            ["test.com", ["domain", "TEST.com"], "1.2.3.4", "test[.]com", "abc.com"]
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(
+            ["test.com", "1.2.3.4", "abc.com"],
+            serializer.validated_data["observables"],
+        )
+        groups = {
+            group["observable_classification"]: group
+            for group in serializer.validated_data["groups"]
+        }
+        self.assertCountEqual([Classification.DOMAIN, Classification.IP], groups)
+        self.assertEqual(["test.com", "abc.com"], groups["domain"]["observables"])
+        self.assertEqual(["1.2.3.4"], groups["ip"]["observables"])
+        for group in groups.values():
+            self.assertEqual(["feed"], [tag.label for tag in group["tags"]])
+            self.assertEqual(
+                ["Classic_DNS"],
+                [analyzer.name for analyzer in group["analyzers_to_execute"]],
+            )
+
+        serializer = self._get_serializer(["test.com", "127.0.0.1"])
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(
+            [{"observable": "127.0.0.1", "detail": "Loopback address"}],
+            serializer.errors["detail"],
+        )
+
+        serializer = self._get_serializer(["test.com"] * 3)
+        serializer.max_element_per_request_number = 2
+        self.assertFalse(serializer.is_valid())
+
+    def test_save(self):
+        an = Analyzable.objects.create(
+            name="test.com",
+            classification=Classification.DOMAIN,
+        )
+        serializer = self._get_serializer(
+            ["test.com", "1.2.3.4", "abc.com"],
+            scan_mode=ScanMode.FORCE_NEW_ANALYSIS.value,
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        jobs = serializer.save()
+        self.assertEqual(3, len(jobs))
+        self.assertEqual(an, jobs[0].analyzable)
+        for job, name in zip(jobs, ["test.com", "1.2.3.4", "abc.com"]):
+            job.refresh_from_db()
+            self.assertEqual(name, job.analyzable.name)
+            self.assertEqual(self.user, job.user)
+            self.assertEqual(Job.STATUSES.PENDING, job.status)
+            self.assertEqual(
+                ["Classic_DNS"],
+                list(job.analyzers_to_execute.values_list("name", flat=True)),
+            )
+            self.assertEqual(["feed"], list(job.tags.values_list("label", flat=True)))
+            self.assertEqual(1, job.depth)
+        self.assertEqual(
+            calculate_md5(b"abc.com"),
+            Analyzable.objects.get(name="abc.com").md5,
+        )
+        investigation = jobs[0].investigation
+        self.assertEqual("Custom investigation: 3 jobs", investigation.name)
+        self.assertEqual(investigation.STATUSES.RUNNING, investigation.status)
+        for job in jobs:
+            job.delete()
+        investigation.delete()
+
+    @skipUnless(
+        os.environ.get("BULK_BENCHMARK_OBSERVABLES"),
+        "set BULK_BENCHMARK_OBSERVABLES to analyze a large number of observables",
+    )
+    def test_benchmark_save(self):
+        # set BULK_BENCHMARK_OBSERVABLES=50000 to import a feed of 50k observables
+        observables = int(os.environ["BULK_BENCHMARK_OBSERVABLES"])
+        serializer = self._get_serializer(
+            [f"bulk{i}.test.com" for i in range(observables)]
+        )
+        start = time.perf_counter()
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        validation = time.perf_counter() - start
+        start = time.perf_counter()
+        jobs = serializer.save()
+        save = time.perf_counter() - start
+        logger.info(
+            f"analysis of {observables} observables: "
+            f"validation {validation:.2f}s, save {save:.2f}s"
+        )
+        self.assertEqual(observables, len(jobs))
+        self.assertEqual(
+            observables, Job.objects.filter(analyzable__name__startswith="bulk").count()
+        )
+
+
 class CommentSerializerTestCase(CustomTestCase):
     def setUp(self):
         super().setUp()
@@ -726,3 +832,71 @@ class AbstractListConfigSerializerTestCase(CustomTestCase):
         self.assertEqual("test", result["verification"]["missing_secrets"][0])
         param.delete()
         ac.delete()
+
+    def test_to_representation_cache_scopes(self):
+        org = Organization.objects.create(name="test_org")
+        m1 = Membership.objects.create(user=self.user, organization=org, is_owner=True)
+        m2 = Membership.objects.create(user=self.admin, organization=org)
+        ac = AnalyzerConfig.objects.create(
+            name="test",
+            python_module=PythonModule.objects.get(
+                base_path=PythonModuleBasePaths.FileAnalyzer.value, module="apkid.APKiD"
+            ),
+            description="test",
+            disabled=False,
+            maximum_tlp="CLEAR",
+        )
+        param: Parameter = Parameter.objects.create(
+            python_module=ac.python_module,
+            name="test",
+            type="str",
+            required=True,
+            is_secret=True,
+        )
+        acs = PythonConfigListSerializer(child=AnalyzerConfigSerializer())
+        org_key = ac.get_cache_key(f"org_{org.pk}")
+        result = acs.to_representation_single_plugin(ac, self.admin)
+        self.assertFalse(result["verification"]["configured"])
+        self.assertEqual("test", result["name"])
+        # the members of the organization share the overlay
+        self.assertIsNotNone(cache.get(ac.get_cache_key("base")))
+        self.assertIsNotNone(cache.get(org_key))
+        self.assertIsNone(cache.get(ac.get_cache_key("user_admin")))
+
+        # the organization configures the plugin
+        pc = PluginConfig.objects.create(
+            value="test",
+            owner=self.user,
+            parameter=param,
+            analyzer_config=ac,
+            for_organization=True,
+        )
+        self.assertIsNone(cache.get(org_key))
+        self.assertIsNotNone(cache.get(ac.get_cache_key("base")))
+        result = acs.to_representation_single_plugin(ac, self.admin)
+        self.assertTrue(result["verification"]["configured"])
+        # the owner of plugin configs has its own overlay
+        result = acs.to_representation_single_plugin(ac, self.user)
+        self.assertTrue(result["verification"]["configured"])
+        self.assertIsNotNone(cache.get(ac.get_cache_key("user_user")))
+
+        # the organization disables the plugin
+        ac.get_or_create_org_configuration(org).disable_manually(self.user)
+        self.assertIsNone(cache.get(org_key))
+        self.assertIsNone(cache.get(ac.get_cache_key("user_user")))
+        self.assertTrue(acs.to_representation_single_plugin(ac, self.admin)["disabled"])
+        self.assertTrue(acs.to_representation_single_plugin(ac, self.user)["disabled"])
+
+        # users without organization
+        result = acs.to_representation_single_plugin(ac, self.guest)
+        self.assertFalse(result["disabled"])
+        self.assertFalse(result["verification"]["configured"])
+        self.assertIsNotNone(cache.get(ac.get_cache_key("default")))
+
+        pc.delete()
+        param.delete()
+        ac.delete()
+        self.assertEqual({}, cache.get_where(ac.get_cache_key("")))
+        m1.delete()
+        m2.delete()
+        org.delete()
@@ -0,0 +1,81 @@
+# This file is a part of IntelOwl https://github.com/intelowlproject/IntelOwl
+# See the file 'LICENSE' for copying permission.
+from unittest.mock import patch
+
+from django.test import override_settings
+from kombu import uuid
+
+from api_app.analyzables_manager.models import Analyzable
+from api_app.analyzers_manager.models import AnalyzerConfig, AnalyzerReport
+from api_app.choices import Classification
+from api_app.models import Job
+from api_app.websocket import JobConsumer
+from tests import CustomTestCase
+
+
+class JobConsumerTestCase(CustomTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.an = Analyzable.objects.create(
+            name="test.com",
+            classification=Classification.DOMAIN,
+        )
+        self.job = Job.objects.create(
+            user=self.user,
+            analyzable=self.an,
+            status=Job.STATUSES.RUNNING.value,
+        )
+        self.reports = [
+            AnalyzerReport.objects.create(
+                job=self.job,
+                config=config,
+                status=AnalyzerReport.STATUSES.SUCCESS.value,
+                task_id=str(uuid()),
+                parameters={},
+            )
+            for config in AnalyzerConfig.objects.all()[:2]
+        ]
+
+    @override_settings(WEBSOCKETS_PATCH_DEBOUNCE_SECONDS=1)
+    def test_schedule_reports(self):
+        with patch(
+            "intel_owl.tasks.send_pending_reports.apply_async"
+        ) as apply_async, patch.object(
+            JobConsumer, "serialize_and_send_reports"
+        ) as send:
+            # two workers in the same window
+            JobConsumer.schedule_reports(self.job.pk, self.reports[:1])
+            JobConsumer.schedule_reports(self.job.pk, self.reports[1:])
+            apply_async.assert_called_once()
+            self.assertEqual([self.job.pk], apply_async.call_args.kwargs["args"])
+            send.assert_not_called()
+
+            JobConsumer.send_pending_reports(self.job.pk)
+            send.assert_called_once()
+            job_id, reports = send.call_args.args
+            self.assertEqual(self.job.pk, job_id)
+            self.assertCountEqual(self.reports, reports)
+
+            # the window is closed
+            send.reset_mock()
+            JobConsumer.send_pending_reports(self.job.pk)
+            send.assert_not_called()
+            JobConsumer.schedule_reports(self.job.pk, self.reports[:1])
+            self.assertEqual(2, apply_async.call_count)
+
+            # concluded jobs already sent their full snapshot
+            self.job.status = Job.STATUSES.REPORTED_WITHOUT_FAILS.value
+            self.job.save()
+            JobConsumer.send_pending_reports(self.job.pk)
+            send.assert_not_called()
+
+    @override_settings(WEBSOCKETS_PATCH_DEBOUNCE_SECONDS=0)
+    def test_schedule_reports_without_debounce(self):
+        with patch(
+            "intel_owl.tasks.send_pending_reports.apply_async"
+        ) as apply_async, patch.object(
+            JobConsumer, "serialize_and_send_reports"
+        ) as send:
+            JobConsumer.schedule_reports(self.job.pk, self.reports)
+            apply_async.assert_not_called()
+            send.assert_called_once_with(self.job.pk, self.reports)
@@ -1,10 +1,19 @@
 import datetime
+import logging
+import os
+import time
+from unittest import skipUnless
 
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 from django.utils.timezone import now
 
 from api_app.analyzables_manager.models import Analyzable
 from api_app.choices import Classification
+from api_app.data_model_manager.models import DomainDataModel
+from api_app.user_events_manager.choices import DecayProgressionEnum
 from api_app.user_events_manager.models import (
+    UserAnalyzableEvent,
     UserDomainWildCardEvent,
     UserIPWildCardEvent,
 )
@@ -16,6 +25,8 @@ from api_app.user_events_manager.serializers import (
 from tests import CustomTestCase
 from tests.mock_utils import MockUpRequest
 
+logger = logging.getLogger(__name__)
+
 
 class TestUserAnalyzableEventQuerySet(CustomTestCase):
 
@@ -44,6 +55,116 @@ class TestUserAnalyzableEventQuerySet(CustomTestCase):
         ua.delete()
         an.delete()
 
+    def _create_events(self, number: int, **kwargs):
+        analyzables = []
+        for i in range(number):
+            analyzable = Analyzable(
+                name=f"test{i}.com", classification=Classification.DOMAIN
+            )
+            analyzable._set_hashes(analyzable.name)
+            analyzables.append(analyzable)
+        analyzables = Analyzable.objects.bulk_create(analyzables, batch_size=10000)
+        data_models = DomainDataModel.objects.bulk_create(
+            [DomainDataModel(reliability=8) for _ in range(number)], batch_size=10000
+        )
+        content_type = ContentType.objects.get_for_model(DomainDataModel)
+        return UserAnalyzableEvent.objects.bulk_create(
+            [
+                UserAnalyzableEvent(
+                    user=self.user,
+                    analyzable=analyzable,
+                    data_model_content_type=content_type,
+                    data_model_object_id=data_model.pk,
+                    **kwargs,
+                )
+                for analyzable, data_model in zip(analyzables, data_models)
+            ],
+            batch_size=10000,
+        )
+
+    def test_decay(self):
+        next_decay = now() - datetime.timedelta(days=1)
+        linear, inverse_exponential, fixed, future = self._create_events(
+            4, next_decay=next_decay, decay_timedelta_days=3
+        )
+        inverse_exponential.decay_progression = (
+            DecayProgressionEnum.INVERSE_EXPONENTIAL.value
+        )
+        inverse_exponential.decay_times = 1
+        inverse_exponential.save()
+        fixed.decay_progression = DecayProgressionEnum.FIXED.value
+        fixed.decay_timedelta_days = 0
+        fixed.save()
+        future.next_decay = now() + datetime.timedelta(days=1)
+        future.save()
+        last = UserAnalyzableEvent.objects.create(
+            user=self.superuser,
+            analyzable=linear.analyzable,
+            data_model_content_type=linear.data_model_content_type,
+            data_model_object_id=DomainDataModel.objects.create(reliability=1).pk,
+            next_decay=next_decay,
+        )
+
+        # content types, data models and events, inside a savepoint
+        with self.assertNumQueries(5):
+            number = UserAnalyzableEvent.objects.decay()
+        self.assertEqual(3, number)
+        for event in (linear, inverse_exponential, fixed, future, last):
+            event.refresh_from_db()
+        self.assertEqual(7, linear.data_model.reliability)
+        self.assertEqual(1, linear.decay_times)
+        self.assertEqual(next_decay + datetime.timedelta(days=3), linear.next_decay)
+        self.assertEqual(7, inverse_exponential.data_model.reliability)
+        self.assertEqual(2, inverse_exponential.decay_times)
+        self.assertEqual(
+            next_decay + datetime.timedelta(days=27), inverse_exponential.next_decay
+        )
+        for event in (fixed, future):
+            self.assertEqual(8, event.data_model.reliability)
+            self.assertEqual(0, event.decay_times)
+        # the reliability reached 0, no more decays
+        self.assertEqual(0, last.data_model.reliability)
+        self.assertEqual(1, last.decay_times)
+        self.assertIsNone(last.next_decay)
+        self.assertEqual(0, UserAnalyzableEvent.objects.decay())
+
+    @skipUnless(
+        os.environ.get("DECAY_BENCHMARK_EVENTS"),
+        "set DECAY_BENCHMARK_EVENTS to decay a large number of events",
+    )
+    def test_benchmark_decay(self):
+        # set DECAY_BENCHMARK_EVENTS=1000000 for 1M due events
+        events = int(os.environ["DECAY_BENCHMARK_EVENTS"])
+        self._create_events(
+            events,
+            next_decay=now() - datetime.timedelta(days=1),
+            decay_timedelta_days=1,
+        )
+        # the decay before the set-based updates, rolled back
+        with transaction.atomic():
+            start = time.perf_counter()
+            for event in UserAnalyzableEvent.objects.filter(
+                next_decay__lte=now()
+            ).exclude(decay_progression=DecayProgressionEnum.FIXED.value):
+                event.decay_times += 1
+                event.data_model.reliability -= 1
+                event.next_decay += datetime.timedelta(days=event.decay_timedelta_days)
+                event.data_model.save()
+                event.save()
+            per_row_time = time.perf_counter() - start
+            transaction.set_rollback(True)
+        self.assertTrue(DomainDataModel.objects.filter(reliability=8).exists())
+
+        start = time.perf_counter()
+        self.assertEqual(events, UserAnalyzableEvent.objects.decay())
+        set_based_time = time.perf_counter() - start
+        self.assertFalse(DomainDataModel.objects.filter(reliability=8).exists())
+        logger.info(
+            f"decay of {events} events: per row {per_row_time:.2f}s, "
+            f"set based {set_based_time:.2f}s, "
+            f"{per_row_time / set_based_time:.1f}x speedup"
+        )
+
 
 class TestUserDomainWildCardEventQuerySet(CustomTestCase):
 
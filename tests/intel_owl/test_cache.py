@@ -0,0 +1,169 @@
+# This file is a part of IntelOwl https://github.com/intelowlproject/IntelOwl
+# See the file 'LICENSE' for copying permission.
+import logging
+import os
+import time
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import TestCase
+
+from intel_owl.settings.cache import (
+    DatabaseCacheExtended,
+    RedisCacheExtended,
+    plain_key,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RedisCacheExtendedTestCase(TestCase):
+    # dedicated database, flushed by the tests
+    REDIS_URL = os.environ.get("TEST_CACHE_REDIS_URL", "redis://redis:6379/15")
+
+    def setUp(self):
+        super().setUp()
+        self.cache = RedisCacheExtended(self.REDIS_URL, {"KEY_FUNCTION": plain_key})
+        try:
+            self.cache.clear()
+        except Exception as e:
+            self.skipTest(f"redis is not available: {e}")
+
+    def tearDown(self):
+        self.cache.clear()
+        super().tearDown()
+
+    def test_get_where(self):
+        self.cache.set("list_AnalyzerConfig_alice", 1)
+        self.cache.set("list_AnalyzerConfig_alice_1_10", 2)
+        self.cache.set_many({"list_AnalyzerConfig_bob": 3, "list_ConnectorConfig_": 4})
+        self.cache.add("serializer_AnalyzerConfig_Yara_alice", 5)
+        self.assertEqual(
+            {"list_AnalyzerConfig_alice": 1, "list_AnalyzerConfig_alice_1_10": 2},
+            self.cache.get_where("list_AnalyzerConfig_alice"),
+        )
+        # same contract of the LIKE of the database cache
+        self.assertEqual(
+            ["list_AnalyzerConfig_alice", "list_AnalyzerConfig_alice_1_10"],
+            sorted(self.cache.get_where("list_AnalyzerConfig_ali").keys()),
+        )
+        self.assertEqual(3, len(self.cache.get_where("list_AnalyzerConfig_")))
+        self.assertEqual(4, len(self.cache.get_where("list")))
+        self.assertEqual(5, len(self.cache.get_where("")))
+        self.assertEqual({}, self.cache.get_where("list_IngestorConfig_"))
+
+    def test_index_maintenance(self):
+        self.cache.set("list_AnalyzerConfig_alice", 1)
+        self.cache.set("list_AnalyzerConfig_bob", 2)
+        self.cache.delete("list_AnalyzerConfig_alice")
+        self.assertEqual(
+            {"list_AnalyzerConfig_bob": 2},
+            self.cache.get_where("list_AnalyzerConfig_"),
+        )
+        self.cache.delete_many(["list_AnalyzerConfig_bob"])
+        self.assertEqual({}, self.cache.get_where("list_AnalyzerConfig_"))
+        client = self.cache._cache.get_client()
+        self.assertEqual(0, client.zcard("prefix_index:list_AnalyzerConfig_"))
+
+        self.cache.set("list_AnalyzerConfig_alice", 1, timeout=1)
+        # touched keys are kept in the index
+        self.assertTrue(self.cache.touch("list_AnalyzerConfig_alice", timeout=60))
+        self.cache.set("list_AnalyzerConfig_bob", 2, timeout=1)
+        # the index is read after the expiration of bob
+        expired = time.time() + 2
+        with patch("intel_owl.settings.cache.time") as mocked_time:
+            mocked_time.time.return_value = expired
+            self.assertEqual(
+                {"list_AnalyzerConfig_alice": 1},
+                self.cache.get_where("list_AnalyzerConfig_"),
+            )
+        # keys are indexed only by their prefixes ending with the separator
+        self.assertEqual(0, client.exists("prefix_index:"))
+
+    def test_invalidation(self):
+        users = 50
+        database_cache = DatabaseCacheExtended(
+            settings.DATABASE_CACHE_LOCATION, {"KEY_FUNCTION": plain_key}
+        )
+        for backend in (database_cache, self.cache):
+            data = {}
+            for plugin in ("Yara", "Tor", "VirusTotal"):
+                for i in range(users):
+                    data[f"serializer_AnalyzerConfig_{plugin}_user{i}"] = {"i": i}
+            for i in range(users):
+                data[f"list_AnalyzerConfig_user{i}"] = [i]
+            backend.set_many(data)
+
+            # a plugin changed for everyone
+            invalidated = backend.get_where("serializer_AnalyzerConfig_Yara_")
+            self.assertEqual(users, len(invalidated))
+            backend.delete_many(invalidated.keys())
+            self.assertEqual({}, backend.get_where("serializer_AnalyzerConfig_Yara_"))
+            self.assertEqual(
+                users, len(backend.get_where("serializer_AnalyzerConfig_Tor_"))
+            )
+
+            # the configuration of a single user changed:
+            # the prefix matches also user10 to user19
+            invalidated = backend.get_where("list_AnalyzerConfig_user1")
+            self.assertEqual(11, len(invalidated))
+            self.assertEqual([1], invalidated["list_AnalyzerConfig_user1"])
+            backend.delete_many(invalidated.keys())
+            self.assertEqual(
+                users - 11, len(backend.get_where("list_AnalyzerConfig_user"))
+            )
+        database_cache.clear()
+
+    @skipUnless(
+        os.environ.get("CACHE_BENCHMARK_USERS"),
+        "set CACHE_BENCHMARK_USERS to compare the invalidation of the backends",
+    )
+    def test_benchmark_invalidation(self):
+        users = int(os.environ["CACHE_BENCHMARK_USERS"])
+        database_cache = DatabaseCacheExtended(
+            settings.DATABASE_CACHE_LOCATION, {"KEY_FUNCTION": plain_key}
+        )
+        timings = {}
+        for backend in (database_cache, self.cache):
+            data = {}
+            for plugin in ("Yara", "Tor", "VirusTotal"):
+                for i in range(users):
+                    data[f"serializer_AnalyzerConfig_{plugin}_user{i}"] = {"i": i}
+            for i in range(users):
+                data[f"list_AnalyzerConfig_user{i}"] = [i]
+            backend.set_many(data)
+
+            start = time.perf_counter()
+            # a plugin changed for everyone
+            invalidated = backend.get_where("serializer_AnalyzerConfig_Yara_")
+            backend.delete_many(invalidated.keys())
+            plugin_invalidation = time.perf_counter() - start
+            self.assertEqual(users, len(invalidated))
+
+            start = time.perf_counter()
+            # the configuration of a single user changed
+            for i in range(100):
+                backend.delete_many(
+                    backend.get_where(f"list_AnalyzerConfig_user{i}").keys()
+                )
+            user_invalidation = (time.perf_counter() - start) / 100
+            timings[backend.__class__.__name__] = (
+                plugin_invalidation,
+                user_invalidation,
+            )
+            logger.info(
+                f"{backend.__class__.__name__} with {len(data)} keys: "
+                f"plugin invalidation {plugin_invalidation:.4f}s, "
+                f"user invalidation {user_invalidation:.4f}s"
+            )
+        database_cache.clear()
+        database, redis = (
+            timings[DatabaseCacheExtended.__name__],
+            timings[RedisCacheExtended.__name__],
+        )
+        logger.info(
+            f"redis speedup with {users} users: "
+            f"plugin invalidation {database[0] / redis[0]:.1f}x, "
+            f"user invalidation {database[1] / redis[1]:.1f}x"
+        )
@@ -0,0 +1,68 @@
+# This file is a part of IntelOwl https://github.com/intelowlproject/IntelOwl
+# See the file 'LICENSE' for copying permission.
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import Mock
+
+from intel_owl.sample_cache import SampleCache
+
+
+class SampleCacheTestCase(TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.cache = SampleCache(self.root, max_size=10)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    @staticmethod
+    def _fetch(content: bytes) -> Mock:
+        return Mock(side_effect=lambda f: f.write(content))
+
+    def test_acquire_downloads_once(self):
+        fetch = self._fetch(b"sample")
+        first = self.cache.acquire("aa11", fetch)
+        second = self.cache.acquire("aa11", fetch)
+        self.assertEqual(first, second)
+        self.assertEqual(str(self.root / "aa" / "aa11"), first)
+        self.assertEqual(b"sample", Path(first).read_bytes())
+        fetch.assert_called_once()
+        self.cache.release(first)
+        self.cache.release(second)
+        self.assertEqual({}, self.cache._locks)
+
+    def test_failed_download(self):
+        def fetch(f):
+            f.write(b"partial")
+            raise AssertionError
+
+        with self.assertRaises(AssertionError):
+            self.cache.acquire("aa11", fetch)
+        self.assertEqual(
+            ["aa11.lock"], [path.name for path in (self.root / "aa").iterdir()]
+        )
+        self.assertEqual({}, self.cache._locks)
+
+    def test_evict(self):
+        old = self.cache.acquire("aa11", self._fetch(b"123456"))
+        self.cache.release(old)
+        # make sure that it is the least recently used
+        os.utime(old, (0, 0))
+        used = self.cache.acquire("bb22", self._fetch(b"123456"))
+        self.assertFalse(Path(old).exists())
+        self.assertTrue(Path(used).exists())
+
+        # samples in use are not evicted
+        os.utime(used, (0, 0))
+        new = self.cache.acquire("cc33", self._fetch(b"123456"))
+        self.assertTrue(Path(used).exists())
+        self.assertTrue(Path(new).exists())
+        self.cache.release(used)
+        self.cache.release(new)
+        self.cache.evict()
+        self.assertFalse(Path(used).exists())
+        self.assertTrue(Path(new).exists())
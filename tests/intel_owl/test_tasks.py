@@ -9,7 +9,7 @@ from api_app.analyzers_manager.models import AnalyzerConfig, AnalyzerReport
 from api_app.choices import Classification, PythonModuleBasePaths
 from api_app.connectors_manager.models import ConnectorConfig, ConnectorReport
 from api_app.ingestors_manager.models import IngestorConfig, IngestorReport
-from api_app.models import Job, PythonModule
+from api_app.models import Job, LastElasticReportUpdate, PythonModule
 from api_app.pivots_manager.models import PivotConfig, PivotReport
 from api_app.visualizers_manager.models import VisualizerConfig, VisualizerReport
 from certego_saas.apps.organization.membership import Membership
@@ -44,7 +44,7 @@ class SendElasticTestCase(CustomTestCase):
             user=self.user,
             analyzable=self.analyzable,
         )
-        AnalyzerReport.objects.create(  # valid
+        self.dns0_report = AnalyzerReport.objects.create(  # valid
             config=AnalyzerConfig.objects.get(
                 python_module=PythonModule.objects.get(
                     base_path=PythonModuleBasePaths.ObservableAnalyzer.value,
@@ -59,7 +59,7 @@ class SendElasticTestCase(CustomTestCase):
             task_id=uuid(),
             parameters={},
         )
-        AnalyzerReport.objects.create(  # valid
+        self.quad9_report = AnalyzerReport.objects.create(  # valid
             config=AnalyzerConfig.objects.get(
                 python_module=PythonModule.objects.get(
                     base_path=PythonModuleBasePaths.ObservableAnalyzer.value,
@@ -106,7 +106,7 @@ class SendElasticTestCase(CustomTestCase):
             task_id=uuid(),
             parameters={},
         )
-        ConnectorReport.objects.create(
+        self.connector_report = ConnectorReport.objects.create(
             config=ConnectorConfig.objects.get(
                 python_module=PythonModule.objects.get(
                     base_path=PythonModuleBasePaths.Connector.value,
@@ -141,7 +141,7 @@ class SendElasticTestCase(CustomTestCase):
             report={},
             parameters={},
         )
-        PivotReport.objects.create(
+        self.pivot_report = PivotReport.objects.create(
             config=PivotConfig.objects.filter(
                 python_module=PythonModule.objects.get(
                     base_path=PythonModuleBasePaths.Pivot.value,
@@ -202,12 +202,14 @@ class SendElasticTestCase(CustomTestCase):
         ) as mocked_elastic_bulk:
             send_plugin_report_to_elastic()
             self.assertTrue(mocked_elastic_bulk.assert_called_once)
-            mocked_bulk_param = mocked_elastic_bulk.call_args.args[1]
+            # documents are generated while they are sent
+            mocked_bulk_param = list(mocked_elastic_bulk.call_args.args[1])
             self.assertEqual(
                 mocked_bulk_param,
                 [
                     {
                         "_op_type": "index",
+                        "_id": f"AnalyzerReport-{self.dns0_report.pk}",
                         "_index": "plugin-report-unittest-analyzer-report-2024-10-29",
                         "_source": {
                             "user": {"username": "test_elastic_user"},
@@ -234,6 +236,7 @@ class SendElasticTestCase(CustomTestCase):
                     },
                     {
                         "_op_type": "index",
+                        "_id": f"AnalyzerReport-{self.quad9_report.pk}",
                         "_index": "plugin-report-unittest-analyzer-report-2024-10-29",
                         "_source": {
                             "user": {"username": "test_elastic_user"},
@@ -260,6 +263,7 @@ class SendElasticTestCase(CustomTestCase):
                     },
                     {
                         "_op_type": "index",
+                        "_id": f"ConnectorReport-{self.connector_report.pk}",
                         "_index": "plugin-report-unittest-connector-report-2024-10-29",
                         "_source": {
                             "user": {"username": "test_elastic_user"},
@@ -291,6 +295,7 @@ class SendElasticTestCase(CustomTestCase):
                     },
                     {
                         "_op_type": "index",
+                        "_id": f"PivotReport-{self.pivot_report.pk}",
                         "_index": "plugin-report-unittest-pivot-report-2024-10-29",
                         "_source": {
                             "user": {
@@ -326,20 +331,32 @@ class SendElasticTestCase(CustomTestCase):
 
     @override_settings(ELASTICSEARCH_DSL_ENABLED=True)
     @override_settings(ELASTICSEARCH_DSL_HOST="https://elasticsearch:9200")
+    @override_settings(ELASTICSEARCH_DSL_CATCH_UP_WORKERS=1)
     def test_update(self, *args, **kwargs):
+        LastElasticReportUpdate.objects.create(
+            last_update_datetime=datetime.datetime(
+                2024, 10, 29, 10, 40, tzinfo=datetime.UTC
+            )
+        )
         with patch(
             "intel_owl.tasks.bulk",
             return_value=(4, []),
         ) as mocked_elastic_bulk:
             send_plugin_report_to_elastic()
-            self.assertTrue(mocked_elastic_bulk.assert_called_once)
-            mocked_bulk_param = mocked_elastic_bulk.call_args.args[1]
+            # one call for every window of 5 minutes since the checkpoint
+            self.assertEqual(4, mocked_elastic_bulk.call_count)
+            mocked_bulk_param = [
+                document
+                for call in mocked_elastic_bulk.call_args_list
+                for document in call.args[1]
+            ]
             self.assertEqual(
                 mocked_bulk_param,
                 [
                     {
                         "_index": "plugin-report-unittest-analyzer-report-2024-10-29",
                         "_op_type": "index",
+                        "_id": f"AnalyzerReport-{self.dns0_report.pk}",
                         "_source": {
                             "user": {"username": "test_elastic_user"},
                             "membership": {
@@ -366,6 +383,7 @@ class SendElasticTestCase(CustomTestCase):
                     {
                         "_index": "plugin-report-unittest-analyzer-report-2024-10-29",
                         "_op_type": "index",
+                        "_id": f"AnalyzerReport-{self.quad9_report.pk}",
                         "_source": {
                             "user": {"username": "test_elastic_user"},
                             "membership": {
@@ -392,6 +410,7 @@ class SendElasticTestCase(CustomTestCase):
                     {
                         "_index": "plugin-report-unittest-connector-report-2024-10-29",
                         "_op_type": "index",
+                        "_id": f"ConnectorReport-{self.connector_report.pk}",
                         "_source": {
                             "user": {"username": "test_elastic_user"},
                             "membership": {
@@ -423,6 +442,7 @@ class SendElasticTestCase(CustomTestCase):
                     {
                         "_index": "plugin-report-unittest-pivot-report-2024-10-29",
                         "_op_type": "index",
+                        "_id": f"PivotReport-{self.pivot_report.pk}",
                         "_source": {
                             "user": {"username": "test_elastic_user"},
                             "membership": {
@@ -452,3 +472,106 @@ class SendElasticTestCase(CustomTestCase):
                     },
                 ],
             )
+        self.assertEqual(_now, LastElasticReportUpdate.get_solo().last_update_datetime)
+
+    @override_settings(ELASTICSEARCH_DSL_ENABLED=True)
+    @override_settings(ELASTICSEARCH_DSL_HOST="https://elasticsearch:9200")
+    @override_settings(ELASTICSEARCH_DSL_CATCH_UP_WORKERS=1)
+    def test_error(self, *args, **kwargs):
+        LastElasticReportUpdate.objects.create(
+            last_update_datetime=datetime.datetime(
+                2024, 10, 29, 10, 50, tzinfo=datetime.UTC
+            )
+        )
+
+        def _bulk(client, documents, **kwargs):
+            documents = list(documents)
+            if documents:
+                raise ConnectionError("elastic is down")
+            return 0, []
+
+        with patch("intel_owl.tasks.bulk", side_effect=_bulk):
+            send_plugin_report_to_elastic()
+        # the window with the reports will be indexed again
+        self.assertEqual(
+            datetime.datetime(2024, 10, 29, 10, 55, tzinfo=datetime.UTC),
+            LastElasticReportUpdate.get_solo().last_update_datetime,
+        )
+
+    @override_settings(ELASTICSEARCH_DSL_ENABLED=True)
+    @override_settings(ELASTICSEARCH_DSL_HOST="https://elasticsearch:9200")
+    @override_settings(ELASTICSEARCH_DSL_CATCH_UP_WORKERS=1)
+    def test_document_errors(self, *args, **kwargs):
+        LastElasticReportUpdate.objects.create(
+            last_update_datetime=datetime.datetime(
+                2024, 10, 29, 10, 50, tzinfo=datetime.UTC
+            )
+        )
+
+        def _bulk(client, documents, **kwargs):
+            documents = list(documents)
+            if documents:
+                # the first report is throttled, the others are indexed
+                return len(documents) - 1, [
+                    {"index": {"_id": documents[0]["_id"], "status": 429}}
+                ]
+            return 0, []
+
+        with patch("intel_owl.tasks.bulk", side_effect=_bulk):
+            send_plugin_report_to_elastic()
+        # the window with the rejected report will be indexed again
+        self.assertEqual(
+            datetime.datetime(2024, 10, 29, 10, 55, tzinfo=datetime.UTC),
+            LastElasticReportUpdate.get_solo().last_update_datetime,
+        )
+
+    @override_settings(ELASTICSEARCH_DSL_ENABLED=True)
+    @override_settings(ELASTICSEARCH_DSL_HOST="https://elasticsearch:9200")
+    @override_settings(ELASTICSEARCH_DSL_CATCH_UP_WORKERS=1)
+    def test_document_rejected(self, *args, **kwargs):
+        LastElasticReportUpdate.objects.create(
+            last_update_datetime=datetime.datetime(
+                2024, 10, 29, 10, 50, tzinfo=datetime.UTC
+            )
+        )
+
+        def _bulk(client, documents, **kwargs):
+            documents = list(documents)
+            if documents:
+                # the first report will never be accepted
+                return len(documents) - 1, [
+                    {"index": {"_id": documents[0]["_id"], "status": 400}}
+                ]
+            return 0, []
+
+        with patch("intel_owl.tasks.bulk", side_effect=_bulk):
+            send_plugin_report_to_elastic()
+        # the rejected report does not stop the indexing
+        self.assertEqual(_now, LastElasticReportUpdate.get_solo().last_update_datetime)
+
+    @override_settings(ELASTICSEARCH_DSL_ENABLED=True)
+    @override_settings(ELASTICSEARCH_DSL_HOST="https://elasticsearch:9200")
+    @override_settings(ELASTICSEARCH_DSL_CATCH_UP_WORKERS=1)
+    def test_index_after_midnight(self, mocked_now, *args, **kwargs):
+        LastElasticReportUpdate.objects.create(
+            last_update_datetime=datetime.datetime(
+                2024, 10, 29, 10, 50, tzinfo=datetime.UTC
+            )
+        )
+        mocked_now.return_value = _now + datetime.timedelta(days=1)
+        with patch("intel_owl.tasks.bulk", return_value=(4, [])) as mocked_elastic_bulk:
+            send_plugin_report_to_elastic()
+            indexes = {
+                document["_index"]
+                for call in mocked_elastic_bulk.call_args_list
+                for document in call.args[1]
+            }
+        # the reports sent again go to the index of the day they ended
+        self.assertEqual(
+            indexes,
+            {
+                "plugin-report-unittest-analyzer-report-2024-10-29",
+                "plugin-report-unittest-connector-report-2024-10-29",
+                "plugin-report-unittest-pivot-report-2024-10-29",
+            },
+        )